@@ -0,0 +1,78 @@
+'''
+Benchmark the query throughput of MinHashLSH with many reader threads
+and one writer thread: the concurrent mode, in which readers do not lock,
+versus a global lock wrapped around every query and write.
+'''
+import time, argparse, sys, random, threading
+from datasketch import MinHashLSH, MinHash
+
+
+def create_minhashes(n, num_perm, population_size=10000, set_size=100):
+    random.seed(42)
+    population = [str(i) for i in range(population_size)]
+    minhashes = []
+    for _ in range(n):
+        m = MinHash(num_perm)
+        for word in random.sample(population, set_size):
+            m.update(word.encode("utf8"))
+        minhashes.append(m)
+    return minhashes
+
+
+def run(lsh, minhashes, num_readers, duration, lock=None):
+    lock = lock or _NoLock()
+    half = len(minhashes) // 2
+    for i in range(half):
+        lsh.insert(i, minhashes[i])
+    done = threading.Event()
+    counts = [0] * num_readers
+    def read(r):
+        while not done.is_set():
+            with lock:
+                lsh.query(minhashes[random.randrange(half)])
+            counts[r] += 1
+    def write():
+        i = half
+        while not done.is_set():
+            with lock:
+                lsh.insert(i, minhashes[i])
+            with lock:
+                lsh.remove(i)
+            i = half + (i + 1 - half) % (len(minhashes) - half)
+    threads = [threading.Thread(target=read, args=(r,))
+               for r in range(num_readers)] + [threading.Thread(target=write)]
+    for t in threads:
+        t.start()
+    time.sleep(duration)
+    done.set()
+    for t in threads:
+        t.join()
+    return sum(counts) / float(duration)
+
+
+class _NoLock(object):
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num-perm", type=int, default=128)
+    parser.add_argument("--n", type=int, default=10000)
+    parser.add_argument("--duration", type=float, default=5.0)
+    args = parser.parse_args(sys.argv[1:])
+
+    minhashes = create_minhashes(args.n, args.num_perm)
+    for num_readers in [1, 2, 4, 8]:
+        qps = run(MinHashLSH(threshold=0.5, num_perm=args.num_perm),
+                  minhashes, num_readers, args.duration,
+                  lock=threading.Lock())
+        print("Global lock, %d readers: %.1f queries/sec" % (num_readers, qps))
+        qps = run(MinHashLSH(threshold=0.5, num_perm=args.num_perm,
+                             concurrent=True),
+                  minhashes, num_readers, args.duration)
+        print("Concurrent, %d readers: %.1f queries/sec" % (num_readers, qps))
@@ -8,9 +8,11 @@ import collections
 from datasketch import MinHashLSHEnsemble, MinHash
 from lshforest_benchmark import bootstrap_data
 
-def benchmark_lshensemble(threshold, num_perm, num_part, l, index_data, query_data):
-    print("Building LSH Ensemble index")
-    lsh = MinHashLSHEnsemble(threshold=threshold, num_perm=num_perm, num_part=num_part, l=l)
+def benchmark_lshensemble(threshold, num_perm, num_part, l, partitioning,
+                          index_data, query_data):
+    print("Building LSH Ensemble index with %s partitioning" % partitioning)
+    lsh = MinHashLSHEnsemble(threshold=threshold, num_perm=num_perm,
+                             num_part=num_part, m=l, partitioning=partitioning)
     lsh.index((key, minhash, len(set)) 
                   for key, minhash, set in \
                           zip(index_data.keys, index_data.minhashes[num_perm], index_data.sets))
@@ -18,9 +20,9 @@ def benchmark_lshensemble(threshold, num_perm, num_part, l, index_data, query_da
     times = []
     results = []
     for qs, minhash in zip(query_data.sets, query_data.minhashes[num_perm]):
-        start = time.clock()
+        start = time.perf_counter()
         result = list(lsh.query(minhash, len(qs)))
-        duration = time.clock() - start
+        duration = time.perf_counter() - start
         times.append(duration)
         results.append(sorted([[key, _compute_containment(qs, index_data.sets[key])]
                                for key in result], 
@@ -32,10 +34,10 @@ def benchmark_ground_truth(threshold, index_data, query_data):
     times = []
     results = []
     for q in query_data.sets:
-        start = time.clock()
+        start = time.perf_counter()
         result = [key for key, a in zip(index_data.keys, index_data.sets)
                   if _compute_containment(q, a) >= threshold]
-        duration = time.clock() - start
+        duration = time.perf_counter() - start
         times.append(duration)
         results.append(sorted([[key, _compute_containment(q, index_data.sets[key])]
                                for key in result], 
@@ -62,11 +64,14 @@ if __name__ == "__main__":
     num_perms = [32, 64, 96, 128, 160, 192, 224, 256]
     num_part = 16
     l = 8
+    partitionings = ["optimal", "equal"]
     output = {"threshold" : threshold,
               "num_perms" : num_perms,
               "num_part" : 16,
               "l" : l,
-              "lsh_times" : [], "lsh_results" : [],
+              "partitionings" : partitionings,
+              "lsh_times" : dict((p, []) for p in partitionings),
+              "lsh_results" : dict((p, []) for p in partitionings),
               "ground_truth_times" : None, "ground_truth_results" : None}
 
     population_size = 500
@@ -86,9 +91,14 @@ if __name__ == "__main__":
         print("Use num_perm = %d" % num_perm)
         result = {}
         print("Running LSH Ensemble benchmark")
-        lsh_times, lsh_results = benchmark_lshensemble(threshold, num_perm, num_part, l, index_data, query_data)
-        output["lsh_times"].append(lsh_times)
-        output["lsh_results"].append(lsh_results)
+        for partitioning in partitionings:
+            lsh_times, lsh_results = benchmark_lshensemble(threshold,
+                    num_perm, num_part, l, partitioning, index_data, query_data)
+            print("%s partitioning: %.1f candidates, %.3f ms per query" %
+                  (partitioning, np.mean([len(r) for r in lsh_results]),
+                   np.mean(lsh_times)*1000))
+            output["lsh_times"][partitioning].append(lsh_times)
+            output["lsh_results"][partitioning].append(lsh_results)
     
     print("Running ground truth benchmark")
     output["ground_truth_times"], output["ground_truth_results"] =\
@@ -14,27 +14,37 @@ if __name__ == "__main__":
         benchmark = json.load(f) 
 
     num_perms = benchmark["num_perms"]
-    lsh_times = benchmark["lsh_times"]
+    partitionings = benchmark["partitionings"]
     ground_truth_results = [[x[0] for x in r] for r in benchmark["ground_truth_results"]]
-    lsh_fscores = []
-    for results in benchmark["lsh_results"]:
-        query_results = [[x[0] for x in r] for r in results]
-        lsh_fscores.append(average_fscore(query_results, ground_truth_results))
+    lsh_fscores = {}
+    lsh_candidates = {}
+    lsh_times = {}
+    for partitioning in partitionings:
+        lsh_fscores[partitioning] = []
+        lsh_candidates[partitioning] = []
+        for results in benchmark["lsh_results"][partitioning]:
+            query_results = [[x[0] for x in r] for r in results]
+            lsh_fscores[partitioning].append(average_fscore(query_results,
+                                             ground_truth_results))
+            lsh_candidates[partitioning].append(np.mean([len(r) for r in results]))
+        lsh_times[partitioning] = np.array([np.percentile(ts, 90)
+            for ts in benchmark["lsh_times"][partitioning]])*1000
 
-    lsh_times = np.array([np.percentile(ts, 90) 
-        for ts in lsh_times])*1000
-
-    fig, axes = plt.subplots(1, 2, figsize=(5*2, 4.5), sharex=True)
-    # Plot query fscore vs. num perm
-    axes[0].plot(num_perms, lsh_fscores, marker="+", label="LSH Ensemble")
+    fig, axes = plt.subplots(1, 3, figsize=(5*3, 4.5), sharex=True)
+    for partitioning in partitionings:
+        label = "LSH Ensemble (%s)" % partitioning
+        # Plot query fscore vs. num perm
+        axes[0].plot(num_perms, lsh_fscores[partitioning], marker="+", label=label)
+        # Plot number of candidates vs. num perm
+        axes[1].plot(num_perms, lsh_candidates[partitioning], marker="+", label=label)
+        # Plot query time vs. num perm
+        axes[2].plot(num_perms, lsh_times[partitioning], marker="+", label=label)
     axes[0].set_ylabel("Average F-Score")
-    axes[0].set_xlabel("# of Permmutation Functions")
-    axes[0].grid()
-    # Plot query time vs. num perm
-    axes[1].plot(num_perms, lsh_times, marker="+", label="LSH Ensemble")
-    axes[1].set_xlabel("# of Permutation Functions")
-    axes[1].set_ylabel("90 Percentile Query Time (ms)")
-    axes[1].grid()
-    axes[1].legend(loc="lower right")
+    axes[1].set_ylabel("Average # of Candidates")
+    axes[2].set_ylabel("90 Percentile Query Time (ms)")
+    for ax in axes:
+        ax.set_xlabel("# of Permutation Functions")
+        ax.grid()
+    axes[2].legend(loc="lower right")
     plt.tight_layout()
     fig.savefig("lshensemble_benchmark.png", pad_inches=0.05, bbox_inches="tight")
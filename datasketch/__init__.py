@@ -6,6 +6,7 @@ from datasketch.inverted_index import InvertedIndex
 from datasketch.weighted_minhash import WeightedMinHash, WeightedMinHashGenerator
 from datasketch.lshforest import MinHashLSHForest
 from datasketch.lshensemble import MinHashLSHEnsemble
+from datasketch.lshwindow import MinHashLSHWindow
 from datasketch.lean_minhash import LeanMinHash
 
 # Alias
@@ -0,0 +1,6 @@
+'''
+Asyncio API of the indexes, for Python 3.5 and newer.
+The Redis storage requires `redis.asyncio` (redis-py 4.2 or newer), which
+is installed with :code:`pip install datasketch[aio]`.
+'''
+from datasketch.aio.lsh import AsyncMinHashLSH
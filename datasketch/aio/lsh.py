@@ -0,0 +1,154 @@
+import asyncio
+from datasketch.lsh import MinHashLSH, _init_params
+from datasketch.aio.storage import (
+    async_ordered_storage, async_unordered_storage,
+    async_multi_get, async_multi_insert, async_close)
+
+
+class AsyncMinHashLSH(object):
+    '''
+    The asyncio version of :class:`datasketch.MinHashLSH`, for querying
+    from an event loop without blocking it. The band lookups of a query,
+    or of many queries with :func:`AsyncMinHashLSH.query_many`, are sent
+    to a Redis server in a single pipeline.
+
+    The arguments are the same as :class:`datasketch.MinHashLSH`, except that
+    the storage is one of the :mod:`datasketch.aio.storage` storages.
+
+    Example:
+        .. code-block:: python
+
+            from datasketch.aio import AsyncMinHashLSH
+
+            async def main():
+                async with AsyncMinHashLSH(threshold=0.5, num_perm=128,
+                        storage_config={'type': 'redis',
+                            'redis': {'host': 'localhost', 'port': 6379}}) as lsh:
+                    await lsh.insert(b"m2", m2)
+                    result = await lsh.query(m1)
+    '''
+
+    def __init__(self, threshold=0.9, num_perm=128, weights=(0.5,0.5),
+                 params=None, storage_config={'type': 'dict'}):
+        self.b, self.r = _init_params(threshold, num_perm, weights, params)
+        self.threshold = threshold
+        self.h = num_perm
+        # The Redis clients shared by the storages, one for each server
+        self._connections = dict()
+        self.hashtables = [async_unordered_storage(storage_config,
+                                                   self._connections)
+                           for _ in range(self.b)]
+        self.hashranges = [(i*self.r, (i+1)*self.r) for i in range(self.b)]
+        self.keys = async_ordered_storage(storage_config, self._connections)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def close(self):
+        '''
+        Release the connections of the storages.
+        '''
+        await async_close(self._connections)
+
+    def _check(self, minhash):
+        if len(minhash) != self.h:
+            raise ValueError("Expecting minhash with length %d, got %d"
+                    % (self.h, len(minhash)))
+
+    def _Hs(self, minhash):
+        return [MinHashLSH._H(minhash.hashvalues[start:end])
+                for start, end in self.hashranges]
+
+    async def insert(self, key, minhash, check_duplication=True):
+        '''
+        Insert a unique key to the index, together
+        with a MinHash (or weighted MinHash) of the set referenced by
+        the key.
+
+        Args:
+            key (hashable): The unique identifier of the set.
+            minhash (datasketch.MinHash): The MinHash of the set.
+            check_duplication (bool, optional): If True, raise ValueError
+                when the key already exists.
+        '''
+        self._check(minhash)
+        if check_duplication and await self.keys.has_key(key):
+            raise ValueError("The given key already exists")
+        Hs = self._Hs(minhash)
+        await async_multi_insert([(self.keys, key, Hs)] +
+                                 [(hashtable, H, (key,))
+                                  for H, hashtable in zip(Hs, self.hashtables)])
+
+    async def query(self, minhash):
+        '''
+        Giving the MinHash of the query set, retrieve
+        the keys that references sets with Jaccard
+        similarities greater than the threshold.
+
+        Args:
+            minhash (datasketch.MinHash): The MinHash of the query set.
+
+        Returns:
+            `list` of keys.
+        '''
+        results = await self.query_many([minhash])
+        return results[0]
+
+    async def query_many(self, minhashes):
+        '''
+        Query the index with many MinHashes at once, sending the band
+        lookups of all queries together.
+
+        Args:
+            minhashes (list): The MinHashes of the query sets.
+
+        Returns:
+            `list` of `list` of keys, one for each query.
+        '''
+        requests = []
+        for minhash in minhashes:
+            self._check(minhash)
+            requests.extend(zip(self.hashtables, self._Hs(minhash)))
+        values = await async_multi_get(requests)
+        results = []
+        for i in range(len(minhashes)):
+            candidates = set()
+            for keys in values[i*self.b:(i+1)*self.b]:
+                candidates.update(keys)
+            results.append(list(candidates))
+        return results
+
+    async def has_key(self, key):
+        '''
+        Args:
+            key (hashable): The unique identifier of a set.
+
+        Returns:
+            bool: True only if the key exists in the index.
+        '''
+        return await self.keys.has_key(key)
+
+    async def remove(self, key):
+        '''
+        Remove the key from the index.
+
+        Args:
+            key (hashable): The unique identifier of a set.
+        '''
+        if not await self.keys.has_key(key):
+            raise ValueError("The given key does not exist")
+        Hs = await self.keys.get(key)
+        await asyncio.gather(*[hashtable.remove_val(H, key)
+                               for H, hashtable in zip(Hs, self.hashtables)])
+        await self.keys.remove(key)
+
+    async def is_empty(self):
+        '''
+        Returns:
+            bool: Check if the index is empty.
+        '''
+        sizes = await asyncio.gather(*[t.size() for t in self.hashtables])
+        return any(size == 0 for size in sizes)
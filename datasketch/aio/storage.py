@@ -0,0 +1,303 @@
+import asyncio
+from abc import ABCMeta, abstractmethod
+from datasketch.storage import (
+    DictListStorage, DictSetStorage, parse_redis_config, _random_name)
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
+
+
+def async_ordered_storage(config, connections=None):
+    '''Return an async ordered storage system based on the specified config.
+
+    The storages created with the same `connections` dict share one
+    Redis client for each Redis server.'''
+    tp = config['type']
+    if tp == 'dict':
+        return AsyncDictListStorage(config)
+    if tp == 'redis':
+        return AsyncRedisListStorage(config, connections=connections)
+    raise ValueError("Unsupported async storage type: %s" % tp)
+
+
+def async_unordered_storage(config, connections=None):
+    '''Return an async unordered storage system based on the specified config.
+
+    The storages created with the same `connections` dict share one
+    Redis client for each Redis server.'''
+    tp = config['type']
+    if tp == 'dict':
+        return AsyncDictSetStorage(config)
+    if tp == 'redis':
+        return AsyncRedisSetStorage(config, connections=connections)
+    raise ValueError("Unsupported async storage type: %s" % tp)
+
+
+async def async_close(connections):
+    '''Close the Redis clients of a `connections` dict, shared by the
+    storages created with it, each once.'''
+    # aclose replaces close since redis-py 5.0.1
+    await asyncio.gather(*[getattr(r, 'aclose', r.close)()
+                           for r in connections.values()])
+
+
+async def async_multi_get(requests):
+    '''Get the values under keys of several async storages. The requests
+    to Redis storages on the same server are sent in a single pipeline,
+    and the pipelines of different servers are executed concurrently.
+
+    Args:
+        requests (list): A list of `(storage, key)` tuples.
+
+    Returns:
+        list: The values under each key, in the order of the requests.
+    '''
+    results = [None] * len(requests)
+    pipes = {}
+    for i, (storage, key) in enumerate(requests):
+        if isinstance(storage, AsyncRedisStorage):
+            pipe, indexes = _pipeline(pipes, storage)
+            storage._get_items(pipe, storage.redis_key(key))
+            indexes.append(i)
+        else:
+            results[i] = await storage.get(key)
+    pipes = list(pipes.values())
+    outputs = await asyncio.gather(*[pipe.execute() for pipe, _ in pipes])
+    for (_, indexes), output in zip(pipes, outputs):
+        for i, result in zip(indexes, output):
+            results[i] = result
+    return results
+
+
+async def async_multi_insert(requests):
+    '''Insert values under keys of several async storages. The insertions
+    to Redis storages on the same server are sent in a single pipeline,
+    and the pipelines of different servers are executed concurrently.
+
+    Args:
+        requests (list): A list of `(storage, key, values)` tuples.
+    '''
+    pipes = {}
+    for storage, key, vals in requests:
+        if isinstance(storage, AsyncRedisStorage):
+            pipe, _ = _pipeline(pipes, storage)
+            storage._insert(pipe, key, *vals)
+        else:
+            await storage.insert(key, *vals)
+    await asyncio.gather(*[pipe.execute() for pipe, _ in pipes.values()])
+
+
+def _pipeline(pipes, storage):
+    server = storage.server_key()
+    if server not in pipes:
+        pipes[server] = (storage._redis.pipeline(transaction=True), [])
+    return pipes[server]
+
+
+class AsyncStorage(metaclass=ABCMeta):
+    '''The async counterpart of :class:`datasketch.storage.Storage`'''
+
+    @abstractmethod
+    async def keys(self):
+        '''Return a list of keys in storage'''
+        pass
+
+    @abstractmethod
+    async def get(self, key):
+        '''Get list of values associated with a key
+
+        Returns empty list ([]) if `key` is not found
+        '''
+        pass
+
+    async def getmany(self, *keys):
+        return [await self.get(key) for key in keys]
+
+    @abstractmethod
+    async def insert(self, key, *vals):
+        '''Add `val` to storage against `key`'''
+        pass
+
+    @abstractmethod
+    async def remove(self, *keys):
+        '''Remove `keys` from storage'''
+        pass
+
+    @abstractmethod
+    async def remove_val(self, key, val):
+        '''Remove `val` from list of values under `key`'''
+        pass
+
+    @abstractmethod
+    async def size(self):
+        '''Return size of storage with respect to number of keys'''
+        pass
+
+    @abstractmethod
+    async def itemcounts(self):
+        '''Returns the number of items stored under each key'''
+        pass
+
+    @abstractmethod
+    async def has_key(self, key):
+        '''Determines whether the key is in the storage or not'''
+        pass
+
+
+class AsyncOrderedStorage(AsyncStorage):
+
+    pass
+
+
+class AsyncUnorderedStorage(AsyncStorage):
+
+    pass
+
+
+class AsyncDictListStorage(AsyncOrderedStorage):
+    '''An in-memory async storage, backed by a
+    :class:`datasketch.storage.DictListStorage`'''
+    storage_type = DictListStorage
+
+    def __init__(self, config):
+        self._storage = self.storage_type(config)
+
+    async def keys(self):
+        return list(self._storage.keys())
+
+    async def get(self, key):
+        return self._storage.get(key)
+
+    async def insert(self, key, *vals):
+        self._storage.insert(key, *vals)
+
+    async def remove(self, *keys):
+        self._storage.remove(*keys)
+
+    async def remove_val(self, key, val):
+        # Remove empty keys, as Redis does
+        self._storage.remove_val(key, val)
+        if not self._storage.get(key):
+            self._storage.remove(key)
+
+    async def size(self):
+        return self._storage.size()
+
+    async def itemcounts(self):
+        return self._storage.itemcounts()
+
+    async def has_key(self, key):
+        return self._storage.has_key(key)
+
+
+class AsyncDictSetStorage(AsyncUnorderedStorage, AsyncDictListStorage):
+    storage_type = DictSetStorage
+
+
+class AsyncRedisStorage(object):
+
+    def __init__(self, config, name=None, connections=None):
+        if aioredis is None:
+            raise ImportError("The async Redis storage requires redis-py 4.2 or "
+                              "newer: pip install datasketch[aio]")
+        self.config = config
+        if name is None:
+            name = _random_name(11)
+        self._name = name
+        if connections is None:
+            connections = dict()
+        server = self.server_key()
+        if server not in connections:
+            connections[server] = aioredis.Redis(
+                **parse_redis_config(self.config['redis']))
+        self._redis = connections[server]
+
+    def server_key(self):
+        '''Return a hashable identifying the Redis server'''
+        return repr(sorted(parse_redis_config(self.config['redis']).items()))
+
+    def redis_key(self, key):
+        return self._name + key
+
+
+class AsyncRedisListStorage(AsyncOrderedStorage, AsyncRedisStorage):
+
+    async def keys(self):
+        return await self._redis.hkeys(self._name)
+
+    async def get(self, key):
+        return await self._get_items(self._redis, self.redis_key(key))
+
+    async def getmany(self, *keys):
+        pipe = self._redis.pipeline(transaction=True)
+        for key in keys:
+            self._get_items(pipe, self.redis_key(key))
+        return await pipe.execute()
+
+    @staticmethod
+    def _get_items(r, k):
+        return r.lrange(k, 0, -1)
+
+    async def remove(self, *keys):
+        pipe = self._redis.pipeline(transaction=True)
+        pipe.hdel(self._name, *keys)
+        pipe.delete(*[self.redis_key(key) for key in keys])
+        await pipe.execute()
+
+    async def remove_val(self, key, val):
+        redis_key = self.redis_key(key)
+        await self._remove_item(self._redis, redis_key, val)
+        if not await self._redis.exists(redis_key):
+            await self._redis.hdel(self._name, key)
+
+    @staticmethod
+    def _remove_item(r, k, val):
+        return r.lrem(k, 0, val)
+
+    async def insert(self, key, *vals):
+        pipe = self._redis.pipeline(transaction=True)
+        self._insert(pipe, key, *vals)
+        await pipe.execute()
+
+    def _insert(self, pipe, key, *values):
+        redis_key = self.redis_key(key)
+        pipe.hset(self._name, key, redis_key)
+        pipe.rpush(redis_key, *values)
+
+    async def size(self):
+        return await self._redis.hlen(self._name)
+
+    async def itemcounts(self):
+        ks = await self.keys()
+        pipe = self._redis.pipeline(transaction=True)
+        for k in ks:
+            self._get_len(pipe, self.redis_key(k))
+        return dict(zip(ks, await pipe.execute()))
+
+    @staticmethod
+    def _get_len(r, k):
+        return r.llen(k)
+
+    async def has_key(self, key):
+        return await self._redis.hexists(self._name, key)
+
+
+class AsyncRedisSetStorage(AsyncUnorderedStorage, AsyncRedisListStorage):
+
+    @staticmethod
+    def _get_items(r, k):
+        return r.smembers(k)
+
+    @staticmethod
+    def _remove_item(r, k, val):
+        return r.srem(k, val)
+
+    def _insert(self, pipe, key, *values):
+        redis_key = self.redis_key(key)
+        pipe.hset(self._name, key, redis_key)
+        pipe.sadd(redis_key, *values)
+
+    @staticmethod
+    def _get_len(r, k):
+        return r.scard(k)
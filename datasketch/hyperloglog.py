@@ -15,6 +15,18 @@ if not hasattr(int, 'bit_length'):
     _bit_length = lambda bits : len(bin(bits)) - 2 if bits > 0 else 0
 
 
+def _bit_lengths(bits):
+    '''
+    Get the bit lengths of an array of unsigned 64-bit integers. The
+    exponents given by `numpy.frexp` are the bit lengths of integers exactly
+    represented by floats, so the high and the low 32 bits are taken apart.
+    '''
+    high = bits >> np.uint64(32)
+    low = bits & np.uint64(0xffffffff)
+    return np.where(high > 0, np.frexp(high.astype(np.float64))[1] + 32,
+                    np.frexp(low.astype(np.float64))[1])
+
+
 class HyperLogLog(object):
     '''
     The HyperLogLog data sketch for estimating
@@ -102,6 +114,54 @@ class HyperLogLog(object):
         # Update the register
         self.reg[reg_index] = max(self.reg[reg_index], self._get_rank(bits))
 
+    def update_batch(self, b):
+        '''
+        Update the HyperLogLog with many data values in bytes at once.
+        Every value is still hashed on its own, but the registers are
+        updated by :func:`datasketch.HyperLogLog.update_hashes`.
+
+        Args:
+            b (`iterable` of bytes): Values of type `bytes`.
+        '''
+        digests = b''.join(self.hashobj(v).digest()[:self._hash_range_byte]
+                           for v in b)
+        self.update_hashes(np.frombuffer(digests,
+                           dtype='<u%d' % self._hash_range_byte))
+
+    def update_hashes(self, hashvalues):
+        '''
+        Update the HyperLogLog with the hash values of data values, computing
+        the indexes of the registers and the ranks of all hash values with
+        vectorized bit operations. This is the same as calling
+        :func:`datasketch.HyperLogLog.update` with values whose hash values
+        are the given ones.
+
+        Args:
+            hashvalues (numpy.array): The hash values, unsigned integers of
+                `_hash_range_bit` bits (i.e., 32 bits for HyperLogLog and 64
+                bits for HyperLogLog++).
+        '''
+        hv = np.asarray(hashvalues).astype(np.uint64).ravel()
+        if self._hash_range_bit < 64 and \
+                np.any(hv >> np.uint64(self._hash_range_bit)):
+            raise ValueError("Hash value overflow, maximum size is %d\
+                    bits" % self._hash_range_bit)
+        # Get the index of the register using the first p bits of the hash
+        reg_index = (hv & np.uint64(self.m - 1)).astype(np.intp)
+        # Get the rank of the rest of the hash
+        ranks = self.max_rank - _bit_lengths(hv >> np.uint64(self.p)) + 1
+        if len(hv) < self.m:
+            np.maximum.at(self.reg, reg_index, ranks.astype(self.reg.dtype))
+            return
+        # Mark the ranks seen by every register and take the largest one,
+        # which is much faster than numpy.maximum.at for large batches.
+        # The ranks are positive, so the rank 0 marks the empty registers.
+        seen = np.zeros((self.m, self.max_rank + 2), dtype=bool)
+        seen[:, 0] = True
+        seen[reg_index, ranks] = True
+        largest = seen.shape[1] - 1 - np.argmax(seen[:, ::-1], axis=1)
+        np.maximum(self.reg, largest.astype(self.reg.dtype), out=self.reg)
+
     def count(self):
         '''
         Estimate the cardinality of the data values seen so far.
@@ -1,5 +1,15 @@
+from collections import Counter, OrderedDict, defaultdict, deque
+from contextlib import contextmanager
+import itertools
+import multiprocessing
+import threading
+import numpy as np
 from datasketch.storage import (
-    ordered_storage, unordered_storage)
+    ordered_storage, unordered_storage, storage_name, freeze, frozen_storages,
+    FrozenSetStorage, RedisStorage, ShardedRedisStorage, multi_get,
+    multi_insert, multi_remove_val, multi_remove)
+from datasketch.persistence import save_arrays, load_arrays, KeyArray
+from datasketch.signature_store import SignatureStore, FrozenSignatureStore
 
 _integration_precision = 0.001
 def _integration(f, a, b):
@@ -50,6 +60,30 @@ def _optimal_param(threshold, num_perm, false_positive_weight,
     return opt
 
 
+def _init_params(threshold, num_perm, weights, params):
+    '''
+    Validate the arguments of a `MinHashLSH` index and return its parameters
+    `(b, r)`: `params` if given, otherwise the optimal ones for the
+    threshold and the weights.
+    '''
+    if threshold > 1.0 or threshold < 0.0:
+        raise ValueError("threshold must be in [0.0, 1.0]")
+    if num_perm < 2:
+        raise ValueError("Too few permutation functions")
+    if any(w < 0.0 or w > 1.0 for w in weights):
+        raise ValueError("Weight must be in [0.0, 1.0]")
+    if sum(weights) != 1.0:
+        raise ValueError("Weights must sum to 1.0")
+    if params is not None:
+        b, r = params
+        if b * r > num_perm:
+            raise ValueError("The product of b and r must be less than num_perm")
+        return b, r
+    false_positive_weight, false_negative_weight = weights
+    return _optimal_param(threshold, num_perm,
+            false_positive_weight, false_negative_weight)
+
+
 class MinHashLSH(object):
     '''
     The :ref:`minhash_lsh` index. 
@@ -74,7 +108,23 @@ class MinHashLSH(object):
             step in the constructor. `threshold` and `weights` will be ignored 
             if this is given.
         storage_config (dict, optional): Type of storage service to use for storing
-            hashtables and keys.
+            hashtables and keys. With a `basename` (e.g.,
+            :code:`{'type': 'redis', 'basename': b'docs', 'redis': {...}}`),
+            the Redis keys of the index are prefixed by the basename instead
+            of random names, so the index can be reopened with the same config.
+            The config is kept in the `storage_config` attribute, which is
+            updated by :func:`datasketch.MinHashLSH.add_shard` and
+            :func:`datasketch.MinHashLSH.remove_shard`.
+        retain_signatures (bool, optional): If True, the index also keeps
+            the hash values of every inserted MinHash in a compact
+            :class:`datasketch.signature_store.SignatureStore`, which is
+            used by :func:`datasketch.MinHashLSH.query_ranked` to verify and
+            rank candidates.
+        concurrent (bool, optional): If True, many threads can query the index
+            while one thread at a time inserts or removes keys, without
+            locking out the readers: the dict storages are copy-on-write,
+            so a query never sees a bucket being modified, and writes are
+            serialized by a lock.
 
     Note: 
         `weights` must sum to 1.0, and the format is 
@@ -85,27 +135,24 @@ class MinHashLSH(object):
     '''
 
     def __init__(self, threshold=0.9, num_perm=128, weights=(0.5,0.5),
-                 params=None, storage_config={'type': 'dict'}):
-        if threshold > 1.0 or threshold < 0.0:
-            raise ValueError("threshold must be in [0.0, 1.0]") 
-        if num_perm < 2:
-            raise ValueError("Too few permutation functions")
-        if any(w < 0.0 or w > 1.0 for w in weights):
-            raise ValueError("Weight must be in [0.0, 1.0]")
-        if sum(weights) != 1.0:
-            raise ValueError("Weights must sum to 1.0")
+                 params=None, storage_config={'type': 'dict'},
+                 retain_signatures=False, concurrent=False):
+        self.b, self.r = _init_params(threshold, num_perm, weights, params)
+        self.threshold = threshold
         self.h = num_perm
-        if params is not None:
-            self.b, self.r = params
-            if self.b * self.r > num_perm:
-                raise ValueError("The product of b and r must be less than num_perm")
-        else:
-            false_positive_weight, false_negative_weight = weights
-            self.b, self.r = _optimal_param(threshold, num_perm,
-                    false_positive_weight, false_negative_weight)
-        self.hashtables = [unordered_storage(storage_config) for _ in range(self.b)]
+        self.storage_config = storage_config
+        if concurrent:
+            storage_config = dict(storage_config, copy_on_write=True)
+        self._write_lock = threading.Lock() if concurrent else None
+        # Storages on the same Redis server share a connection and a buffer
+        connections = dict()
+        self.hashtables = [unordered_storage(storage_config, connections,
+                           name=storage_name(storage_config, b'_bucket_%05d' % i))
+                           for i in range(self.b)]
         self.hashranges = [(i*self.r, (i+1)*self.r) for i in range(self.b)]
-        self.keys = ordered_storage(storage_config)
+        self.keys = ordered_storage(storage_config, connections,
+                                    name=storage_name(storage_config, b'_keys'))
+        self.signatures = SignatureStore(num_perm) if retain_signatures else None
 
     def insert(self, key, minhash):
         '''
@@ -128,17 +175,142 @@ class MinHashLSH(object):
         '''
         return MinHashLSHInsertionSession(self)
 
+    @contextmanager
+    def _writing(self):
+        if self._write_lock is None:
+            yield
+        else:
+            with self._write_lock:
+                yield
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_write_lock'] = self._write_lock is not None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__ = state
+        self._write_lock = threading.Lock() if state.get('_write_lock') else None
+
     def _insert(self, key, minhash, check_duplication=True, buffer=False):
         if len(minhash) != self.h:
             raise ValueError("Expecting minhash with length %d, got %d"
                     % (self.h, len(minhash)))
-        if check_duplication and key in self.keys:
-            raise ValueError("The given key already exists")
         Hs = [self._H(minhash.hashvalues[start:end])
               for start, end in self.hashranges]
-        self.keys.insert(key, *Hs, buffer=buffer)
-        for H, hashtable in zip(Hs, self.hashtables):
-            hashtable.insert(H, key, buffer=buffer)
+        with self._writing():
+            if check_duplication and key in self.keys:
+                raise ValueError("The given key already exists")
+            # The signature is added before the key can be found in the
+            # bands, so a concurrent query_ranked always finds it
+            if self.signatures is not None:
+                self.signatures.add(key, minhash.hashvalues)
+            multi_insert([(self.keys, key, Hs)] +
+                         [(hashtable, H, (key,))
+                          for H, hashtable in zip(Hs, self.hashtables)],
+                         buffer=buffer)
+
+    def merge(self, other):
+        '''
+        Merge the other index into this one, e.g., to add a daily
+        incremental build into the main index.
+        Both must have the same number of permutation functions and the
+        same `b` and `r`, and must not share any key.
+
+        Args:
+            other (datasketch.MinHashLSH): The other index.
+        '''
+        if (self.h, self.b, self.r) != (other.h, other.b, other.r):
+            raise ValueError("Cannot merge MinHashLSH with different\
+                    num_perm, b or r")
+        if self.signatures is not None and other.signatures is None:
+            raise ValueError("Cannot merge MinHashLSH without retained\
+                    signatures into one with retained signatures")
+        keys = list(other.keys.keys())
+        tables = []
+        for hashtable in other.hashtables:
+            Hs = list(hashtable.keys())
+            tables.append(zip(Hs, hashtable.getmany(*Hs)))
+        hashvalues = None
+        if self.signatures is not None:
+            hashvalues = other.signatures.get(keys)
+        self._merge_partial(list(zip(keys, other.keys.getmany(*keys))),
+                            tables, hashvalues)
+
+    def build_parallel(self, entries, n_jobs=None, chunk_size=10000):
+        '''
+        Insert many keys using worker processes: each worker computes the
+        band hash values of a chunk of the entries and builds partial
+        hashtables, which are then merged into this index.
+
+        Args:
+            entries (`iterable` of `tuple`): An iterable of tuples, each must be
+                in the form of `(key, minhash)`.
+            n_jobs (int, optional): The number of worker processes.
+                Default is the number of CPUs.
+            chunk_size (int, optional): The number of entries sent to a worker
+                at a time.
+
+        Note:
+            The entries are read lazily, a few chunks at a time, so only
+            the keys read so far are kept in memory. If a MinHash has the
+            wrong length, or a key is repeated or already exists, the keys
+            inserted so far are removed, leaving the index unchanged.
+        '''
+        if n_jobs is None:
+            n_jobs = multiprocessing.cpu_count()
+        entries = iter(entries)
+        seen = set()
+        merged = []
+        pending = deque()
+        pool = multiprocessing.Pool(n_jobs)
+        try:
+            while True:
+                chunk = list(itertools.islice(entries, chunk_size))
+                for key, minhash in chunk:
+                    if len(minhash) != self.h:
+                        raise ValueError("Expecting minhash with length %d, got %d"
+                                % (self.h, len(minhash)))
+                    if key in seen or key in self.keys:
+                        raise ValueError("The given key already exists")
+                    seen.add(key)
+                if chunk:
+                    pending.append(pool.apply_async(_build_partial, [(
+                        self.hashranges, self.signatures is not None,
+                        [(key, minhash.hashvalues) for key, minhash in chunk])]))
+                # Two chunks per worker are in flight while merging
+                while pending and (not chunk or len(pending) > 2*n_jobs):
+                    keys_Hs, tables, hashvalues = pending.popleft().get()
+                    self._merge_partial(keys_Hs, tables, hashvalues,
+                                        checked=True)
+                    merged.extend(key for key, _ in keys_Hs)
+                if not chunk:
+                    break
+        except:
+            pool.terminate()
+            if merged:
+                self.remove_many(merged)
+            raise
+        pool.close()
+        pool.join()
+
+    def _merge_partial(self, keys_Hs, tables, hashvalues=None, checked=False):
+        with self._writing():
+            if not checked:
+                seen = set()
+                for key, _ in keys_Hs:
+                    if key in seen or key in self.keys:
+                        raise ValueError("The given key already exists")
+                    seen.add(key)
+            if self.signatures is not None:
+                for (key, _), hv in zip(keys_Hs, hashvalues):
+                    self.signatures.add(key, hv)
+            self.keys.insert_many(keys_Hs, buffer=True)
+            for table, hashtable in zip(tables, self.hashtables):
+                hashtable.insert_many(table, buffer=True)
+            self.keys.empty_buffer()
+            for hashtable in self.hashtables:
+                hashtable.empty_buffer()
 
     def query(self, minhash):
         '''
@@ -156,12 +328,97 @@ class MinHashLSH(object):
             raise ValueError("Expecting minhash with length %d, got %d"
                     % (self.h, len(minhash)))
         candidates = set()
-        for (start, end), hashtable in zip(self.hashranges, self.hashtables):
-            H = self._H(minhash.hashvalues[start:end])
-            for key in hashtable.get(H):
-                candidates.add(key)
+        if not self._pipelined():
+            for (start, end), hashtable in zip(self.hashranges, self.hashtables):
+                candidates.update(hashtable.get(
+                    self._H(minhash.hashvalues[start:end])))
+            return list(candidates)
+        for keys in multi_get([(hashtable, self._H(minhash.hashvalues[start:end]))
+                               for (start, end), hashtable
+                               in zip(self.hashranges, self.hashtables)]):
+            candidates.update(keys)
         return list(candidates)
 
+    def _pipelined(self):
+        # Batching the requests of all hashtables only saves round trips
+        # on Redis storages, and is slower on in-memory storages
+        return isinstance(self.keys, (RedisStorage, ShardedRedisStorage))
+
+    def query_ranked(self, minhash, top_k=None):
+        '''
+        Giving the MinHash of the query set, retrieve the keys that
+        references sets with estimated Jaccard similarities greater than
+        the threshold, ranked by the similarities.
+        Unlike :func:`datasketch.MinHashLSH.query`, false positives
+        below the threshold are removed, by estimating the
+        similarities of all candidates at once using the retained hash values.
+
+        Args:
+            minhash (datasketch.MinHash): The MinHash of the query set.
+            top_k (int, optional): The maximum number of keys to return.
+
+        Returns:
+            `list` of `(key, jaccard)` tuples sorted by the Jaccard
+            similarities in descending order.
+
+        Note:
+            The index must be created with `retain_signatures=True`.
+        '''
+        if self.signatures is None:
+            raise ValueError("Ranked query requires an index created with\
+                    retain_signatures=True")
+        if top_k is not None and top_k <= 0:
+            raise ValueError("top_k must be positive")
+        candidates = self.query(minhash)
+        sims = self.signatures.jaccard(minhash.hashvalues, candidates)
+        # The keys removed by a concurrent writer after the query have NaN
+        # similarities, and are skipped
+        order = np.flatnonzero(sims >= self.threshold)
+        if top_k is not None and top_k < len(order):
+            order = order[np.argpartition(-sims[order], top_k-1)[:top_k]]
+        order = order[np.argsort(-sims[order], kind='mergesort')]
+        return [(candidates[i], float(sims[i])) for i in order]
+
+    def query_band_counts(self, minhash, min_bands=1, top_k=None):
+        '''
+        Giving the MinHash of the query set, retrieve the candidate keys
+        together with the number of bands in which each candidate collides
+        with the query. The count is a cheap proxy for the Jaccard
+        similarity, useful for pruning candidates before verification.
+
+        Args:
+            minhash (datasketch.MinHash): The MinHash of the query set.
+            min_bands (int, optional): The minimum number of colliding bands
+                for a candidate to be returned.
+            top_k (int, optional): The maximum number of keys to return.
+
+        Returns:
+            `list` of `(key, count)` tuples sorted by the counts in
+            descending order.
+        '''
+        if len(minhash) != self.h:
+            raise ValueError("Expecting minhash with length %d, got %d"
+                    % (self.h, len(minhash)))
+        if min_bands < 1 or min_bands > self.b:
+            raise ValueError("min_bands must be in [1, b]")
+        if top_k is not None and top_k <= 0:
+            raise ValueError("top_k must be positive")
+        Hs = [self._H(minhash.hashvalues[start:end])
+              for start, end in self.hashranges]
+        if all(isinstance(t, FrozenSetStorage) for t in self.hashtables):
+            # Count collisions over internal ids
+            ids = np.concatenate([t.ids(H) for H, t in zip(Hs, self.hashtables)])
+            counts = np.bincount(ids)
+            ids = np.flatnonzero(counts >= min_bands)
+            order = np.argsort(-counts[ids], kind='mergesort')[:top_k]
+            key_array = self.hashtables[0].key_array
+            return [(key_array.key(i), int(counts[i])) for i in ids[order]]
+        counts = Counter()
+        for keys in multi_get(list(zip(self.hashtables, Hs))):
+            counts.update(keys)
+        return [(key, c) for key, c in counts.most_common(top_k)
+                if c >= min_bands]
+
     def __contains__(self, key):
         '''
         Args:
@@ -179,13 +436,159 @@ class MinHashLSH(object):
         Args:
             key (hashable): The unique identifier of a set.
         '''
-        if key not in self.keys:
-            raise ValueError("The given key does not exist")
-        for H, hashtable in zip(self.keys[key], self.hashtables):
-            hashtable.remove_val(H, key)
-            if not hashtable.get(H):
-                hashtable.remove(H)
-        self.keys.remove(key)
+        if self._pipelined():
+            self.remove_many([key])
+            return
+        with self._writing():
+            if key not in self.keys:
+                raise ValueError("The given key does not exist")
+            for H, hashtable in zip(self.keys[key], self.hashtables):
+                hashtable.remove_val(H, key)
+                if not hashtable.get(H):
+                    hashtable.remove(H)
+            self.keys.remove(key)
+            # The signature is removed once the key cannot be found
+            if self.signatures is not None:
+                self.signatures.remove(key)
+
+    def remove_many(self, keys):
+        '''
+        Remove many keys from the index at once. The removals are batched
+        for each hashtable, and the buckets left empty are removed in bulk,
+        so a Redis storage takes three round trips for the whole batch.
+
+        Args:
+            keys (`iterable` of hashable): The unique identifiers of sets.
+        '''
+        keys = list(OrderedDict.fromkeys(keys))
+        if not keys:
+            return
+        with self._writing():
+            Hss = self.keys.getmany(*keys)
+            if any(len(Hs) == 0 for Hs in Hss):
+                raise ValueError("The given key does not exist")
+            removals = [defaultdict(list) for _ in self.hashtables]
+            for key, Hs in zip(keys, Hss):
+                for H, bucket in zip(Hs, removals):
+                    bucket[H].append(key)
+            self._rewrite(removals, keys, [])
+            # The signatures are removed once the keys cannot be found
+            if self.signatures is not None:
+                for key in keys:
+                    self.signatures.remove(key)
+
+    def update(self, key, minhash):
+        '''
+        Replace the MinHash of a key, or insert the key if it does not
+        exist. The key is only moved in the bands whose hash values
+        changed, instead of removing and inserting it in every band.
+
+        Args:
+            key (hashable): The unique identifier of the set.
+            minhash (datasketch.MinHash): The new MinHash of the set.
+        '''
+        self.update_many([(key, minhash)])
+
+    def update_many(self, entries):
+        '''
+        Replace the MinHashes of many keys at once, or insert the keys that
+        do not exist. The changes are batched for each hashtable,
+        as in :func:`datasketch.MinHashLSH.remove_many`.
+
+        Args:
+            entries (`iterable` of `tuple`): An iterable of tuples, each must be
+                in the form of `(key, minhash)`.
+        '''
+        entries = OrderedDict(entries)
+        for minhash in entries.values():
+            if len(minhash) != self.h:
+                raise ValueError("Expecting minhash with length %d, got %d"
+                        % (self.h, len(minhash)))
+        if not entries:
+            return
+        keys = list(entries)
+        new_Hss = [[self._H(minhash.hashvalues[start:end])
+                    for start, end in self.hashranges]
+                   for minhash in entries.values()]
+        with self._writing():
+            removals = [defaultdict(list) for _ in self.hashtables]
+            removed_keys = []
+            insertions = []
+            for key, old_Hs, new_Hs in zip(keys, self.keys.getmany(*keys), new_Hss):
+                old_Hs = list(old_Hs)
+                if old_Hs == new_Hs:
+                    continue
+                if old_Hs:
+                    removed_keys.append(key)
+                insertions.append((self.keys, key, new_Hs))
+                for i, (hashtable, new_H) in enumerate(zip(self.hashtables, new_Hs)):
+                    if old_Hs and old_Hs[i] == new_H:
+                        continue
+                    if old_Hs:
+                        removals[i][old_Hs[i]].append(key)
+                    insertions.append((hashtable, new_H, (key,)))
+            if self.signatures is not None:
+                for key, minhash in entries.items():
+                    self.signatures.add(key, minhash.hashvalues)
+            self._rewrite(removals, removed_keys, insertions)
+
+    def _rewrite(self, removals, removed_keys, insertions):
+        '''Remove keys from the buckets in `removals` (one dict from bucket
+        to keys for each hashtable), remove the buckets left empty and the
+        `removed_keys` from the keys storage, then apply the `insertions`.'''
+        requests = [(hashtable, H, vals)
+                    for hashtable, bucket in zip(self.hashtables, removals)
+                    for H, vals in bucket.items()]
+        empty = multi_remove_val(requests)
+        empty_buckets = defaultdict(list)
+        for (hashtable, H, _), is_empty in zip(requests, empty):
+            if is_empty:
+                empty_buckets[id(hashtable)].append(H)
+        multi_remove([(self.keys, removed_keys)] +
+                     [(hashtable, empty_buckets[id(hashtable)])
+                      for hashtable in self.hashtables])
+        if insertions:
+            multi_insert(insertions)
+
+    def add_shard(self, redis_config):
+        '''
+        Add a Redis server as a new shard of the keys and all hashtables of
+        an index with a `redis_sharded` storage, and move to it the keys that
+        it is now responsible for. The server is also added to the
+        `storage_config` of the index, which can be used to reopen it.
+
+        Args:
+            redis_config (dict): The parameters of the Redis server, as in
+                the `redis` list of the storage config.
+        '''
+        self._check_sharded()
+        with self._writing():
+            for storage in [self.keys] + self.hashtables:
+                storage.add_shard(redis_config)
+            self.storage_config = dict(self.storage_config,
+                                       redis=self.keys.config['redis'])
+
+    def remove_shard(self, redis_config):
+        '''
+        Remove a Redis server from the shards of the keys and all hashtables
+        of an index with a `redis_sharded` storage, and move its keys to the
+        remaining shards. The server is also removed from the
+        `storage_config` of the index.
+
+        Args:
+            redis_config (dict): The parameters of the Redis server, as in
+                the `redis` list of the storage config.
+        '''
+        self._check_sharded()
+        with self._writing():
+            for storage in [self.keys] + self.hashtables:
+                storage.remove_shard(redis_config)
+            self.storage_config = dict(self.storage_config,
+                                       redis=self.keys.config['redis'])
+
+    def _check_sharded(self):
+        if not isinstance(self.keys, ShardedRedisStorage):
+            raise ValueError("The index does not use a redis_sharded storage")
 
     def is_empty(self):
         '''
@@ -205,13 +608,79 @@ class MinHashLSH(object):
         if b > len(self.hashtables):
             raise ValueError("b must be less or equal to the number of hash tables")
         candidates = set()
-        for (start, end), hashtable in zip(self.hashranges[:b], self.hashtables[:b]):
-            H = self._H(minhash.hashvalues[start:end])
-            if H in hashtable:
-                for key in hashtable[H]:
-                    candidates.add(key)
+        for keys in multi_get([(hashtable, self._H(minhash.hashvalues[start:end]))
+                               for (start, end), hashtable
+                               in zip(self.hashranges[:b], self.hashtables[:b])]):
+            candidates.update(keys)
         return candidates
 
+    def save(self, path):
+        '''
+        Save the index to a file in a versioned binary format, which can be
+        loaded by :func:`datasketch.MinHashLSH.load` without unpickling.
+
+        Args:
+            path (str): The path of the file.
+
+        Note:
+            Keys must be of type `bytes`, `str` or `int`.
+        '''
+        meta, arrays = self._to_arrays()
+        save_arrays(path, 'MinHashLSH', meta, arrays)
+
+    def _to_arrays(self):
+        arrays = freeze(self.keys, self.hashtables)
+        if self.signatures is not None:
+            key_array = KeyArray(arrays['key_data'], arrays['key_offsets'])
+            arrays['signatures'] = self.signatures.get(
+                [key_array.key(i) for i in range(len(key_array))])
+        return {'h': self.h, 'b': self.b, 'r': self.r,
+                'threshold': self.threshold}, arrays
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        '''
+        Load an index saved by :func:`datasketch.MinHashLSH.save`.
+
+        Args:
+            path (str): The path of the file.
+            mmap (bool, optional): If True, the index is a read-only view of
+                the memory-mapped file: loading is near-instant and the pages
+                are shared by all processes loading the same file.
+                Otherwise, the index is read into a regular dict storage and
+                can be modified.
+
+        Returns:
+            datasketch.MinHashLSH
+        '''
+        meta, arrays = load_arrays(path, 'MinHashLSH', mmap=mmap)
+        return cls._from_arrays(meta, arrays, mmap)
+
+    @classmethod
+    def _from_arrays(cls, meta, arrays, mmap):
+        # Older files do not record the threshold, which is only informative
+        # once the parameters are set, so fall back to the default.
+        lsh = cls(threshold=meta.get('threshold', 0.9), num_perm=meta['h'],
+                  params=(meta['b'], meta['r']))
+        keys, hashtables = frozen_storages(arrays, lsh.b)
+        if 'signatures' in arrays:
+            lsh.signatures = FrozenSignatureStore(arrays['signatures'],
+                                                  keys.key_array)
+        if mmap:
+            lsh.keys, lsh.hashtables = keys, hashtables
+            return lsh
+        signatures = lsh.signatures
+        if signatures is not None:
+            lsh.signatures = SignatureStore(lsh.h)
+        for i, key in enumerate(keys.keys()):
+            Hs = keys.get(key)
+            lsh.keys.insert(key, *Hs)
+            for H, hashtable in zip(Hs, lsh.hashtables):
+                hashtable.insert(H, key)
+            if signatures is not None:
+                lsh.signatures.add(key, signatures.signatures[i])
+        return lsh
+
     def get_counts(self):
         '''
         Returns a list of length ``self.b`` with elements representing the
@@ -240,20 +709,79 @@ class MinHashLSH(object):
         return [hashtable.itemcounts() for hashtable in hashtables]
 
 
+def _build_partial(args):
+    '''Compute the band hash values and partial hashtables of a chunk of
+    `(key, hashvalues)` in a worker process of
+    :func:`datasketch.MinHashLSH.build_parallel`.'''
+    hashranges, retain_signatures, entries = args
+    keys_Hs = []
+    tables = [defaultdict(list) for _ in hashranges]
+    for key, hashvalues in entries:
+        Hs = [MinHashLSH._H(hashvalues[start:end]) for start, end in hashranges]
+        keys_Hs.append((key, Hs))
+        for H, table in zip(Hs, tables):
+            table[H].append(key)
+    hashvalues = None
+    if retain_signatures:
+        hashvalues = [hv for _, hv in entries]
+    return keys_Hs, [list(table.items()) for table in tables], hashvalues
+
+
 class MinHashLSHInsertionSession:
     '''Context manager for batch insertion of documents into a MinHashLSH.
+    Updates and removals are buffered too, and are applied in batch after
+    the buffered insertions when the session ends: first the updates,
+    then the removals.
     '''
 
-    def __init__(self, lsh):
+    def __init__(self, lsh, buffer_size=50000):
         self.lsh = lsh
+        self.buffer_size = buffer_size
+        self._updates = OrderedDict()
+        self._removals = []
 
     def __enter__(self):
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
+        self._flush()
+
+    def _flush(self):
         self.lsh.keys.empty_buffer()
         for hashtable in self.lsh.hashtables:
             hashtable.empty_buffer()
+        updates, self._updates = self._updates, OrderedDict()
+        self.lsh.update_many(updates.items())
+        removals, self._removals = self._removals, []
+        self.lsh.remove_many(removals)
+
+    def update(self, key, minhash):
+        '''
+        Replace the MinHash of a key, or insert the key if it does not
+        exist, when the session ends or once `buffer_size` updates are
+        buffered.
+
+        Args:
+            key (hashable): The unique identifier of the set.
+            minhash (datasketch.MinHash): The new MinHash of the set.
+        '''
+        self._updates[key] = minhash
+        if len(self._updates) >= self.buffer_size:
+            self._flush()
+
+    def remove(self, key):
+        '''
+        Remove the key from the index when the session ends, or once
+        `buffer_size` removals are buffered.
+        A key removed in a session cannot be inserted again in the
+        same session.
+
+        Args:
+            key (hashable): The unique identifier of a set.
+        '''
+        self._removals.append(key)
+        if len(self._removals) >= self.buffer_size:
+            self._flush()
 
     def insert(self, key, minhash, check_duplication=True):
         '''
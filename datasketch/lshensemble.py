@@ -1,6 +1,11 @@
 from collections import deque
+import itertools
 import numpy as np
 from datasketch.lsh import integrate, MinHashLSH
+from datasketch.lshforest import MinHashLSHForest
+from datasketch.persistence import save_arrays, load_arrays, KeyArray
+from datasketch.signature_store import SignatureStore, FrozenSignatureStore
+from datasketch.storage import multi_get, storage_name
 
 
 def _false_positive_probability(threshold, b, r, xq):
@@ -31,7 +36,7 @@ def _false_negative_probability(threshold, b, r, xq):
 
 
 def _optimal_param(threshold, num_perm, max_r, xq, false_positive_weight,
-        false_negative_weight):
+        false_negative_weight, max_b=None):
     '''
     Compute the optimal parameters that minimizes the weighted sum
     of probabilities of false positive and false negative.
@@ -39,7 +44,9 @@ def _optimal_param(threshold, num_perm, max_r, xq, false_positive_weight,
     '''
     min_error = float("inf")
     opt = (0, 0)
-    for b in range(1, num_perm+1):
+    if max_b is None:
+        max_b = num_perm
+    for b in range(1, max_b+1):
         for r in range(1, max_r+1):
             if b*r > num_perm:
                 continue
@@ -52,6 +59,147 @@ def _optimal_param(threshold, num_perm, max_r, xq, false_positive_weight,
     return opt
 
 
+def _optimal_params(threshold, num_perm, max_r, xqs, false_positive_weight,
+        false_negative_weight, max_b=None):
+    '''
+    Compute the optimal parameters of :func:`_optimal_param` for many
+    ratios xq at once. The probabilities of false positive and false
+    negative of all pairs of b and r are integrated together, by
+    Gauss-Legendre quadrature.
+
+    Returns:
+        numpy.array: The optimal `(b, r)` for every xq.
+    '''
+    if max_b is None:
+        max_b = num_perm
+    bs = np.arange(1, max_b+1, dtype=np.float64)[:, np.newaxis]
+    rs = np.arange(1, max_r+1, dtype=np.float64)[np.newaxis, :]
+    nodes, weights = np.polynomial.legendre.leggauss(_quadrature_nodes)
+
+    def _integrate(xq, lo, hi):
+        # The integral of the probability of a candidate over [lo, hi]
+        if hi <= lo:
+            return np.zeros((max_b, max_r))
+        t = (hi - lo) / 2.0 * nodes + (hi + lo) / 2.0
+        s = (t / (1 + xq - t))[:, np.newaxis, np.newaxis]
+        return (hi - lo) / 2.0 * np.tensordot(weights, 1 - (1 - s**rs)**bs,
+                                              axes=1)
+
+    params = np.zeros((len(xqs), 2), dtype=np.int64)
+    for i, xq in enumerate(xqs):
+        fp = _integrate(xq, 0.0, min(xq, threshold))
+        if xq >= threshold:
+            hi = min(xq, 1.0)
+            fn = (hi - threshold) - _integrate(xq, threshold, hi)
+        else:
+            fn = 0.0
+        error = fp*false_positive_weight + fn*false_negative_weight
+        error[bs*rs > num_perm] = np.inf
+        # The first minimum in the order of b then r, as _optimal_param
+        b, r = np.unravel_index(np.argmin(error), error.shape)
+        params[i] = (b + 1, r + 1)
+    return params
+
+
+# The number of Gauss-Legendre nodes used by _optimal_params
+_quadrature_nodes = 32
+
+# The ratios of set size over query size (xq) of the parameter tables, and
+# the tables already computed, by the arguments of _optimal_params
+_xqs = np.exp(np.linspace(-5, 5, 201))
+_param_tables = dict()
+
+
+# The maximum number of candidate partition boundaries considered by
+# _optimal_partitions, which takes time quadratic in it
+_max_bins = 512
+
+
+def _optimal_partitions(sizes, counts, num_part):
+    '''
+    Compute the partitions of the set sizes that minimize the expected
+    number of false positives. A set of size x in a partition whose
+    largest size is u is counted as (u - x) / u false positives, following
+    Section 5 of the paper; the total is minimized by dynamic programming.
+    With more than `_max_bins` distinct sizes, the boundaries are chosen
+    among the edges of `_max_bins` geometric bins of the sizes.
+
+    Args:
+        sizes (numpy.array): The distinct set sizes, in increasing order.
+        counts (numpy.array): The number of sets of each size.
+        num_part (int): The maximum number of partitions.
+
+    Returns:
+        numpy.array: The largest size of every partition, in increasing order.
+    '''
+    if len(sizes) <= _max_bins:
+        edges = np.arange(len(sizes)+1)
+    else:
+        # The error of a size is relative to the upper bound, so the bins
+        # are geometric. The last edge is set exactly, as rounding in
+        # logspace may put it below the largest size.
+        grid = np.logspace(np.log10(sizes[0]), np.log10(sizes[-1]),
+                           _max_bins+1)
+        grid[-1] = sizes[-1]
+        edges = np.unique(np.concatenate([[0],
+                np.searchsorted(sizes, grid[1:], side='right')]))
+    uppers = np.asarray(sizes, dtype=np.float64)[edges[1:]-1]
+    if len(uppers) <= num_part:
+        return np.asarray(sizes)[edges[1:]-1]
+    cum_counts = np.concatenate([[0], np.cumsum(counts, dtype=np.float64)])[edges]
+    cum_sizes = np.concatenate([[0], np.cumsum(np.multiply(counts, sizes,
+                                dtype=np.float64))])[edges]
+    # nfps[l, u] is the number of false positives of a partition from
+    # bin l to bin u
+    nfps = (cum_counts[np.newaxis, 1:] - cum_counts[:-1, np.newaxis]) - \
+           (cum_sizes[np.newaxis, 1:] - cum_sizes[:-1, np.newaxis]) / uppers
+    nfps[np.tril_indices(len(uppers), -1)] = np.inf
+    # cost[u] is the minimum number of false positives of k partitions
+    # covering the bins up to u
+    cost = nfps[0]
+    starts = []
+    for _ in range(1, num_part):
+        total = cost[:-1, np.newaxis] + nfps[1:]
+        start = np.argmin(total, axis=0)
+        cost = total[start, np.arange(len(uppers))]
+        starts.append(start + 1)
+    bounds = []
+    u = len(uppers) - 1
+    for start in reversed(starts):
+        bounds.append(u)
+        u = start[u] - 1
+    bounds.append(u)
+    return np.asarray(sizes)[edges[1:]-1][bounds[::-1]]
+
+
+class _FrozenDict(object):
+    '''
+    A read-only mapping from the keys of a
+    :class:`datasketch.persistence.KeyArray` to the values of an array
+    aligned to it, e.g., loaded from a memory-mapped file.
+    '''
+
+    def __init__(self, key_array, values):
+        self.key_array = key_array
+        self.values = values
+
+    def __getitem__(self, key):
+        i = self.key_array.index(key)
+        if i < 0:
+            raise KeyError(key)
+        return self.values[i].item()
+
+    def __contains__(self, key):
+        return self.key_array.index(key) >= 0
+
+    def __len__(self):
+        return len(self.key_array)
+
+    def items(self):
+        return ((self.key_array.key(i), self.values[i].item())
+                for i in range(len(self.key_array)))
+
+
 class MinHashLSHEnsemble(object):
     '''
     The :ref:`minhash_lsh_ensemble` index. It supports 
@@ -74,13 +222,40 @@ class MinHashLSHEnsemble(object):
             minizing false positive and false negative when optimizing 
             for the Containment threshold. Similar to the `weights` parameter
             in :class:`datasketch.MinHashLSH`.
+        shared_bands (bool, optional): If True, every partition keeps a single
+            :class:`datasketch.MinHashLSHForest` with prefix trees of depth
+            `m`, whose prefixes of length `r` serve as the bands for every `r`,
+            as in the `Go implementation`_, instead of a
+            :class:`datasketch.MinHashLSH` for every `r`. This uses about
+            `1 / len(rs)` of the memory and build time, but limits the number
+            of bands `b` to `num_perm // m`.
+        partitioning (str, optional): How the sets are partitioned by size.
+            `equal` (the default) creates partitions of equal number of
+            sets. `optimal` chooses the partitions that minimize the
+            expected number of false positives given the distribution of
+            set sizes, as in `the paper`_, which matters for skewed (e.g.,
+            power-law) distributions.
+        retain_signatures (bool, optional): If True, the index also keeps
+            the hash values of every indexed MinHash in a compact
+            :class:`datasketch.signature_store.SignatureStore`, which is
+            used by :func:`datasketch.MinHashLSHEnsemble.query_ranked` to
+            verify and rank candidates.
+        storage_config (dict, optional): Type of storage service to use for
+            storing the hashtables and keys of every partition, as for
+            :class:`datasketch.MinHashLSH`. With a `basename`, the Redis keys
+            of every partition and `r` are prefixed by the basename followed
+            by the partition and `r`.
+        max_skew (float, optional): The partitions are rebuilt by
+            :func:`datasketch.MinHashLSHEnsemble.repartition` once insertions
+            and removals make a partition hold more than `max_skew` times
+            its share of the sets at the last partitioning.
 
     Note:
-        Using more partitions (`num_part`) leads to better accuracy, at the
-        expense of slower query performance.
-        This is different from `the paper`_ and the `Go implementation`_, in which
-        more partitions leads to better accuracy AND faster query performance,
-        due to parallelism.
+        Using more partitions (`num_part`) leads to better accuracy.
+        A query computes the hash values of its bands once for every `r`,
+        shared by all partitions, and then looks them up in the hashtables
+        of all partitions in a single batch (a single pipeline for each
+        Redis server), so more partitions add little to the query time.
 
     Note:
         More information about the parameter `m` can be found in the 
@@ -91,7 +266,10 @@ class MinHashLSHEnsemble(object):
     .. _`the paper`: http://www.vldb.org/pvldb/vol9/p1185-zhu.pdf
     '''
 
-    def __init__(self, threshold=0.9, num_perm=128, num_part=16, m=8, weights=(0.5,0.5)):
+    def __init__(self, threshold=0.9, num_perm=128, num_part=16, m=8,
+                 weights=(0.5,0.5), shared_bands=False,
+                 partitioning='equal', retain_signatures=False,
+                 storage_config={'type': 'dict'}, max_skew=2.0):
         if threshold > 1.0 or threshold < 0.0:
             raise ValueError("threshold must be in [0.0, 1.0]") 
         if num_perm < 2:
@@ -104,39 +282,108 @@ class MinHashLSHEnsemble(object):
             raise ValueError("Weight must be in [0.0, 1.0]")
         if sum(weights) != 1.0:
             raise ValueError("Weights must sum to 1.0")
+        if partitioning not in ('optimal', 'equal'):
+            raise ValueError("Unknown partitioning %s" % partitioning)
+        if max_skew < 1.0:
+            raise ValueError("max_skew must be at least 1.0")
         self.threshold = threshold
         self.h = num_perm
         self.m = m
+        self.shared_bands = shared_bands
+        self.partitioning = partitioning
+        self.max_skew = max_skew
         rs = self._init_optimal_params(weights)
-        # Initialize multiple LSH indexes for each partition
-        self.indexes = [dict((r, MinHashLSH(num_perm=self.h, params=(int(self.h/r), r))) for r in rs)
-                        for _ in range(0, num_part)] 
+        if shared_bands:
+            # A forest for each partition, which has a prefix tree for
+            # every band
+            self.indexes = [MinHashLSHForest(num_perm=self.h, l=self.h // m,
+                    storage_config=self._storage_config(storage_config,
+                                                        b'_part_%03d' % i))
+                            for i in range(0, num_part)]
+        else:
+            # Initialize multiple LSH indexes for each partition
+            self.indexes = [dict((r, MinHashLSH(num_perm=self.h, params=(int(self.h/r), r),
+                    storage_config=self._storage_config(storage_config,
+                                                        b'_part_%03d_r_%03d' % (i, r))))
+                                 for r in rs)
+                            for i in range(0, num_part)] 
         self.lowers = [None for _ in self.indexes]
+        self.signatures = SignatureStore(num_perm) if retain_signatures else None
+        # The sizes and partitions of the indexed keys, and the number of
+        # keys in each partition, and the share of the keys of each
+        # partition at the last partitioning
+        self._sizes = dict()
+        self._parts = dict()
+        self._counts = [0 for _ in self.indexes]
+        self._shares = [0.0 for _ in self.indexes]
+
+    @staticmethod
+    def _storage_config(storage_config, suffix):
+        basename = storage_name(storage_config, suffix)
+        if basename is None:
+            return storage_config
+        return dict(storage_config, basename=basename)
 
     def _init_optimal_params(self, weights):
         false_positive_weight, false_negative_weight = weights
-        self.xqs = np.exp(np.linspace(-5, 5, 10))
-        self.params = np.array([_optimal_param(self.threshold, self.h, self.m, 
-                                               xq, 
-                                               false_positive_weight,
-                                               false_negative_weight) 
-                                for xq in self.xqs], dtype=np.int)
+        max_b = self.h // self.m if self.shared_bands else None
+        # The table is dense, so it is computed once and shared by the
+        # indexes with the same parameters
+        table = (self.threshold, self.h, self.m, false_positive_weight,
+                 false_negative_weight, max_b)
+        if table not in _param_tables:
+            _param_tables[table] = _optimal_params(self.threshold, self.h,
+                    self.m, _xqs, false_positive_weight, false_negative_weight,
+                    max_b=max_b)
+            _param_tables[table].flags.writeable = False
+        self.xqs = _xqs
+        self.params = _param_tables[table]
         # Find all unique r
         rs = set()
         for _, r in self.params:
-            rs.add(r)
+            rs.add(int(r))
         return rs
 
     def _get_optimal_param(self, x, q):
-        i = np.searchsorted(self.xqs, float(x)/float(q), side='left')
-        if i == len(self.params):
-            i = i - 1
-        return self.params[i]
+        return self._get_optimal_params([x], q)[0]
+
+    def _get_optimal_params(self, xs, q):
+        i = np.searchsorted(self.xqs, np.asarray(xs, dtype=np.float64) / q,
+                            side='left')
+        return self.params[np.minimum(i, len(self.params)-1)]
     
+    def _assign(self, sizes):
+        '''
+        Assign the sorted set sizes to partitions.
+
+        Returns:
+            numpy.array: The partition of every size, in increasing order.
+        '''
+        sizes = np.asarray(sizes)
+        if self.partitioning == 'equal':
+            part_size = int(len(sizes) / len(self.indexes)) + 1
+            return np.arange(len(sizes)) // part_size
+        distinct, counts = np.unique(sizes, return_counts=True)
+        uppers = _optimal_partitions(distinct, counts, len(self.indexes))
+        return np.searchsorted(uppers, sizes, side='left')
+
+    def _set_partitions(self, entries, parts):
+        self.lowers = [None for _ in self.indexes]
+        self._counts = [0 for _ in self.indexes]
+        for (key, size), i in zip(entries, parts):
+            i = int(i)
+            if self.lowers[i] is None:
+                self.lowers[i] = size
+            self._sizes[key] = size
+            self._parts[key] = i
+            self._counts[i] += 1
+        self._shares = [float(c) / max(len(entries), 1) for c in self._counts]
+
     def index(self, entries):
         '''
         Index all sets given their keys, MinHashes, and sizes.
-        It can be called only once after the index is created.
+        It can be called only once after the index is created, use
+        :func:`datasketch.MinHashLSHEnsemble.insert` to add more sets.
 
         Args:
             entries (`iterable` of `tuple`): An iterable of tuples, each must be
@@ -161,15 +408,141 @@ class MinHashLSHEnsemble(object):
         entries.sort(key=lambda e : e[2])
         if entries[0][2] < 0:
             raise ValueError("Non-positive set size found in entries")
-        part_size = int(len(entries) / len(self.indexes)) + 1
+        if self.signatures is not None:
+            for key, minhash, _ in entries:
+                if len(minhash) != self.h:
+                    raise ValueError("Expecting minhash with length %d, got %d"
+                            % (self.h, len(minhash)))
+            for key, minhash, _ in entries:
+                self.signatures.add(key, minhash.hashvalues)
+        parts = self._assign([size for _, _, size in entries])
+        self._set_partitions([(key, size) for key, _, size in entries], parts)
+        bounds = np.searchsorted(parts, np.arange(len(self.indexes)+1))
         for i, index in enumerate(self.indexes):
-            if part_size*i >= len(entries):
+            start, end = bounds[i], bounds[i+1]
+            if start == end:
+                continue
+            if self.shared_bands:
+                for key, minhash, size in entries[start:end]:
+                    index.add(key, minhash)
+                index.index()
                 continue
-            self.lowers[i] = entries[part_size*i][2]
             for r in index:
-                for key, minhash, size in entries[part_size*i:part_size*(i+1)]:
+                for key, minhash, size in entries[start:end]:
                     index[r].insert(key, minhash)
 
+    def _partition(self, size):
+        # The last non-empty partition whose lower bound is at most the
+        # size, or the first non-empty partition for a smaller size
+        parts = [i for i, lower in enumerate(self.lowers) if lower is not None]
+        if not parts:
+            return 0
+        covering = [i for i in parts if self.lowers[i] <= size]
+        return covering[-1] if covering else parts[0]
+
+    def _skewed(self):
+        n = len(self._sizes)
+        return any(count > self.max_skew * (share * n + 1)
+                   for count, share in zip(self._counts, self._shares))
+
+    def insert(self, key, minhash, size):
+        '''
+        Insert a set given its key, MinHash, and size, into the partition
+        whose range of sizes covers it. The partitions are rebuilt once
+        they become skewed, see the `max_skew` parameter.
+
+        Args:
+            key (hashable): The unique identifier of the set.
+            minhash (datasketch.MinHash): The MinHash of the set.
+            size (int): The size or number of unique items in the set.
+        '''
+        if size <= 0:
+            raise ValueError("Set size must be positive")
+        if key in self._parts:
+            raise ValueError("The given key already exists")
+        i = self._partition(size)
+        index = self.indexes[i]
+        if self.shared_bands:
+            index.add(key, minhash)
+            index.index()
+        else:
+            for r in index:
+                index[r].insert(key, minhash)
+        if self.lowers[i] is None or size < self.lowers[i]:
+            self.lowers[i] = size
+        if self.signatures is not None:
+            self.signatures.add(key, minhash.hashvalues)
+        self._sizes[key] = size
+        self._parts[key] = i
+        self._counts[i] += 1
+        if self._skewed():
+            self.repartition()
+
+    def remove(self, key):
+        '''
+        Remove the key from the index. The partitions are rebuilt once
+        they become skewed, see the `max_skew` parameter.
+
+        Args:
+            key (hashable): The unique identifier of a set.
+        '''
+        if key not in self._parts:
+            raise ValueError("The given key does not exist")
+        i = self._parts[key]
+        index = self.indexes[i]
+        if self.shared_bands:
+            index.remove(key)
+        else:
+            for r in index:
+                index[r].remove(key)
+        del self._parts[key]
+        del self._sizes[key]
+        if self.signatures is not None:
+            self.signatures.remove(key)
+        self._counts[i] -= 1
+        if self._counts[i] == 0:
+            self.lowers[i] = None
+        if self._sizes and self._skewed():
+            self.repartition()
+
+    def repartition(self):
+        '''
+        Rebuild the partitions from the sizes of the indexed sets, see the
+        `partitioning` parameter. Only the sets that change partition are moved, and they are
+        moved using the hash values of their bands, so their MinHashes are
+        not needed.
+        '''
+        # Among sets of the same size, keep the current order of partitions
+        # to move as few sets as possible
+        entries = sorted(self._sizes.items(),
+                         key=lambda e : (e[1], self._parts[e[0]]))
+        parts = self._assign([size for _, size in entries])
+        moves = dict()
+        for (key, _), j in zip(entries, parts):
+            i = self._parts[key]
+            if i != j:
+                moves.setdefault((i, j), []).append(key)
+        for (i, j), keys in moves.items():
+            self._move(keys, self.indexes[i], self.indexes[j])
+        if self.shared_bands:
+            for forest in self.indexes:
+                forest.index()
+        self._set_partitions(entries, parts)
+
+    def _move(self, keys, src, dst):
+        if self.shared_bands:
+            Hss = src.keys.getmany(*keys)
+            src.remove_many(keys)
+            for key, Hs in zip(keys, Hss):
+                dst._add(key, Hs)
+            return
+        for r in src:
+            keys_Hs = list(zip(keys, src[r].keys.getmany(*keys)))
+            src[r].remove_many(keys)
+            tables = [[(Hs[t], (key,)) for key, Hs in keys_Hs]
+                      for t in range(dst[r].b)]
+            dst[r]._merge_partial(keys_Hs, tables)
+
     def query(self, minhash, size):
         '''
         Giving the MinHash and size of the query set, retrieve 
@@ -183,14 +556,79 @@ class MinHashLSHEnsemble(object):
         Returns:
             `iterator` of keys.
         '''
-        for i, index in enumerate(self.indexes):
-            u = self.lowers[i]
-            if u is None:
-                continue
-            b, r = self._get_optimal_param(u, size)
-            for key in index[r]._query_b(minhash, b):
+        parts = [i for i, u in enumerate(self.lowers) if u is not None]
+        if not parts:
+            return
+        # The parameters of all partitions in one lookup
+        params = self._get_optimal_params([self.lowers[i] for i in parts],
+                                          size).tolist()
+        if self.shared_bands:
+            for i, (b, r) in zip(parts, params):
+                for key in set(self.indexes[i]._query(minhash, r, b)):
+                    yield key
+            return
+        probes = []
+        max_b = {}
+        for i, (b, r) in zip(parts, params):
+            probes.append((self.indexes[i][r], b))
+            max_b[r] = max(b, max_b.get(r, 0))
+        # The hash values of the bands are the same for all partitions
+        Hs = {}
+        for lsh, _ in probes:
+            if lsh.r not in Hs:
+                Hs[lsh.r] = [lsh._H(minhash.hashvalues[start:end])
+                             for start, end in lsh.hashranges[:max_b[lsh.r]]]
+        requests = [(hashtable, H) for lsh, b in probes
+                    for hashtable, H in zip(lsh.hashtables[:b], Hs[lsh.r])]
+        results = iter(multi_get(requests))
+        for _, b in probes:
+            # The keys are unique across partitions
+            candidates = set()
+            for keys in itertools.islice(results, b):
+                candidates.update(keys)
+            for key in candidates:
                 yield key
 
+    def query_ranked(self, minhash, size, top_k=None):
+        '''
+        Giving the MinHash and size of the query set, retrieve the keys that
+        references sets with estimated containment with respect to the
+        query set greater than the threshold, ranked by the containment.
+        Unlike :func:`datasketch.MinHashLSHEnsemble.query`, false positives
+        below the threshold are removed, by estimating the Jaccard
+        similarities of all candidates at once using the retained hash
+        values, and converting them to containment using the set sizes.
+
+        Args:
+            minhash (datasketch.MinHash): The MinHash of the query set.
+            size (int): The size (number of unique items) of the query set.
+            top_k (int, optional): The maximum number of keys to return.
+
+        Returns:
+            `list` of `(key, containment)` tuples sorted by the containment
+            in descending order.
+
+        Note:
+            The index must be created with `retain_signatures=True`.
+        '''
+        if self.signatures is None:
+            raise ValueError("Ranked query requires an index created with\
+                    retain_signatures=True")
+        if top_k is not None and top_k <= 0:
+            raise ValueError("top_k must be positive")
+        candidates = list(self.query(minhash, size))
+        jaccards = self.signatures.jaccard(minhash.hashvalues, candidates)
+        sizes = np.array([self._sizes[key] for key in candidates],
+                         dtype=np.float64)
+        # |Q & X| = J * (|Q| + |X|) / (1 + J)
+        containments = np.minimum(
+                jaccards * (size + sizes) / ((1.0 + jaccards) * size), 1.0)
+        order = np.flatnonzero(containments >= self.threshold)
+        if top_k is not None and top_k < len(order):
+            order = order[np.argpartition(-containments[order], top_k-1)[:top_k]]
+        order = order[np.argsort(-containments[order], kind='mergesort')]
+        return [(candidates[i], float(containments[i])) for i in order]
+
     def __contains__(self, key):
         '''
         Args:
@@ -199,14 +637,119 @@ class MinHashLSHEnsemble(object):
         Returns: 
             bool: True only if the key exists in the index.
         '''
-        return any(any(key in index[r] for r in index)
-                   for index in self.indexes)
+        return key in self._parts
+
+    def save(self, path):
+        '''
+        Save the index to a file in a versioned binary format, which can be
+        loaded by :func:`datasketch.MinHashLSHEnsemble.load` without
+        unpickling. The indexes of all partitions, the sizes of the sets and
+        the table of optimal parameters are saved in the same file.
+
+        Args:
+            path (str): The path of the file.
+
+        Note:
+            Keys must be of type `bytes`, `str` or `int`.
+        '''
+        key_array = KeyArray.from_keys(key for key, _ in self._sizes.items())
+        keys = [key_array.key(i) for i in range(len(key_array))]
+        arrays = {'xqs': self.xqs, 'params': self.params,
+                  'key_data': key_array.data, 'key_offsets': key_array.offsets,
+                  'sizes': np.array([self._sizes[key] for key in keys],
+                                    dtype=np.int64),
+                  'parts': np.array([self._parts[key] for key in keys],
+                                    dtype=np.int64)}
+        if self.signatures is not None:
+            arrays['signatures'] = self.signatures.get(keys)
+        metas = dict()
+        for i, index in enumerate(self.indexes):
+            if self.shared_bands:
+                subindexes = [('part%d' % i, index)]
+            else:
+                subindexes = [('part%d_r%d' % (i, r), index[r]) for r in index]
+            for prefix, subindex in subindexes:
+                metas[prefix], subarrays = subindex._to_arrays()
+                for name, a in subarrays.items():
+                    arrays[prefix + '/' + name] = a
+        meta = {'threshold': self.threshold, 'h': self.h, 'm': self.m,
+                'shared_bands': self.shared_bands,
+                'partitioning': self.partitioning, 'max_skew': self.max_skew,
+                'rs': sorted(set(int(r) for _, r in self.params)),
+                'lowers': [None if u is None else int(u) for u in self.lowers],
+                'counts': self._counts, 'shares': self._shares,
+                'indexes': metas}
+        save_arrays(path, 'MinHashLSHEnsemble', meta, arrays)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        '''
+        Load an index saved by :func:`datasketch.MinHashLSHEnsemble.save`.
+
+        Args:
+            path (str): The path of the file.
+            mmap (bool, optional): If True, the index is a read-only view of
+                the memory-mapped file: loading is near-instant and the pages
+                are shared by all processes loading the same file.
+                Otherwise, the index is read into a regular dict storage and
+                can be modified.
+
+        Returns:
+            datasketch.MinHashLSHEnsemble
+        '''
+        meta, arrays = load_arrays(path, 'MinHashLSHEnsemble', mmap=mmap)
+        subarrays = dict((prefix, dict()) for prefix in meta['indexes'])
+        for name, a in arrays.items():
+            if '/' in name:
+                prefix, name = name.split('/', 1)
+                subarrays[prefix][name] = a
+        # The parameters are loaded rather than optimized again
+        lsh = cls.__new__(cls)
+        for name in ('threshold', 'h', 'm', 'shared_bands', 'partitioning',
+                     'max_skew'):
+            setattr(lsh, name, meta[name])
+        lsh.xqs, lsh.params = arrays['xqs'], arrays['params']
+        num_part = len(meta['lowers'])
+        if lsh.shared_bands:
+            lsh.indexes = [MinHashLSHForest._from_arrays(
+                               meta['indexes']['part%d' % i],
+                               subarrays['part%d' % i], mmap)
+                           for i in range(num_part)]
+        else:
+            lsh.indexes = [dict((r, MinHashLSH._from_arrays(
+                                    meta['indexes']['part%d_r%d' % (i, r)],
+                                    subarrays['part%d_r%d' % (i, r)], mmap))
+                                for r in meta['rs'])
+                           for i in range(num_part)]
+        lsh.lowers = meta['lowers']
+        lsh._counts = meta['counts']
+        lsh._shares = meta['shares']
+        key_array = KeyArray(arrays['key_data'], arrays['key_offsets'])
+        signatures = None
+        if 'signatures' in arrays:
+            signatures = FrozenSignatureStore(arrays['signatures'], key_array)
+        if mmap:
+            lsh._sizes = _FrozenDict(key_array, arrays['sizes'])
+            lsh._parts = _FrozenDict(key_array, arrays['parts'])
+            lsh.signatures = signatures
+            return lsh
+        keys = [key_array.key(i) for i in range(len(key_array))]
+        lsh._sizes = dict(zip(keys, arrays['sizes'].tolist()))
+        lsh._parts = dict(zip(keys, arrays['parts'].tolist()))
+        lsh.signatures = None
+        if signatures is not None:
+            lsh.signatures = SignatureStore(signatures.num_perm)
+            for i, key in enumerate(keys):
+                lsh.signatures.add(key, signatures.signatures[i])
+        return lsh
 
     def is_empty(self):
         '''
         Returns:
             bool: Check if the index is empty.
         '''
+        if self.shared_bands:
+            return all(forest.is_empty() for forest in self.indexes)
         return all(all(index[r].is_empty() for r in index) 
                    for index in self.indexes) 
 
@@ -1,5 +1,71 @@
-from collections import deque, defaultdict
-from datasketch.minhash import hashvalue_byte_size
+from collections import defaultdict, OrderedDict
+import heapq
+import itertools
+import numpy as np
+from datasketch.storage import (
+    ordered_storage, unordered_storage, sorted_storage, storage_name, multi_get, multi_insert, multi_range,
+    multi_remove_val, multi_remove,
+    freeze, frozen_storages, FrozenListStorage)
+from datasketch.persistence import save_arrays, load_arrays, KeyArray
+from datasketch.signature_store import SignatureStore, FrozenSignatureStore
+
+
+def _empty_run():
+    return (np.array([], dtype='S1'), np.zeros(1, dtype=np.int64),
+            np.zeros(0, dtype=np.int64))
+
+
+def _sorted_run(Hs, ids):
+    '''Sort the hash values of keys into a fixed-width bytes array, with
+    the id of the key under every hash value in CSR format.'''
+    width = max(len(H) for H in Hs) if Hs else 1
+    sorted_keys = np.array(Hs, dtype='S%d' % width)
+    order = np.argsort(sorted_keys, kind='mergesort')
+    return (sorted_keys[order], np.arange(len(Hs)+1, dtype=np.int64),
+            np.asarray(ids, dtype=np.int64)[order])
+
+
+def _merge_runs(a, b):
+    '''Merge two sorted runs of `(sorted_keys, indptr, indices)` in
+    linear time, without sorting.'''
+    if len(b[0]) == 0:
+        return a
+    if len(a[0]) == 0:
+        return b
+    (a_keys, a_indptr, a_indices), (b_keys, b_indptr, b_indices) = a, b
+    dtype = 'S%d' % max(a_keys.dtype.itemsize, b_keys.dtype.itemsize)
+    n = len(a_keys) + len(b_keys)
+    # The positions of the entries of b in the merged run
+    is_b = np.zeros(n, dtype=bool)
+    is_b[np.searchsorted(a_keys.astype(dtype), b_keys.astype(dtype),
+                         side='right') + np.arange(len(b_keys))] = True
+    sorted_keys = np.empty(n, dtype=dtype)
+    sorted_keys[~is_b], sorted_keys[is_b] = a_keys, b_keys
+    counts = np.empty(n, dtype=np.int64)
+    counts[~is_b], counts[is_b] = np.diff(a_indptr), np.diff(b_indptr)
+    starts = np.empty(n, dtype=np.int64)
+    starts[~is_b] = a_indptr[:-1]
+    starts[is_b] = b_indptr[:-1] + len(a_indices)
+    indptr = np.zeros(n+1, dtype=np.int64)
+    indptr[1:] = np.cumsum(counts)
+    # Gather the postings of every entry in the merged order
+    source = np.concatenate([a_indices, b_indices])
+    indices = source[np.repeat(starts - indptr[:-1], counts) +
+                     np.arange(indptr[-1])]
+    return sorted_keys, indptr, indices
+
+
+def _compact_run(run, alive, new_ids):
+    '''Drop the ids of removed keys, and the hash values left without
+    keys, from a sorted run, and renumber the remaining ids.'''
+    sorted_keys, indptr, indices = run
+    keep = alive[indices]
+    entries = np.repeat(np.arange(len(sorted_keys)), np.diff(indptr))
+    counts = np.bincount(entries[keep], minlength=len(sorted_keys))
+    nonempty = counts > 0
+    indptr = np.zeros(np.count_nonzero(nonempty)+1, dtype=np.int64)
+    indptr[1:] = np.cumsum(counts[nonempty])
+    return sorted_keys[nonempty], indptr, new_ids[indices[keep]]
 
 
 class MinHashLSHForest(object):
@@ -9,7 +75,19 @@ class MinHashLSHForest(object):
     Instead of using prefix trees as the `original paper
     <http://ilpubs.stanford.edu:8090/678/1/2005-14.pdf>`_, 
     I use a sorted array to store the hash values in every
-    hash table.
+    hash table: a fixed-width NumPy bytes array searched with
+    `numpy.searchsorted`, with the keys under every hash value stored
+    in compressed sparse row format.
+    The keys indexed since the last merge are kept in a small sorted
+    delta, which is searched together with the sorted arrays and merged
+    into them once it grows, so indexing new keys does not re-sort the
+    whole forest. Removed keys are marked as removed, and are dropped from
+    the sorted arrays by :func:`datasketch.MinHashLSHForest.index` once
+    there are many of them.
+
+    With the Redis storage, the hash values of every hashtable are kept in
+    a Redis sorted set instead, and the prefixes are scanned in Redis, so
+    the forest is shared by all processes using the same storages.
     
     Args:
         num_perm (int, optional): The number of permutation functions used
@@ -17,13 +95,22 @@ class MinHashLSHForest(object):
             is the sample size (`sample_size`).
         l (int, optional): The number of prefix trees as described in the
             paper.
+        retain_signatures (bool, optional): If True, the forest also keeps
+            the hash values of every added MinHash in a compact
+            :class:`datasketch.signature_store.SignatureStore`, which is
+            used by :func:`datasketch.MinHashLSHForest.query_ranked` to
+            verify and rank candidates.
+        storage_config (dict, optional): Type of storage service to use for
+            storing hashtables and keys, as for :class:`datasketch.MinHashLSH`.
+            The `dict` and `redis` storages are supported.
     
     Note:
         The MinHash LSH Forest also works with weighted Jaccard similarity
         and weighted MinHash without modification.
     '''
 
-    def __init__(self, num_perm=128, l=8):
+    def __init__(self, num_perm=128, l=8, retain_signatures=False,
+                 storage_config={'type': 'dict'}):
         if l <= 0 or num_perm <= 0:
             raise ValueError("num_perm and l must be positive")
         if l > num_perm:
@@ -32,11 +119,39 @@ class MinHashLSHForest(object):
         self.l = l
         # Maximum depth of the prefix tree
         self.k = int(num_perm / l)
-        self.hashtables = [defaultdict(list) for _ in range(self.l)]
+        # Storages on the same Redis server share a connection and a buffer
+        connections = dict()
+        self.hashtables = [unordered_storage(storage_config, connections,
+                           name=storage_name(storage_config, b'_tree_%05d' % i))
+                           for i in range(self.l)]
         self.hashranges = [(i*self.k, (i+1)*self.k) for i in range(self.l)]
-        self.keys = dict()
+        self.keys = ordered_storage(storage_config, connections,
+                                    name=storage_name(storage_config, b'_keys'))
+        # The sorted sets of hash values of a Redis storage, which replace
+        # the sorted arrays below
+        sorted_sets = [sorted_storage(storage_config, connections,
+                       name=storage_name(storage_config, b'_sorted_%05d' % i))
+                       for i in range(self.l)]
+        self.sorted_sets = None if sorted_sets[0] is None else sorted_sets
         # This is the sorted array implementation for the prefix trees
-        self.sorted_hashtables = [[] for _ in range(self.l)]
+        self.sorted_hashtables = [np.array([], dtype='S1')
+                                  for _ in range(self.l)]
+        # The keys under every hash value in the sorted arrays, in compressed
+        # sparse row format: the ids of the keys under sorted_hashtables[i][j]
+        # are indices[i][indptr[i][j]:indptr[i][j+1]]
+        self.indptr = [np.zeros(1, dtype=np.int64) for _ in range(self.l)]
+        self.indices = [np.zeros(0, dtype=np.int64) for _ in range(self.l)]
+        # The sorted delta of every hashtable, in the same format
+        self._delta = [_empty_run() for _ in range(self.l)]
+        # Key ids to keys, a list or a KeyArray of a loaded forest, and
+        # back to key ids
+        self._id_keys = []
+        self._key_ids = dict()
+        # The ids of the removed keys still in the sorted arrays
+        self._removed = set()
+        # Keys added but not yet indexed
+        self._pending = []
+        self.signatures = SignatureStore(num_perm) if retain_signatures else None
 
     def add(self, key, minhash):
         '''
@@ -55,35 +170,226 @@ class MinHashLSHForest(object):
             raise ValueError("The num_perm of MinHash out of range")
         if key in self.keys:
             raise ValueError("The given key has already been added")
-        self.keys[key] = [self._H(minhash.hashvalues[start:end]) 
-                for start, end in self.hashranges]
-        for H, hashtable in zip(self.keys[key], self.hashtables):
-            hashtable[H].append(key)
+        if self.signatures is not None:
+            if len(minhash) != self.signatures.num_perm:
+                raise ValueError("Expecting minhash with length %d, got %d"
+                        % (self.signatures.num_perm, len(minhash)))
+            self.signatures.add(key, minhash.hashvalues)
+        self._add(key, [self._H(minhash.hashvalues[start:end])
+                        for start, end in self.hashranges])
+
+    def _add(self, key, Hs):
+        multi_insert([(self.keys, key, Hs)] +
+                     [(hashtable, H, (key,))
+                      for H, hashtable in zip(Hs, self.hashtables)])
+        self._pending.append(key)
 
-    def index(self):
+    def remove(self, key):
+        '''
+        Remove the key from the forest.
+
+        Args:
+            key (hashable): The unique identifier of a set.
+        '''
+        self.remove_many([key])
+
+    def remove_many(self, keys):
+        '''
+        Remove many keys from the forest. The keys are removed from the
+        storages right away, and are no longer returned by queries, but
+        stay in the sorted arrays until :func:`datasketch.MinHashLSHForest.index`
+        compacts them.
+
+        Args:
+            keys (`iterable` of hashable): The unique identifiers of the sets.
+        '''
+        keys = list(OrderedDict.fromkeys(keys))
+        if not keys:
+            return
+        Hss = self.keys.getmany(*keys)
+        if any(not Hs for Hs in Hss):
+            raise ValueError("The given key does not exist")
+        buckets = [defaultdict(list) for _ in self.hashtables]
+        for key, Hs in zip(keys, Hss):
+            for H, bucket in zip(Hs, buckets):
+                bucket[H].append(key)
+        requests = [(hashtable, H, vals)
+                    for hashtable, bucket in zip(self.hashtables, buckets)
+                    for H, vals in bucket.items()]
+        empty = multi_remove_val(requests)
+        empty_buckets = defaultdict(list)
+        for (hashtable, H, _), is_empty in zip(requests, empty):
+            if is_empty:
+                empty_buckets[id(hashtable)].append(H)
+        removals = [(self.keys, keys)] + [(hashtable, empty_buckets[id(hashtable)])
+                                          for hashtable in self.hashtables]
+        if self.sorted_sets is not None:
+            removals.extend((sorted_set, empty_buckets[id(hashtable)])
+                            for sorted_set, hashtable
+                            in zip(self.sorted_sets, self.hashtables))
+        multi_remove(removals)
+        removed = set(keys)
+        self._pending = [key for key in self._pending if key not in removed]
+        for key in keys:
+            if key in self._key_ids:
+                self._removed.add(self._key_ids.pop(key))
+            if self.signatures is not None:
+                self.signatures.remove(key)
+
+    def index(self, merge=False):
         '''
         Index all the keys added so far and make them searchable.
+        Only the keys added since the last call are sorted, into the delta,
+        which is merged into the sorted arrays once it holds more than
+        1/8 of the indexed keys. Likewise, the removed keys are dropped
+        from the sorted arrays once they are more than 1/8 of the indexed
+        keys.
+
+        Args:
+            merge (bool, optional): If True, always merge the delta into
+                the sorted arrays and drop the removed keys.
+        '''
+        pending, self._pending = self._pending, []
+        Hss = self.keys.getmany(*pending) if pending else []
+        if self.sorted_sets is not None:
+            for i, sorted_set in enumerate(self.sorted_sets):
+                sorted_set.insert(*set(Hs[i] for Hs in Hss))
+            return
+        if pending:
+            start = len(self._id_keys)
+            self._id_keys.extend(pending)
+            for i, key in enumerate(pending):
+                self._key_ids[key] = start + i
+            ids = np.arange(start, len(self._id_keys), dtype=np.int64)
+            for i in range(self.l):
+                run = _sorted_run([Hs[i] for Hs in Hss], ids)
+                self._delta[i] = _merge_runs(self._delta[i], run)
+        if self._removed and (merge or len(self._removed) * 8 > len(self._id_keys)):
+            self._compact()
+        if merge or len(self._delta[0][2]) * 8 > len(self.indices[0]):
+            for i in range(self.l):
+                main = (self.sorted_hashtables[i], self.indptr[i], self.indices[i])
+                self.sorted_hashtables[i], self.indptr[i], self.indices[i] = \
+                        _merge_runs(main, self._delta[i])
+                self._delta[i] = _empty_run()
+
+    def _compact(self):
+        alive = np.ones(len(self._id_keys), dtype=bool)
+        alive[list(self._removed)] = False
+        new_ids = np.cumsum(alive) - 1
+        for i in range(self.l):
+            self.sorted_hashtables[i], self.indptr[i], self.indices[i] = \
+                    _compact_run((self.sorted_hashtables[i], self.indptr[i],
+                                  self.indices[i]), alive, new_ids)
+            self._delta[i] = _compact_run(self._delta[i], alive, new_ids)
+        self._id_keys = [key for key, a in zip(self._id_keys, alive) if a]
+        self._key_ids = dict((key, i) for i, key in enumerate(self._id_keys))
+        self._removed = set()
+
+    def _runs(self):
+        '''Return the sorted arrays and the delta, each a list of
+        `(sorted_hashtable, indptr, indices)` for every hashtable.'''
+        return [list(zip(self.sorted_hashtables, self.indptr, self.indices)),
+                self._delta]
+
+    def _keys(self, ids):
+        if isinstance(self._id_keys, KeyArray):
+            return [self._id_keys.key(i) for i in ids]
+        if self._removed:
+            ids = [i for i in ids if i not in self._removed]
+        return [self._id_keys[i] for i in ids]
+
+    def _prefix_ranges(self, minhash):
+        '''
+        Find the keys under the hash values in the sorted arrays and in the
+        delta that start with the prefixes of every length of the query's
+        hash values.
+
+        Returns:
+            list: `(lo, hi)` for each of :func:`_runs`, two nested lists of
+            shape `(l, k)`, in which `lo[i][r-1]:hi[i][r-1]` is the range of
+            the ids in `indices` of the i-th hashtable under the hash values
+            sharing the prefix of length r.
+            None if the hash values are in sorted sets.
         '''
-        for i, hashtable in enumerate(self.hashtables):
-            self.sorted_hashtables[i] = [H for H in hashtable.keys()]
-            self.sorted_hashtables[i].sort()
+        ranges = self._prefix_ranges_many(minhash.hashvalues[np.newaxis])
+        if ranges is None:
+            return None
+        return [(lo[0].tolist(), hi[0].tolist()) for lo, hi in ranges]
 
-    def _query(self, minhash, r, b):
+    def _prefix_ranges_many(self, hashvalues):
+        '''
+        Find the ranges of :func:`_prefix_ranges` for a batch of queries
+        at once, given the hash values of the queries stacked in an array.
+
+        Returns:
+            list: `(lo, hi)` for each of :func:`_runs`, two arrays of shape
+            `(n, l, k)` for n queries. None if the hash values are in sorted
+            sets.
+        '''
+        if self.sorted_sets is not None:
+            return None
+        runs = self._runs()
+        n = len(hashvalues)
+        # The bytes of _H for every query and hashtable
+        Hs = np.ascontiguousarray(hashvalues[:, :self.k*self.l]).byteswap()
+        Hs = Hs.reshape(n, self.l, -1).view(np.uint8)
+        width = Hs.shape[2]
+        # The hash values starting with a prefix are between the prefix
+        # padded with the smallest and the largest bytes
+        padding = np.arange(width) >= \
+                (width // self.k) * np.arange(1, self.k+1)[:, np.newaxis]
+        Hs = Hs[:, :, np.newaxis, :]
+        dtype = 'S%d' % width
+        lo_bounds = np.where(padding, np.uint8(0), Hs).view(dtype)[..., 0]
+        hi_bounds = np.where(padding, np.uint8(0xff), Hs).view(dtype)[..., 0]
+        ranges = []
+        for run in runs:
+            lo = np.zeros((n, self.l, self.k), dtype=np.int64)
+            hi = np.zeros((n, self.l, self.k), dtype=np.int64)
+            for i, (ht, indptr, _) in enumerate(run):
+                if len(ht) == 0:
+                    continue
+                lo[:, i] = indptr[np.searchsorted(ht, lo_bounds[:, i])]
+                hi[:, i] = indptr[np.searchsorted(ht, hi_bounds[:, i],
+                                                  side='right')]
+            ranges.append((lo, hi))
+        return ranges
+
+    def _query(self, minhash, r, b, ranges=None):
         if r > self.k or r <=0 or b > self.l or b <= 0:
             raise ValueError("parameter outside range")
-        # Generate prefixes of concatenated hash values
-        hps = [self._H(minhash.hashvalues[start:start+r]) 
-                for start, _ in self.hashranges]
-        # Caculate the string length of each original hash value
-        prefix_size = hashvalue_byte_size * r
-        for ht, hp, hashtable in zip(self.sorted_hashtables, hps, self.hashtables):
-            i = self._binary_search(len(ht), lambda x : ht[x][:prefix_size] >= hp)
-            if i < len(ht) and ht[i][:prefix_size] == hp:
-                j = i
-                while j < len(ht) and ht[j][:prefix_size] == hp:
-                    for key in hashtable[ht[j]]:
-                        yield key
-                    j += 1
+        if self.sorted_sets is not None:
+            for key in self._query_sorted_sets(minhash, r, b):
+                yield key
+            return
+        if ranges is None:
+            ranges = self._prefix_ranges(minhash)
+        for run, (lo, hi) in zip(self._runs(), ranges):
+            for i in range(b):
+                start, end = lo[i][r-1], hi[i][r-1]
+                if start == end:
+                    continue
+                for key in self._keys(run[i][2][start:end].tolist()):
+                    yield key
+
+    def _query_sorted_sets(self, minhash, r, b):
+        # Scan the prefixes in the sorted sets, then get the keys under
+        # the hash values found, in a pipeline each
+        requests = []
+        for (start, end), sorted_set in zip(self.hashranges[:b],
+                                            self.sorted_sets):
+            H = self._H(minhash.hashvalues[start:end])
+            prefix = H[:len(H) // self.k * r]
+            requests.append((sorted_set, prefix,
+                             prefix + b'\xff' * (len(H) - len(prefix))))
+        Hss = multi_range(requests)
+        keys = multi_get([(hashtable, H)
+                          for hashtable, Hs in zip(self.hashtables, Hss)
+                          for H in Hs])
+        for ks in keys:
+            for key in ks:
+                yield key
 
     def query(self, minhash, k):
         '''
@@ -101,28 +407,110 @@ class MinHashLSHForest(object):
             raise ValueError("k must be positive")
         if len(minhash) < self.k*self.l:
             raise ValueError("The num_perm of MinHash out of range")
+        return self._top(minhash, k, self._prefix_ranges(minhash))
+
+    def query_many(self, minhashes, k, batch_size=1024):
+        '''
+        Return the approximate top-k keys for each of many queries, as
+        :func:`datasketch.MinHashLSHForest.query` does. The prefixes of
+        the queries are computed, and searched in the sorted arrays, for a
+        batch of queries at once.
+
+        Args:
+            minhashes (`iterable` of datasketch.MinHash): The MinHashes of
+                the query sets.
+            k (int): The maximum number of keys to return for each query.
+            batch_size (int, optional): The number of queries searched
+                at once.
+
+        Returns:
+            `list` of `list` of at most k keys, one for each query.
+        '''
+        if k <= 0:
+            raise ValueError("k must be positive")
+        minhashes = list(minhashes)
+        for minhash in minhashes:
+            if len(minhash) < self.k*self.l:
+                raise ValueError("The num_perm of MinHash out of range")
+        results = []
+        for start in range(0, len(minhashes), batch_size):
+            batch = minhashes[start:start+batch_size]
+            ranges = self._prefix_ranges_many(
+                    np.array([m.hashvalues[:self.k*self.l] for m in batch]))
+            for j, minhash in enumerate(batch):
+                results.append(self._top(minhash, k, None if ranges is None
+                        else [(lo[j].tolist(), hi[j].tolist()) for lo, hi in ranges]))
+        return results
+
+    def _top(self, minhash, k, ranges):
         results = set()
         r = self.k
         while r > 0: 
-            for key in self._query(minhash, r, self.l):
+            for key in self._query(minhash, r, self.l, ranges):
                 results.add(key)
                 if len(results) >= k:
                     return list(results)
             r -= 1
         return list(results)
 
-    def _binary_search(self, n, func):
+    def query_ranked(self, minhash, k, return_stats=False):
         '''
-        https://golang.org/src/sort/search.go?s=2247:2287#L49
+        Return the top-k keys that have the highest estimated
+        Jaccard similarities to the query set, ranked by the similarities.
+        Unlike :func:`datasketch.MinHashLSHForest.query`, which stops as soon
+        as it has found k keys, all the candidates sharing a prefix of the
+        current length are verified using the retained hash values before
+        the search terminates, so the result does not depend on the order
+        in which the candidates are found.
+
+        Args:
+            minhash (datasketch.MinHash): The MinHash of the query set.
+            k (int): The maximum number of keys to return.
+            return_stats (bool, optional): If True, also return the
+                statistics of the search.
+
+        Returns:
+            `list` of at most k `(key, jaccard)` tuples sorted by the
+            Jaccard similarities in descending order. If `return_stats` is
+            True, a tuple of the list and a `dict` with the number of prefix
+            lengths searched (`prefix_levels`) and the number of candidates
+            verified (`candidates`).
+
+        Note:
+            The forest must be created with `retain_signatures=True`.
         '''
-        i, j = 0, n
-        while i < j:
-            h = int(i + (j - i) / 2)
-            if not func(h):
-                i = h + 1
-            else:
-                j = h
-        return i
+        if self.signatures is None:
+            raise ValueError("Ranked query requires a forest created with\
+                    retain_signatures=True")
+        if k <= 0:
+            raise ValueError("k must be positive")
+        if len(minhash) != self.signatures.num_perm:
+            raise ValueError("Expecting minhash with length %d, got %d"
+                    % (self.signatures.num_perm, len(minhash)))
+        seen = set()
+        # Min-heap of the best (jaccard, tie breaker, key) found so far
+        heap = []
+        counter = itertools.count()
+        levels = 0
+        ranges = self._prefix_ranges(minhash)
+        r = self.k
+        while r > 0 and len(seen) < k:
+            levels += 1
+            found = set(self._query(minhash, r, self.l, ranges))
+            candidates = [key for key in found if key not in seen]
+            seen.update(candidates)
+            sims = self.signatures.jaccard(minhash.hashvalues, candidates)
+            for key, sim in zip(candidates, sims):
+                item = (float(sim), -next(counter), key)
+                if len(heap) < k:
+                    heapq.heappush(heap, item)
+                elif item[0] > heap[0][0]:
+                    heapq.heapreplace(heap, item)
+            r -= 1
+        results = [(key, sim) for sim, _, key in sorted(heap, reverse=True)]
+        if return_stats:
+            return results, {'prefix_levels': levels, 'candidates': len(seen)}
+        return results
 
     def is_empty(self):
         '''
@@ -132,7 +520,79 @@ class MinHashLSHForest(object):
         Returns:
             bool: True if there is no searchable key in the index.
         '''
-        return any(len(t) == 0 for t in self.sorted_hashtables)
+        if self.sorted_sets is not None:
+            return any(sorted_set.size() == 0 for sorted_set in self.sorted_sets)
+        return len(self._id_keys) == len(self._removed)
+
+    def save(self, path):
+        '''
+        Save the forest to a file in a versioned binary format, which can be
+        loaded by :func:`datasketch.MinHashLSHForest.load` without unpickling.
+        Keys added but not yet indexed are saved and indexed on load.
+
+        Args:
+            path (str): The path of the file.
+
+        Note:
+            Keys must be of type `bytes`, `str` or `int`.
+        '''
+        meta, arrays = self._to_arrays()
+        save_arrays(path, 'MinHashLSHForest', meta, arrays)
+
+    def _to_arrays(self):
+        arrays = freeze(self.keys, self.hashtables)
+        if self.signatures is not None:
+            key_array = KeyArray(arrays['key_data'], arrays['key_offsets'])
+            arrays['signatures'] = self.signatures.get(
+                [key_array.key(i) for i in range(len(key_array))])
+        return {'l': self.l, 'k': self.k}, arrays
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        '''
+        Load a forest saved by :func:`datasketch.MinHashLSHForest.save`.
+
+        Args:
+            path (str): The path of the file.
+            mmap (bool, optional): If True, the forest is a read-only,
+                already indexed view of the memory-mapped file.
+                Otherwise, the forest is read into memory and can be modified.
+
+        Returns:
+            datasketch.MinHashLSHForest
+        '''
+        meta, arrays = load_arrays(path, 'MinHashLSHForest', mmap=mmap)
+        return cls._from_arrays(meta, arrays, mmap)
+
+    @classmethod
+    def _from_arrays(cls, meta, arrays, mmap):
+        forest = cls(num_perm=meta['l']*meta['k'], l=meta['l'])
+        keys, hashtables = frozen_storages(arrays, forest.l,
+                                           hashtable_type=FrozenListStorage)
+        signatures = None
+        if 'signatures' in arrays:
+            signatures = FrozenSignatureStore(arrays['signatures'],
+                                              keys.key_array)
+        if mmap:
+            forest.signatures = signatures
+            forest.keys, forest.hashtables = keys, hashtables
+            forest.sorted_hashtables = [t.sorted_keys for t in hashtables]
+            forest.indptr = [t.indptr for t in hashtables]
+            forest.indices = [t.indices for t in hashtables]
+            forest._id_keys = keys.key_array
+            return forest
+        if signatures is not None:
+            forest.signatures = SignatureStore(signatures.num_perm)
+        for i, key in enumerate(keys.keys()):
+            Hs = keys.get(key)
+            forest.keys.insert(key, *Hs)
+            if signatures is not None:
+                forest.signatures.add(key, signatures.signatures[i])
+            for H, hashtable in zip(Hs, forest.hashtables):
+                hashtable.insert(H, key)
+            forest._pending.append(key)
+        forest.index()
+        return forest
 
     def _H(self, hs):
         return bytes(hs.byteswap().data)
@@ -0,0 +1,166 @@
+from collections import OrderedDict
+import math
+import time
+from datasketch.lsh import MinHashLSH, _init_params
+
+
+class MinHashLSHWindow(object):
+    '''
+    The sliding-window MinHash LSH for streams where only the recent sets
+    matter. The window is partitioned into time buckets, each one a
+    :class:`datasketch.MinHashLSH`: insertions go to the bucket of their
+    timestamp, queries fan out over the live buckets, and a bucket is
+    dropped as a whole once it falls out of the window, so the cost of
+    insertion, query and expiry does not grow as the stream runs.
+
+    A set is kept for at least `window` after its timestamp, and expires
+    at most one bucket length (i.e., `window / num_buckets`) later.
+
+    Args:
+        window (float): The length of the window, in the unit of the
+            timestamps (e.g., seconds for the default `time.time`).
+        num_buckets (int, optional): The number of time buckets the window
+            is partitioned into.
+        threshold (float): The Jaccard similarity threshold between 0.0 and
+            1.0, see :class:`datasketch.MinHashLSH`.
+        num_perm (int, optional): The number of permutation functions used
+            by the MinHash to be indexed.
+        weights (tuple, optional): Used to adjust the relative importance of
+            minimizing false positive and false negative when optimizing
+            for the Jaccard similarity threshold.
+        params (tuple, optional): The LSH parameters (i.e., number of bands
+            and size of each bands), bypassing the parameter optimization.
+
+    Note:
+        Timestamps are given to :func:`datasketch.MinHashLSHWindow.insert`
+        and :func:`datasketch.MinHashLSHWindow.query`, and default to
+        `time.time()`. If the timestamps are not the wall-clock time,
+        always give them explicitly.
+    '''
+
+    def __init__(self, window, num_buckets=10, threshold=0.9, num_perm=128,
+                 weights=(0.5,0.5), params=None):
+        if window <= 0:
+            raise ValueError("window must be positive")
+        if num_buckets < 1:
+            raise ValueError("num_buckets must be at least 1")
+        self.window = window
+        self.num_buckets = num_buckets
+        self.bucket_length = float(window) / num_buckets
+        # Optimize the parameters once and share them with all buckets
+        self.b, self.r = _init_params(threshold, num_perm, weights, params)
+        self.threshold = threshold
+        self.h = num_perm
+        # Bucket ids to MinHashLSH, from the oldest to the newest
+        self.buckets = OrderedDict()
+        self._now = None
+
+    def _bucket_id(self, timestamp):
+        return int(math.floor(timestamp / self.bucket_length))
+
+    def _oldest_live(self):
+        return self._bucket_id(self._now) - self.num_buckets
+
+    def expire(self, timestamp=None):
+        '''
+        Advance the time of the window and drop the buckets that fell out
+        of it. This is called by insertions and queries.
+
+        Args:
+            timestamp (float, optional): The current time.
+                Default is `time.time()`.
+        '''
+        if timestamp is None:
+            timestamp = time.time()
+        if self._now is not None and timestamp <= self._now:
+            return
+        self._now = timestamp
+        oldest = self._oldest_live()
+        while self.buckets and next(iter(self.buckets)) < oldest:
+            self.buckets.popitem(last=False)
+
+    def insert(self, key, minhash, timestamp=None):
+        '''
+        Insert a unique key to the bucket of the timestamp, together with
+        a MinHash (or weighted MinHash) of the set referenced by the key.
+
+        Args:
+            key (hashable): The unique identifier of the set.
+            minhash (datasketch.MinHash): The MinHash of the set.
+            timestamp (float, optional): The time of the set.
+                Default is `time.time()`.
+        '''
+        if len(minhash) != self.h:
+            raise ValueError("Expecting minhash with length %d, got %d"
+                    % (self.h, len(minhash)))
+        if timestamp is None:
+            timestamp = time.time()
+        self.expire(timestamp)
+        i = self._bucket_id(timestamp)
+        if i < self._oldest_live():
+            raise ValueError("The given timestamp is outside of the window")
+        if key in self:
+            raise ValueError("The given key already exists")
+        if i not in self.buckets:
+            late = self.buckets and i < next(reversed(self.buckets))
+            self.buckets[i] = MinHashLSH(threshold=self.threshold,
+                    num_perm=self.h, params=(self.b, self.r))
+            if late:
+                # A late set created an older bucket
+                self.buckets = OrderedDict(sorted(self.buckets.items()))
+        self.buckets[i].insert(key, minhash)
+
+    def query(self, minhash, timestamp=None):
+        '''
+        Giving the MinHash of the query set, retrieve
+        the keys of the live sets that have Jaccard
+        similarities likely greater than the threshold.
+
+        Args:
+            minhash (datasketch.MinHash): The MinHash of the query set.
+            timestamp (float, optional): The current time.
+                Default is `time.time()`.
+
+        Returns:
+            `list` of unique keys.
+        '''
+        self.expire(timestamp)
+        candidates = []
+        for lsh in self.buckets.values():
+            candidates.extend(lsh.query(minhash))
+        return candidates
+
+    def remove(self, key):
+        '''
+        Remove the key from the window before it expires.
+
+        Args:
+            key (hashable): The unique identifier of a set.
+        '''
+        for i, lsh in self.buckets.items():
+            if key in lsh:
+                lsh.remove(key)
+                if lsh.is_empty():
+                    del self.buckets[i]
+                return
+        raise ValueError("The given key does not exist")
+
+    def __contains__(self, key):
+        '''
+        Args:
+            key (hashable): The unique identifier of a set.
+
+        Returns:
+            bool: True only if the key exists in a live bucket.
+        '''
+        return any(key in lsh for lsh in self.buckets.values())
+
+    def __len__(self):
+        return sum(lsh.keys.size() for lsh in self.buckets.values())
+
+    def is_empty(self):
+        '''
+        Returns:
+            bool: Check if the window is empty.
+        '''
+        return not self.buckets
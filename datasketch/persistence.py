@@ -0,0 +1,182 @@
+'''
+A versioned binary file format for saving indexes as a collection of
+NumPy arrays, which can be memory-mapped when loaded so that many
+processes share the same pages of the operating system's page cache.
+
+The file layout:
+    1. The first 8 bytes is the magic string ``DSKETCH\\0``
+    2. The next 4 bytes is the format version (little-endian)
+    3. The next 4 bytes is the length of the header (little-endian)
+    4. The header is a UTF-8 encoded JSON object with the ``kind`` of the
+       index, its ``meta`` parameters, and the ``name``, ``dtype``, ``shape``
+       and ``offset`` of every array
+    5. The rest is the raw array data, each array aligned to 64 bytes
+'''
+import bisect
+import json
+import struct
+import numpy as np
+
+FORMAT_VERSION = 1
+
+_magic = b'DSKETCH\x00'
+_prefix_fmt = '<8sII'
+_alignment = 64
+
+
+def _aligned(n):
+    return (n + _alignment - 1) // _alignment * _alignment
+
+
+def save_arrays(path, kind, meta, arrays):
+    '''
+    Save arrays together with the parameters of an index to a file.
+
+    Args:
+        path (str): The path of the file.
+        kind (str): The kind of the index, checked by :func:`load_arrays`.
+        meta (dict): JSON-serializable parameters of the index.
+        arrays (dict): Mapping from array names to `numpy.ndarray`.
+    '''
+    # The contiguous copies are kept without modifying the caller's dict
+    arrays = dict(arrays)
+    entries = []
+    offset = 0
+    for name in sorted(arrays):
+        a = np.ascontiguousarray(arrays[name])
+        arrays[name] = a
+        entries.append({'name': name, 'dtype': a.dtype.str,
+                        'shape': list(a.shape), 'offset': offset})
+        offset = _aligned(offset + a.nbytes)
+    header = json.dumps({'kind': kind, 'meta': meta,
+                         'arrays': entries}).encode('utf8')
+    prefix = struct.pack(_prefix_fmt, _magic, FORMAT_VERSION, len(header))
+    data_start = _aligned(len(prefix) + len(header))
+    with open(path, 'wb') as f:
+        f.write(prefix)
+        f.write(header)
+        for entry in entries:
+            f.write(b'\x00' * (data_start + entry['offset'] - f.tell()))
+            f.write(arrays[entry['name']].tobytes())
+
+
+def load_arrays(path, kind, mmap=True):
+    '''
+    Load the arrays and parameters of an index saved by :func:`save_arrays`.
+
+    Args:
+        path (str): The path of the file.
+        kind (str): The expected kind of the index.
+        mmap (bool, optional): If True, the arrays are read-only memory-mapped
+            views of the file, otherwise they are read into memory.
+
+    Returns:
+        tuple: `(meta, arrays)`, the parameters and the mapping from
+        array names to `numpy.ndarray`.
+    '''
+    with open(path, 'rb') as f:
+        prefix = f.read(struct.calcsize(_prefix_fmt))
+        if len(prefix) < struct.calcsize(_prefix_fmt):
+            raise ValueError("%s is not a datasketch index file" % path)
+        magic, version, header_size = struct.unpack(_prefix_fmt, prefix)
+        if magic != _magic:
+            raise ValueError("%s is not a datasketch index file" % path)
+        if version > FORMAT_VERSION:
+            raise ValueError("Unsupported format version %d, expecting\
+                    at most %d" % (version, FORMAT_VERSION))
+        header = json.loads(f.read(header_size).decode('utf8'))
+        if header['kind'] != kind:
+            raise ValueError("Expecting a saved %s, got %s"
+                    % (kind, header['kind']))
+        data_start = _aligned(len(prefix) + header_size)
+        if mmap:
+            buf = np.memmap(path, dtype=np.uint8, mode='r')
+        else:
+            f.seek(0)
+            buf = np.frombuffer(f.read(), dtype=np.uint8)
+    arrays = {}
+    for entry in header['arrays']:
+        dtype = np.dtype(entry['dtype'])
+        shape = tuple(entry['shape'])
+        start = data_start + entry['offset']
+        nbytes = int(np.prod(shape)) * dtype.itemsize
+        arrays[entry['name']] = buf[start:start+nbytes].view(dtype).reshape(shape)
+    return header['meta'], arrays
+
+
+def encode_key(key):
+    '''
+    Encode a key of type `bytes`, `str` or `int` into bytes tagged with
+    the type of the key, so it can be decoded by :func:`decode_key`.
+    '''
+    if isinstance(key, bytes):
+        return b'b' + key
+    if isinstance(key, bool):
+        raise ValueError("Cannot save key of type %s" % type(key))
+    if isinstance(key, int):
+        return b'i' + str(key).encode('ascii')
+    try:
+        return b's' + key.encode('utf8')
+    except AttributeError:
+        raise ValueError("Cannot save key of type %s" % type(key))
+
+
+def decode_key(b):
+    '''
+    Decode a key encoded by :func:`encode_key`.
+    '''
+    tag, payload = b[:1], b[1:]
+    if tag == b'b':
+        return payload
+    if tag == b'i':
+        return int(payload)
+    return payload.decode('utf8')
+
+
+class KeyArray(object):
+    '''
+    A read-only sorted array of encoded keys, stored as a data blob and
+    offsets. The position of a key in the array is its internal id.
+
+    Args:
+        data (numpy.array): The concatenated encoded keys in sorted order.
+        offsets (numpy.array): The offsets of the keys in `data`, one more
+            than the number of keys.
+    '''
+
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+
+    @classmethod
+    def from_keys(cls, keys):
+        '''
+        Create a key array from an iterable of keys.
+        '''
+        encoded = sorted(encode_key(key) for key in keys)
+        offsets = np.zeros(len(encoded)+1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(e) for e in encoded])
+        data = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+        return cls(data, offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        '''Return the encoded key with the internal id `i`.'''
+        return self.data[self.offsets[i]:self.offsets[i+1]].tobytes()
+
+    def key(self, i):
+        '''Return the key with the internal id `i`.'''
+        return decode_key(self[i])
+
+    def index(self, key):
+        '''Return the internal id of `key`, or -1 if the key does not exist.'''
+        try:
+            e = encode_key(key)
+        except ValueError:
+            return -1
+        i = bisect.bisect_left(self, e)
+        if i < len(self) and self[i] == e:
+            return i
+        return -1
@@ -0,0 +1,151 @@
+import numpy as np
+
+
+def _compact(hashvalues):
+    # MinHash hash values are 32-bit values stored in 64-bit integers
+    if hashvalues.dtype == np.uint64 and hashvalues.ndim == 1:
+        return hashvalues.astype(np.uint32)
+    return hashvalues
+
+
+class SignatureStore(object):
+    '''
+    A compact store of the hash values of MinHash (or weighted MinHash),
+    kept as the rows of a matrix aligned to internal ids, so that the
+    Jaccard similarities between a query and many keys are estimated in a
+    single vectorized operation. The hash values of MinHash are stored
+    as `numpy.uint32`.
+
+    Args:
+        num_perm (int): The number of permutation functions of the MinHash.
+    '''
+
+    def __init__(self, num_perm):
+        self.num_perm = num_perm
+        self.signatures = None
+        self._ids = dict()
+        self._keys = []
+
+    def _row(self, key):
+        return self._ids.get(key, -1)
+
+    def add(self, key, hashvalues):
+        '''
+        Add or replace the hash values of a key.
+
+        Args:
+            key (hashable): The unique identifier of the set.
+            hashvalues (numpy.array): The hash values of the MinHash of the set.
+        '''
+        hashvalues = _compact(hashvalues)
+        if self.signatures is None:
+            self.signatures = np.empty((16,) + hashvalues.shape,
+                                       dtype=hashvalues.dtype)
+        i = self._row(key)
+        if i >= 0:
+            self.signatures[i] = hashvalues
+            return
+        i = len(self._keys)
+        if i == len(self.signatures):
+            self.signatures = np.concatenate([self.signatures,
+                                              np.empty_like(self.signatures)])
+        # The row is written before the key can be found by readers
+        self.signatures[i] = hashvalues
+        self._keys.append(key)
+        self._ids[key] = i
+
+    def remove(self, key):
+        '''
+        Remove the hash values of a key. The last row is moved into the
+        freed row to keep the matrix dense.
+
+        Args:
+            key (hashable): The unique identifier of the set.
+        '''
+        i = self._ids.pop(key)
+        last = len(self._keys) - 1
+        last_key = self._keys[last]
+        if last_key != key:
+            # The row is copied before the moved key points to it
+            self.signatures[i] = self.signatures[last]
+            self._keys[i] = last_key
+            self._ids[last_key] = i
+        self._keys.pop()
+
+    def __contains__(self, key):
+        return self._row(key) >= 0
+
+    def __len__(self):
+        return len(self._keys)
+
+    def rows(self, keys):
+        '''
+        Returns:
+            numpy.array: The internal ids of the keys.
+        '''
+        rows = np.array([self._row(key) for key in keys], dtype=np.int64)
+        if np.any(rows < 0):
+            raise ValueError("Some of the given keys do not exist")
+        return rows
+
+    def get(self, keys):
+        '''
+        Returns:
+            numpy.array: The hash values of the keys, one row for each key.
+        '''
+        rows = self.rows(keys)
+        if self.signatures is None:
+            # Nothing was added yet, so the keys must be empty
+            return np.empty((0, self.num_perm), dtype=np.uint32)
+        return self.signatures[rows]
+
+    def jaccard(self, hashvalues, keys):
+        '''
+        Estimate the Jaccard similarities between the set represented by
+        the hash values and the sets referenced by the keys.
+
+        Args:
+            hashvalues (numpy.array): The hash values of the MinHash of
+                the query set.
+            keys (list): The keys of the stored sets.
+
+        Returns:
+            numpy.array: The Jaccard similarities, one for each key, or NaN
+            for a key that does not exist (e.g., removed by another thread
+            after it was found by a query).
+        '''
+        if len(keys) == 0:
+            return np.zeros(0)
+        if len(hashvalues) != self.num_perm:
+            raise ValueError("Expecting minhash with length %d, got %d"
+                    % (self.num_perm, len(hashvalues)))
+        rows = np.array([self._row(key) for key in keys], dtype=np.int64)
+        found = rows >= 0
+        sims = np.full(len(keys), np.nan)
+        eq = self.signatures[rows[found]] == _compact(hashvalues)
+        sims[found] = eq.reshape(len(eq), self.num_perm, -1).all(axis=2).mean(axis=1)
+        return sims
+
+
+class FrozenSignatureStore(SignatureStore):
+    '''
+    A read-only :class:`SignatureStore` whose rows are aligned to the
+    internal ids of a :class:`datasketch.persistence.KeyArray`, e.g.,
+    loaded from a memory-mapped file.
+    '''
+
+    def __init__(self, signatures, key_array):
+        self.num_perm = signatures.shape[1]
+        self.signatures = signatures
+        self.key_array = key_array
+
+    def _row(self, key):
+        return self.key_array.index(key)
+
+    def add(self, key, hashvalues):
+        raise TypeError("Cannot modify a frozen signature store")
+
+    remove = add
+
+    def __len__(self):
+        return len(self.key_array)
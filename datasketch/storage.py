@@ -1,28 +1,256 @@
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
+from functools import partial
+import bisect
+import hashlib
+import threading
+import time
 import redis
+import numpy as np
 import os
 import random
 import string
 from abc import ABCMeta, abstractmethod
+from datasketch.persistence import KeyArray
 ABC = ABCMeta('ABC', (object,), {}) # compatible with Python 2 *and* 3
 
 
-def ordered_storage(config):
-    '''Return ordered storage system based on the specified config'''
+def ordered_storage(config, connections=None, name=None):
+    '''Return ordered storage system based on the specified config.
+
+    The storages created with the same `connections` dict share one
+    :class:`RedisConnection` for each Redis server. The `name` of a Redis
+    storage prefixes its Redis keys, and is random if not given.'''
     tp = config['type']
     if tp == 'dict':
+        if config.get('copy_on_write', False):
+            return CopyOnWriteDictListStorage(config)
         return DictListStorage(config)
     if tp == 'redis':
-        return RedisListStorage(config)
+        return RedisListStorage(config, name=name, connections=connections)
+    if tp == 'redis_sharded':
+        return ShardedRedisListStorage(config, name=name, connections=connections)
+
 
+def unordered_storage(config, connections=None, name=None):
+    '''Return an unordered storage system based on the specified config.
 
-def unordered_storage(config):
-    '''Return an unordered storage system based on the specified config'''
+    The storages created with the same `connections` dict share one
+    :class:`RedisConnection` for each Redis server. The `name` of a Redis
+    storage prefixes its Redis keys, and is random if not given.'''
     tp = config['type']
     if tp == 'dict':
+        if config.get('copy_on_write', False):
+            return CopyOnWriteDictSetStorage(config)
         return DictSetStorage(config)
     if tp == 'redis':
-        return RedisSetStorage(config)
+        return RedisSetStorage(config, name=name, connections=connections)
+    if tp == 'redis_sharded':
+        return ShardedRedisSetStorage(config, name=name, connections=connections)
+
+
+def sorted_storage(config, connections=None, name=None):
+    '''Return a storage of sorted keys that supports scanning the keys in
+    a range, based on the specified config, or None for the dict storage,
+    whose keys are sorted in memory by the index instead.
+
+    The storages created with the same `connections` dict share one
+    :class:`RedisConnection` for each Redis server. The `name` of a Redis
+    storage prefixes its Redis keys, and is random if not given.'''
+    tp = config['type']
+    if tp == 'dict':
+        return None
+    if tp == 'redis':
+        return RedisSortedStorage(config, name=name, connections=connections)
+    raise ValueError("Sorted storage does not support storage type %s" % tp)
+
+
+def storage_name(config, suffix):
+    '''Return the name of a storage of an index, the `basename` of the
+    config followed by `suffix`, or None (i.e., a random name) if the config
+    has no `basename`. The storages of an index with a `basename` can
+    be reopened by another index created with the same config.'''
+    basename = config.get('basename')
+    if basename is None:
+        return None
+    if not isinstance(basename, bytes):
+        basename = basename.encode('utf8')
+    return basename + suffix
+
+
+def multi_get(requests):
+    '''Get the values under keys of several storages, in as few round
+    trips as the storages allow: the requests to Redis storages on the
+    same server are sent in a single pipeline.
+
+    Args:
+        requests (list): A list of `(storage, key)` tuples.
+
+    Returns:
+        list: The values under each key, in the order of the requests.
+    '''
+    results = [None] * len(requests)
+    pipes = {}
+    for i, (storage, key) in enumerate(requests):
+        if isinstance(storage, ShardedRedisStorage):
+            storage = storage.shard(key)
+        if isinstance(storage, RedisStorage):
+            pipe, indexes = _pipeline(pipes, storage)
+            storage._get_items(pipe, storage.redis_key(key))
+            indexes.append(i)
+        else:
+            results[i] = storage.get(key)
+    pipes = list(pipes.values())
+    outputs = _run_parallel([pipe.execute for pipe, _ in pipes])
+    for (_, indexes), output in zip(pipes, outputs):
+        for i, result in zip(indexes, output):
+            results[i] = result
+    return results
+
+
+def multi_insert(requests, buffer=False):
+    '''Insert values under keys of several storages, in as few round
+    trips as the storages allow: the insertions to Redis storages on the
+    same server are sent in a single pipeline.
+
+    Args:
+        requests (list): A list of `(storage, key, values)` tuples.
+        buffer (bool, optional): If True, the insertions are added to the
+            buffers of the storages instead.
+    '''
+    pipes = {}
+    for storage, key, vals in requests:
+        if isinstance(storage, ShardedRedisStorage):
+            storage = storage.shard(key)
+        if isinstance(storage, RedisStorage) and not buffer:
+            pipe, _ = _pipeline(pipes, storage)
+            storage._insert(pipe, key, *vals)
+        else:
+            storage.insert(key, *vals, buffer=buffer)
+    _run_parallel([pipe.execute for pipe, _ in pipes.values()])
+
+
+def multi_remove_val(requests):
+    '''Remove values under keys of several storages, in as few round
+    trips as the storages allow: the removals from Redis storages on the
+    same server are sent in a single pipeline, together with the commands
+    checking which keys are left without values.
+
+    Args:
+        requests (list): A list of `(storage, key, values)` tuples.
+
+    Returns:
+        list: Whether each key is left without values, in the order of
+        the requests.
+    '''
+    results = [None] * len(requests)
+    pipes = {}
+    for i, (storage, key, vals) in enumerate(requests):
+        if isinstance(storage, ShardedRedisStorage):
+            storage = storage.shard(key)
+        if isinstance(storage, RedisStorage):
+            pipe, indexes = _pipeline(pipes, storage)
+            storage._remove_items(pipe, storage.redis_key(key), *vals)
+            indexes.append((i, storage, key))
+        else:
+            for val in vals:
+                storage.remove_val(key, val)
+            results[i] = not storage.get(key)
+    pipes = list(pipes.values())
+    for pipe, indexes in pipes:
+        # The sizes are the last results of each pipeline
+        for _, storage, key in indexes:
+            storage._get_len(pipe, storage.redis_key(key))
+    outputs = _run_parallel([pipe.execute for pipe, _ in pipes])
+    for (_, indexes), output in zip(pipes, outputs):
+        sizes = output[len(output)-len(indexes):]
+        for (i, _, _), size in zip(indexes, sizes):
+            results[i] = size == 0
+    return results
+
+
+def multi_remove(requests):
+    '''Remove keys of several storages, in as few round trips as the
+    storages allow: the removals from Redis storages on the same server are
+    sent in a single pipeline.
+
+    Args:
+        requests (list): A list of `(storage, keys)` tuples.
+    '''
+    pipes = {}
+    for storage, keys in requests:
+        if not keys:
+            continue
+        if isinstance(storage, ShardedRedisStorage):
+            groups = [(storage.shards[node], ks)
+                      for node, ks in storage._group(keys).items()]
+        else:
+            groups = [(storage, keys)]
+        for target, ks in groups:
+            if isinstance(target, RedisStorage):
+                pipe, _ = _pipeline(pipes, target)
+                target._remove(pipe, *ks)
+            else:
+                target.remove(*ks)
+    _run_parallel([pipe.execute for pipe, _ in pipes.values()])
+
+
+def multi_range(requests):
+    '''Scan the keys in ranges of several sorted storages, in as few round
+    trips as the storages allow: the scans of Redis storages on the same
+    server are sent in a single pipeline.
+
+    Args:
+        requests (list): A list of `(storage, lo, hi)` tuples, the storage
+            and the inclusive bounds of the range.
+
+    Returns:
+        list: The sorted keys in each range, in the order of the requests.
+    '''
+    results = [None] * len(requests)
+    pipes = {}
+    for i, (storage, lo, hi) in enumerate(requests):
+        if isinstance(storage, RedisStorage):
+            pipe, indexes = _pipeline(pipes, storage)
+            storage._range(pipe, lo, hi)
+            indexes.append(i)
+        else:
+            results[i] = storage.range(lo, hi)
+    pipes = list(pipes.values())
+    outputs = _run_parallel([pipe.execute for pipe, _ in pipes])
+    for (_, indexes), output in zip(pipes, outputs):
+        for i, result in zip(indexes, output):
+            results[i] = result
+    return results
+
+
+def _run_parallel(funcs):
+    '''Call the functions in parallel threads, e.g., to execute pipelines
+    on several Redis servers, and return their results in order.'''
+    if len(funcs) <= 1:
+        return [func() for func in funcs]
+    results = [None] * len(funcs)
+    errors = []
+    def run(i, func):
+        try:
+            results[i] = func()
+        except Exception as e:
+            errors.append(e)
+    threads = [threading.Thread(target=run, args=(i, func))
+               for i, func in enumerate(funcs)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return results
+
+
+def _pipeline(pipes, storage):
+    server = storage.server_key()
+    if server not in pipes:
+        pipes[server] = (storage._redis.pipeline(), [])
+    return pipes[server]
 
 
 class Storage(ABC):
@@ -63,6 +291,11 @@ class Storage(ABC):
         '''Add `val` to storage against `key`'''
         pass
 
+    def insert_many(self, items, **kwargs):
+        '''Add the values of many `(key, vals)` tuples'''
+        for key, vals in items:
+            self.insert(key, *vals, **kwargs)
+
     @abstractmethod
     def remove(self, *keys):
         '''Remove `keys` from storage'''
@@ -125,6 +358,19 @@ class DictListStorage(OrderedStorage):
     def insert(self, key, *vals, **kwargs):
         self._dict[key].extend(vals)
 
+    def insert_many(self, items, **kwargs):
+        # The new keys are added in a single dict update
+        d = self._dict
+        new = dict()
+        for key, vals in items:
+            if key in d:
+                d[key].extend(vals)
+            elif key in new:
+                new[key].extend(vals)
+            else:
+                new[key] = list(vals)
+        d.update(new)
+
     def size(self):
         return len(self._dict)
 
@@ -145,46 +391,318 @@ class DictSetStorage(UnorderedStorage, DictListStorage):
     def insert(self, key, *vals, **kwargs):
         self._dict[key].update(vals)
 
+    def insert_many(self, items, **kwargs):
+        d = self._dict
+        new = dict()
+        for key, vals in items:
+            if key in d:
+                d[key].update(vals)
+            elif key in new:
+                new[key].update(vals)
+            else:
+                new[key] = set(vals)
+        d.update(new)
+
+
+class CopyOnWriteDictListStorage(DictListStorage):
+    '''A dict storage whose lists of values are never modified in place:
+    every write replaces the list under the key with a new one. Readers in
+    other threads can therefore use the values they get without locking,
+    while a single writer thread modifies the storage.
+
+    It is used when the config contains :code:`'copy_on_write': True`.'''
+    _empty = list
+
+    def keys(self):
+        return list(self._dict)
+
+    def remove_val(self, key, val):
+        vals = self._empty(self._dict[key])
+        vals.remove(val)
+        self._dict[key] = vals
+
+    def insert(self, key, *vals, **kwargs):
+        self._dict[key] = self._dict.get(key, []) + list(vals)
+
+    def insert_many(self, items, **kwargs):
+        # The values are replaced, never extended in place
+        for key, vals in items:
+            self.insert(key, *vals)
+
+    def itemcounts(self, **kwargs):
+        return {k: len(v) for k, v in list(self._dict.items())}
+
+
+class CopyOnWriteDictSetStorage(UnorderedStorage, CopyOnWriteDictListStorage):
+    _empty = set
+
+    def __init__(self, config):
+        self._dict = defaultdict(set)
+
+    def get(self, key):
+        return self._dict.get(key, set())
+
+    def insert(self, key, *vals, **kwargs):
+        self._dict[key] = self._dict.get(key, set()).union(vals)
+
+
+class FixedWidthBytes(object):
+    '''A read-only sequence view of a fixed-width bytes array (e.g., of
+    dtype `S16`) that keeps the trailing null bytes of its items.'''
+
+    def __init__(self, array):
+        self.array = array
+
+    def __len__(self):
+        return len(self.array)
+
+    def __getitem__(self, i):
+        return self.array[i:i+1].tobytes()
+
+    def __iter__(self):
+        for i in range(len(self.array)):
+            yield self[i]
+
+
+def _frozen(*args, **kwargs):
+    raise TypeError("Cannot modify a frozen storage")
+
+
+class FrozenListStorage(OrderedStorage):
+    '''A read-only storage backed by arrays: the sorted fixed-width keys,
+    and the internal ids of the values under each key in compressed sparse
+    row format. The values are decoded from internal ids using a
+    :class:`datasketch.persistence.KeyArray`.'''
+
+    def __init__(self, sorted_keys, indptr, indices, key_array):
+        self.sorted_keys = sorted_keys
+        self.indptr = indptr
+        self.indices = indices
+        self.key_array = key_array
+
+    insert = remove = remove_val = _frozen
+
+    def _find(self, key):
+        i = int(np.searchsorted(self.sorted_keys, key))
+        if i < len(self.sorted_keys) and \
+                self.sorted_keys[i:i+1].tobytes() == key:
+            return i
+        return -1
+
+    def keys(self):
+        return FixedWidthBytes(self.sorted_keys)
+
+    def ids(self, key):
+        '''Return the internal ids of the values under `key`'''
+        i = self._find(key)
+        if i < 0:
+            return self.indices[0:0]
+        return self.indices[self.indptr[i]:self.indptr[i+1]]
+
+    def get(self, key):
+        return [self.key_array.key(i) for i in self.ids(key)]
+
+    def size(self):
+        return len(self.sorted_keys)
+
+    def itemcounts(self, **kwargs):
+        return dict(zip(self.keys(), np.diff(self.indptr).tolist()))
+
+    def has_key(self, key):
+        return self._find(key) >= 0
+
+
+class FrozenSetStorage(UnorderedStorage, FrozenListStorage):
+
+    def get(self, key):
+        return set(self.key_array.key(i) for i in self.ids(key))
+
+
+class FrozenKeyStorage(OrderedStorage):
+    '''A read-only storage of the hashtable keys (e.g., band hash values)
+    under each index key. The hashtable keys are stored as positions into
+    the sorted keys of the frozen hashtables.'''
+
+    def __init__(self, key_array, positions, hashtables):
+        self.key_array = key_array
+        self.positions = positions
+        self.hashtables = hashtables
+
+    insert = remove = remove_val = _frozen
+
+    def keys(self):
+        return [self.key_array.key(i) for i in range(len(self.key_array))]
 
-class RedisBuffer(redis.client.Pipeline):
+    def get(self, key):
+        i = self.key_array.index(key)
+        if i < 0:
+            return []
+        return [t.keys()[p] for t, p in zip(self.hashtables, self.positions[i])]
 
-    def __init__(self, connection_pool, response_callbacks, transaction,
-                 shard_hint=None, buffer_size=50000):
+    def size(self):
+        return len(self.key_array)
+
+    def itemcounts(self, **kwargs):
+        return dict((key, len(self.hashtables)) for key in self.keys())
+
+    def has_key(self, key):
+        return self.key_array.index(key) >= 0
+
+
+def freeze(keys, hashtables):
+    '''Convert a key storage and its hashtables into arrays, which can
+    be saved with :func:`datasketch.persistence.save_arrays` and read back
+    as frozen storages with :func:`frozen_storages`.
+
+    Args:
+        keys: The storage (or `dict`) from each index key to the list of its
+            hashtable keys, one for each hashtable.
+        hashtables (list): The storages (or `dict`) from each hashtable key
+            to the index keys under it.
+
+    Returns:
+        dict: Mapping from array names to `numpy.ndarray`.
+    '''
+    index_keys = list(keys.keys())
+    key_array = KeyArray.from_keys(index_keys)
+    ids = dict((key_array.key(i), i) for i in range(len(key_array)))
+    rows = np.array([ids[key] for key in index_keys], dtype=np.int64)
+    Hss = [keys.get(key) for key in index_keys]
+    positions = np.zeros((len(index_keys), len(hashtables)), dtype=np.int64)
+    arrays = {'key_data': key_array.data, 'key_offsets': key_array.offsets}
+    for t, hashtable in enumerate(hashtables):
+        Hs = sorted(hashtable.keys())
+        width = max(len(H) for H in Hs) if Hs else 1
+        sorted_keys = np.array(Hs, dtype='S%d' % width)
+        postings = [sorted(ids[key] for key in hashtable.get(H)) for H in Hs]
+        indptr = np.zeros(len(Hs)+1, dtype=np.int64)
+        indptr[1:] = np.cumsum([len(p) for p in postings])
+        indices = np.array([i for p in postings for i in p], dtype=np.int64)
+        if len(rows):
+            positions[rows, t] = np.searchsorted(sorted_keys,
+                    np.array([Hs_[t] for Hs_ in Hss], dtype=sorted_keys.dtype))
+        arrays['sorted_keys_%d' % t] = sorted_keys
+        arrays['indptr_%d' % t] = indptr
+        arrays['indices_%d' % t] = indices
+    arrays['positions'] = positions
+    return arrays
+
+
+def frozen_storages(arrays, num_tables, hashtable_type=FrozenSetStorage):
+    '''Create frozen storages from arrays created by :func:`freeze`.
+
+    Returns:
+        tuple: `(keys, hashtables)`, a :class:`FrozenKeyStorage` and a list
+        of `hashtable_type` storages.
+    '''
+    key_array = KeyArray(arrays['key_data'], arrays['key_offsets'])
+    hashtables = [hashtable_type(arrays['sorted_keys_%d' % t],
+                                 arrays['indptr_%d' % t],
+                                 arrays['indices_%d' % t], key_array)
+                  for t in range(num_tables)]
+    keys = FrozenKeyStorage(key_array, arrays['positions'], hashtables)
+    return keys, hashtables
+
+
+class RedisBuffer(object):
+    '''Buffers commands in a pipeline, which is executed automatically
+    once `buffer_size` commands are buffered, and keeps the count and the
+    timings of executions.'''
+
+    def __init__(self, pipeline, buffer_size=50000):
+        self.pipeline = pipeline
         self.buffer_size = buffer_size
-        super(RedisBuffer, self).__init__(
-            connection_pool, response_callbacks, transaction,
-            shard_hint=shard_hint)
+        self.num_commands = 0
+        self.num_executions = 0
+        self.execution_time = 0.0
+        self.last_execution_time = None
+
+    def __getattr__(self, name):
+        command = getattr(self.pipeline, name)
+        def buffered(*args, **kwargs):
+            if self.num_commands >= self.buffer_size:
+                self.execute()
+            command(*args, **kwargs)
+            self.num_commands += 1
+        return buffered
+
+    def execute(self):
+        if self.num_commands == 0:
+            return []
+        start = time.time()
+        self.num_commands = 0
+        results = self.pipeline.execute()
+        self.last_execution_time = time.time() - start
+        self.execution_time += self.last_execution_time
+        self.num_executions += 1
+        return results
+
+
+class RedisConnection(object):
+    '''A Redis client, with its connection pool, and a :class:`RedisBuffer`
+    shared by all storages of an index on the same Redis server, so that
+    buffered commands of all storages are flushed in a single round trip.
+
+    Args:
+        redis_config (dict): The parameters of `redis.Redis`.
+        buffer_size (int, optional): The maximum number of buffered commands.
+    '''
+
+    def __init__(self, redis_config, buffer_size=50000):
+        self.redis_config = redis_config
+        self.buffer_size = buffer_size
+        self.redis = redis.Redis(**redis_config)
+        self.buffer = RedisBuffer(self.redis.pipeline(transaction=True),
+                                  buffer_size=buffer_size)
+
+    def __getstate__(self):
+        return {'redis_config': self.redis_config,
+                'buffer_size': self.buffer_size}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
 
-    def execute_command(self, *args, **kwargs):
-        if len(self.command_stack) >= self.buffer_size:
-            self.execute()
-        super(RedisBuffer, self).execute_command(*args, **kwargs)
+    def flush(self):
+        '''Execute the buffered commands'''
+        self.buffer.execute()
+
+    def status(self):
+        '''Return the number of connections created by the connection pool,
+        and the count and timings (in seconds) of buffer flushes'''
+        pool = self.redis.connection_pool
+        return {'created_connections': getattr(pool, '_created_connections', None),
+                'flushes': self.buffer.num_executions,
+                'flush_time': self.buffer.execution_time,
+                'last_flush_time': self.buffer.last_execution_time}
 
 
 class RedisStorage:
 
-    def __init__(self, config, name=None):
+    def __init__(self, config, name=None, connections=None):
         self.config = config
-        redis_param = self._parse_config(self.config['redis'])
-        self._redis = redis.Redis(**redis_param)
-        self._buffer = RedisBuffer(self._redis.connection_pool,
-                                   self._redis.response_callbacks,
-                                   transaction=True)
         if name is None:
             name = _random_name(11)
         self._name = name
+        if connections is None:
+            connections = dict()
+        server = self.server_key()
+        if server not in connections:
+            connections[server] = RedisConnection(
+                self._parse_config(self.config['redis']),
+                buffer_size=self.config.get('buffer_size', 50000))
+        self._connection = connections[server]
+        self._redis = self._connection.redis
+        self._buffer = self._connection.buffer
+
+    def server_key(self):
+        '''Return a hashable identifying the Redis server'''
+        return repr(sorted(self._parse_config(self.config['redis']).items()))
 
     def redis_key(self, key):
         return self._name + key
 
     def _parse_config(self, config):
-        cfg = {}
-        for key, value in config.items():
-            if isinstance(value, dict):
-                if 'env' in value:
-                    value = os.getenv(value['env'], value.get('default', None))
-            cfg[key] = value
-        return cfg
+        return parse_redis_config(config)
 
     def __getstate__(self):
         state = self.__dict__.copy()
@@ -194,7 +712,8 @@ class RedisStorage:
 
     def __setstate__(self, state):
         self.__dict__ = state
-        self.__init__(self.config, name=self._name)
+        self._redis = self._connection.redis
+        self._buffer = self._connection.buffer
 
 
 class RedisListStorage(OrderedStorage, RedisStorage):
@@ -208,6 +727,7 @@ class RedisListStorage(OrderedStorage, RedisStorage):
     def status(self):
         status = self._parse_config(self.config['redis'])
         status.update(Storage.status(self))
+        status['connection'] = self._connection.status()
         return status
 
     def get(self, key):
@@ -217,7 +737,7 @@ class RedisListStorage(OrderedStorage, RedisStorage):
         pipe = self._redis.pipeline()
         pipe.multi()
         for key in keys:
-            pipe.lrange(self.redis_key(key), 0, -1)
+            self._get_items(pipe, self.redis_key(key))
         return pipe.execute()
 
     @staticmethod
@@ -225,14 +745,22 @@ class RedisListStorage(OrderedStorage, RedisStorage):
         return r.lrange(k, 0, -1)
 
     def remove(self, *keys):
-        self._redis.hdel(self._name, *keys)
-        self._redis.delete(*[self.redis_key(key) for key in keys])
+        self._remove(self._redis, *keys)
+
+    def _remove(self, r, *keys):
+        r.hdel(self._name, *keys)
+        r.delete(*[self.redis_key(key) for key in keys])
 
     def remove_val(self, key, val):
         redis_key = self.redis_key(key)
-        self._redis.lrem(redis_key, val)
+        self._remove_items(self._redis, redis_key, val)
         if not self._redis.exists(redis_key):
-            self._redis.hdel(self._name, redis_key)
+            self._redis.hdel(self._name, key)
+
+    @staticmethod
+    def _remove_items(r, k, *vals):
+        for val in vals:
+            r.lrem(k, 0, val)
 
     def insert(self, key, *vals, **kwargs):
         buffer = kwargs.pop('buffer', False)
@@ -266,8 +794,7 @@ class RedisListStorage(OrderedStorage, RedisStorage):
         return self._redis.hexists(self._name, key)
 
     def empty_buffer(self):
-        self._buffer.execute()
-        self.__init__(self.config, name=self._name)
+        self._connection.flush()
 
 
 class RedisSetStorage(UnorderedStorage, RedisListStorage):
@@ -276,11 +803,9 @@ class RedisSetStorage(UnorderedStorage, RedisListStorage):
     def _get_items(r, k):
         return r.smembers(k)
 
-    def remove_val(self, key, val):
-        redis_key = self.redis_key(key)
-        self._redis.srem(redis_key, val)
-        if not self._redis.exists(redis_key):
-            self._redis.hdel(self._name, redis_key)
+    @staticmethod
+    def _remove_items(r, k, *vals):
+        r.srem(k, *vals)
 
     def _insert(self, r, key, *values):
         redis_key = self.redis_key(key)
@@ -292,6 +817,239 @@ class RedisSetStorage(UnorderedStorage, RedisListStorage):
         return r.scard(k)
 
 
+class RedisSortedStorage(RedisStorage):
+    '''A sorted set of byte strings in Redis, which are scanned by range
+    in lexicographical order with ZRANGEBYLEX.'''
+
+    def keys(self):
+        return self._redis.zrange(self._name, 0, -1)
+
+    def insert(self, *keys, **kwargs):
+        buffer = kwargs.pop('buffer', False)
+        if buffer:
+            self._insert(self._buffer, *keys)
+        else:
+            self._insert(self._redis, *keys)
+
+    def _insert(self, r, *keys):
+        if keys:
+            r.zadd(self._name, dict.fromkeys(keys, 0))
+
+    def remove(self, *keys):
+        self._remove(self._redis, *keys)
+
+    def _remove(self, r, *keys):
+        if keys:
+            r.zrem(self._name, *keys)
+
+    def range(self, lo, hi):
+        '''Return the sorted keys between `lo` and `hi` inclusively.'''
+        return self._range(self._redis, lo, hi)
+
+    def _range(self, r, lo, hi):
+        return r.zrangebylex(self._name, b'[' + lo, b'[' + hi)
+
+    def size(self):
+        return self._redis.zcard(self._name)
+
+    def empty_buffer(self):
+        self._connection.flush()
+
+
+def parse_redis_config(config):
+    '''Parse the parameters of `redis.Redis`, replacing values in the
+    format of :code:`{'env': 'NAME', 'default': value}` by the value of the
+    environment variable'''
+    cfg = {}
+    for key, value in config.items():
+        if isinstance(value, dict):
+            if 'env' in value:
+                value = os.getenv(value['env'], value.get('default', None))
+        cfg[key] = value
+    return cfg
+
+
+def _hash(key):
+    if not isinstance(key, bytes):
+        key = str(key).encode('utf8')
+    return int(hashlib.md5(key).hexdigest()[:16], 16)
+
+
+class ConsistentHashRing(object):
+    '''A consistent hashing ring: adding or removing a node only remaps the
+    keys between the removed or added node and its neighbours on the ring.
+
+    Args:
+        nodes (list, optional): The names of the nodes.
+        replicas (int, optional): The number of points of each node on the
+            ring. More replicas spread keys more evenly.
+    '''
+
+    def __init__(self, nodes=(), replicas=100):
+        self.replicas = replicas
+        self._points = []
+        self._nodes = []
+        for node in nodes:
+            self.add_node(node)
+
+    def add_node(self, node):
+        for replica in range(self.replicas):
+            point = _hash(("%s-%d" % (node, replica)).encode('utf8'))
+            i = bisect.bisect(self._points, point)
+            self._points.insert(i, point)
+            self._nodes.insert(i, node)
+
+    def remove_node(self, node):
+        kept = [(p, n) for p, n in zip(self._points, self._nodes) if n != node]
+        self._points = [p for p, _ in kept]
+        self._nodes = [n for _, n in kept]
+
+    def get_node(self, key):
+        '''Return the node responsible for `key`'''
+        if not self._nodes:
+            raise ValueError("The ring has no node")
+        i = bisect.bisect(self._points, _hash(key)) % len(self._points)
+        return self._nodes[i]
+
+
+class ShardedRedisStorage(object):
+    '''Spreads the keys of a storage over several Redis servers by
+    consistent hashing. Every shard is a Redis storage with the same name
+    on its own server, so an existing single-server storage can be added
+    as a shard.
+
+    The config is in the format of:
+    :code:`{'type': 'redis_sharded', 'redis': [{'host': 'a', 'port': 6379},
+    {'host': 'b', 'port': 6379}], 'replicas': 100}`.
+    '''
+    shard_type = None
+
+    def __init__(self, config, name=None, connections=None):
+        self.config = config
+        if name is None:
+            name = _random_name(11)
+        self._name = name
+        if connections is None:
+            connections = dict()
+        self.connections = connections
+        self.ring = ConsistentHashRing(replicas=config.get('replicas', 100))
+        self.shards = OrderedDict()
+        for redis_config in config['redis']:
+            self._add_shard(redis_config)
+
+    @staticmethod
+    def _node(redis_config):
+        return repr(sorted(redis_config.items()))
+
+    def _add_shard(self, redis_config):
+        node = self._node(redis_config)
+        if node in self.shards:
+            raise ValueError("The shard already exists")
+        config = dict(self.config, type='redis', redis=redis_config)
+        self.shards[node] = self.shard_type(config, name=self._name,
+                                            connections=self.connections)
+        self.ring.add_node(node)
+        return node
+
+    def shard(self, key):
+        '''Return the shard storage responsible for `key`'''
+        return self.shards[self.ring.get_node(key)]
+
+    def _group(self, keys):
+        groups = OrderedDict()
+        for key in keys:
+            groups.setdefault(self.ring.get_node(key), []).append(key)
+        return groups
+
+    def _move(self, source, keys):
+        for key, vals in zip(keys, source.getmany(*keys)):
+            self.shard(key).insert(key, *vals)
+        if keys:
+            source.remove(*keys)
+
+    def add_shard(self, redis_config):
+        '''Add a Redis server as a new shard, and move to it the keys that
+        it is now responsible for -- only a fraction of about
+        `1/(number of shards)` of the keys is moved.'''
+        node = self._add_shard(redis_config)
+        self.config = dict(self.config,
+                           redis=list(self.config['redis']) + [redis_config])
+        for other, shard in list(self.shards.items()):
+            if other != node:
+                self._move(shard, [key for key in shard.keys()
+                                   if self.ring.get_node(key) == node])
+
+    def remove_shard(self, redis_config):
+        '''Remove the shard of a Redis server, and move its keys to the
+        remaining shards.'''
+        node = self._node(redis_config)
+        if node not in self.shards:
+            raise ValueError("The shard does not exist")
+        if len(self.shards) == 1:
+            raise ValueError("Cannot remove the last shard")
+        self.ring.remove_node(node)
+        shard = self.shards.pop(node)
+        self.config = dict(self.config, redis=[c for c in self.config['redis']
+                                               if self._node(c) != node])
+        self._move(shard, list(shard.keys()))
+
+
+class ShardedRedisListStorage(OrderedStorage, ShardedRedisStorage):
+    shard_type = RedisListStorage
+
+    def keys(self):
+        return [key for keys in _run_parallel([shard.keys for shard
+                                               in self.shards.values()])
+                for key in keys]
+
+    def status(self):
+        status = {'shards': [shard.status() for shard in self.shards.values()]}
+        status.update(Storage.status(self))
+        return status
+
+    def get(self, key):
+        return self.shard(key).get(key)
+
+    def getmany(self, *keys):
+        groups = self._group(keys)
+        outputs = _run_parallel([partial(self.shards[node].getmany, *ks)
+                                 for node, ks in groups.items()])
+        results = dict()
+        for ks, vals in zip(groups.values(), outputs):
+            results.update(zip(ks, vals))
+        return [results[key] for key in keys]
+
+    def remove(self, *keys):
+        for node, ks in self._group(keys).items():
+            self.shards[node].remove(*ks)
+
+    def remove_val(self, key, val):
+        self.shard(key).remove_val(key, val)
+
+    def insert(self, key, *vals, **kwargs):
+        self.shard(key).insert(key, *vals, **kwargs)
+
+    def size(self):
+        return sum(_run_parallel([shard.size for shard in self.shards.values()]))
+
+    def itemcounts(self):
+        counts = dict()
+        for c in _run_parallel([shard.itemcounts for shard
+                                in self.shards.values()]):
+            counts.update(c)
+        return counts
+
+    def has_key(self, key):
+        return self.shard(key).has_key(key)
+
+    def empty_buffer(self):
+        _run_parallel([shard.empty_buffer for shard in self.shards.values()])
+
+
+class ShardedRedisSetStorage(UnorderedStorage, ShardedRedisListStorage):
+    shard_type = RedisSetStorage
+
+
 def _random_name(length):
     return ''.join(random.choice(string.ascii_lowercase)
                    for _ in range(length)).encode('utf8')
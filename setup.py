@@ -74,7 +74,7 @@ setup(
     # your project is installed. For an analysis of "install_requires" vs pip's
     # requirements files see:
     # https://packaging.python.org/en/latest/requirements.html
-    install_requires=['numpy>=1.11', 'redis>=2.10.0'],
+    install_requires=['numpy>=1.11', 'redis>=3.0'],
 
     # List additional groups of dependencies here (e.g. development
     # dependencies). You can install these using the following syntax,
@@ -82,7 +82,8 @@ setup(
     # $ pip install -e .[dev,test]
     extras_require={
         'dev': ['check-manifest'],
-        'test': ['coverage', 'mock>=2.0.0', 'mockredispy'],
+        'aio': ['redis>=4.2'],
+        'test': ['coverage', 'mock>=2.0.0', 'fakeredis', 'redis>=4.2'],
     },
 
     # If there are data files included in your packages that need to be
@@ -0,0 +1,105 @@
+import unittest
+import asyncio
+from mock import patch
+from datasketch.minhash import MinHash
+from redis_fakes import fake_async_redis, fakeredis, requires_fakeredis
+if fakeredis is not None:
+    from datasketch.aio import AsyncMinHashLSH
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+@requires_fakeredis
+class TestAsyncMinHashLSH(unittest.TestCase):
+
+    def _minhashes(self, n):
+        ms = []
+        for i in range(n):
+            m = MinHash(16)
+            m.update(("%d" % i).encode("utf8"))
+            ms.append(m)
+        return ms
+
+    def _test_insert_query(self, storage_config):
+        async def test():
+            async with AsyncMinHashLSH(threshold=0.5, num_perm=16,
+                                       storage_config=storage_config) as lsh:
+                self.assertTrue(await lsh.is_empty())
+                ms = self._minhashes(10)
+                for i, m in enumerate(ms):
+                    await lsh.insert(("%d" % i).encode("utf8"), m)
+                self.assertFalse(await lsh.is_empty())
+                self.assertTrue(await lsh.has_key(b"0"))
+                with self.assertRaises(ValueError):
+                    await lsh.insert(b"0", ms[0])
+                with self.assertRaises(ValueError):
+                    await lsh.query(MinHash(18))
+                for i, m in enumerate(ms):
+                    self.assertTrue(("%d" % i).encode("utf8") in await lsh.query(m))
+                results = await lsh.query_many(ms)
+                self.assertEqual(len(results), 10)
+                for i, (m, result) in enumerate(zip(ms, results)):
+                    self.assertEqual(sorted(result), sorted(await lsh.query(m)))
+                await lsh.remove(b"0")
+                self.assertFalse(await lsh.has_key(b"0"))
+                self.assertTrue(b"0" not in await lsh.query(ms[0]))
+                for t in lsh.hashtables:
+                    for count in (await t.itemcounts()).values():
+                        self.assertTrue(count > 0)
+                with self.assertRaises(ValueError):
+                    await lsh.remove(b"0")
+        run(test())
+
+    def test_dict(self):
+        self._test_insert_query({'type': 'dict'})
+
+    def test_redis(self):
+        with patch('redis.asyncio.Redis', fake_async_redis):
+            self._test_insert_query({'type': 'redis',
+                'redis': {'host': 'localhost', 'port': 6390}})
+
+    def test_redis_pipeline(self):
+        with patch('redis.asyncio.Redis', fake_async_redis):
+            lsh = AsyncMinHashLSH(threshold=0.5, num_perm=16, storage_config={
+                'type': 'redis', 'redis': {'host': 'localhost', 'port': 6391}})
+            clients = set(id(t._redis) for t in lsh.hashtables)
+            clients.add(id(lsh.keys._redis))
+            self.assertEqual(len(clients), 1)
+            executions = []
+            pipeline = lsh.keys._redis.pipeline
+            def counting_pipeline(*args, **kwargs):
+                pipe = pipeline(*args, **kwargs)
+                executions.append(pipe)
+                return pipe
+            lsh.keys._redis.pipeline = counting_pipeline
+            ms = self._minhashes(3)
+            run(lsh.insert(b"a", ms[0]))
+            self.assertEqual(len(executions), 1)
+            run(lsh.query_many(ms))
+            self.assertEqual(len(executions), 2)
+
+    def test_close(self):
+        with patch('redis.asyncio.Redis', fake_async_redis):
+            lsh = AsyncMinHashLSH(threshold=0.5, num_perm=16, storage_config={
+                'type': 'redis', 'redis': {'host': 'localhost', 'port': 6392}})
+            r = lsh.keys._redis
+            name = 'aclose' if hasattr(r, 'aclose') else 'close'
+            close = getattr(r, name)
+            closes = []
+            async def counting_close():
+                closes.append(1)
+                await close()
+            setattr(r, name, counting_close)
+            run(lsh.close())
+            # The client shared by all storages is closed once
+            self.assertEqual(len(closes), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
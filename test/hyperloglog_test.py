@@ -55,6 +55,38 @@ class TestHyperLogLog(unittest.TestCase):
         h.update(0x000000f5)
         self.assertEqual(h.reg[5], self._class._hash_range_bit - 4 - 3)
 
+    def test_update_batch(self):
+        h1 = self._class(8)
+        h2 = self._class(8)
+        values = [("%d" % i).encode('utf8') for i in range(1000)]
+        for v in values:
+            h1.update(v)
+        h2.update_batch(values)
+        self.assertEqual(h1, h2)
+        h2.update_batch([])
+        self.assertEqual(h1, h2)
+
+    def test_update_hashes(self):
+        h1 = self._class(4, hashobj=FakeHash)
+        h2 = self._class(4, hashobj=FakeHash)
+        dtype = np.uint32 if self._class._hash_range_bit == 32 else np.uint64
+        hashvalues = np.random.randint(0, np.iinfo(dtype).max, 1000,
+                                       dtype=dtype)
+        # The largest and smallest ranks
+        hashvalues[:3] = [0b00011111, np.iinfo(dtype).max, 0x000000f5]
+        for hv in hashvalues:
+            h1.update(int(hv))
+        h2.update_hashes(hashvalues)
+        self.assertEqual(h1, h2)
+        # Smaller batches than the number of registers
+        h3 = self._class(4, hashobj=FakeHash)
+        for i in range(0, len(hashvalues), 10):
+            h3.update_hashes(hashvalues[i:i+10])
+        self.assertEqual(h1, h3)
+        if self._class._hash_range_bit == 32:
+            self.assertRaises(ValueError, h2.update_hashes,
+                              np.array([1 << 40], dtype=np.uint64))
+
     def test_merge(self):
         h1 = self._class(4, hashobj=FakeHash)
         h2 = self._class(4, hashobj=FakeHash)
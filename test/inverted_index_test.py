@@ -1,15 +1,8 @@
 import unittest
 import pickle
-import mockredis
 from mock import patch
 from datasketch import InvertedIndex
-
-
-def fake_redis(**kwargs):
-    redis = mockredis.mock_redis_client(**kwargs)
-    redis.connection_pool = None
-    redis.response_callbacks = None
-    return redis
+from redis_fakes import fake_redis, requires_fakeredis
 
 
 class TestInvertedIndex(unittest.TestCase):
@@ -64,6 +57,7 @@ class TestInvertedIndex(unittest.TestCase):
         result = index2.query("b")
         self.assertTrue("b" in result)
 
+    @requires_fakeredis
     def test_insert_redis(self):
         with patch('redis.Redis', fake_redis) as mock_redis:
             index = InvertedIndex(storage_config={
@@ -77,6 +71,7 @@ class TestInvertedIndex(unittest.TestCase):
             for v in index.keys[b"a"]:
                 self.assertTrue(b"a" in index.index[v])
 
+    @requires_fakeredis
     def test_query_redis(self):
         with patch('redis.Redis', fake_redis) as mock_redis:
             index = InvertedIndex(storage_config={
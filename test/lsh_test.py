@@ -1,18 +1,15 @@
 import unittest
 import pickle
+import os
+import tempfile
+import threading
 import numpy as np
-import mockredis
 from mock import patch
 from datasketch.lsh import MinHashLSH
 from datasketch.minhash import MinHash
+from datasketch.persistence import save_arrays
 from datasketch.weighted_minhash import WeightedMinHashGenerator
-
-
-def fake_redis(**kwargs):
-    redis = mockredis.mock_redis_client(**kwargs)
-    redis.connection_pool = None
-    redis.response_callbacks = None
-    return redis
+from redis_fakes import fake_redis, fakeredis, requires_fakeredis
 
 
 class TestMinHashLSH(unittest.TestCase):
@@ -65,8 +62,63 @@ class TestMinHashLSH(unittest.TestCase):
         m3 = MinHash(18)
         self.assertRaises(ValueError, lsh.query, m3)
 
+    def test_query_ranked(self):
+        lsh = MinHashLSH(threshold=0.5, num_perm=128, retain_signatures=True)
+        data = {}
+        for key, n in [("a", 10), ("b", 12), ("c", 16), ("d", 100)]:
+            m = MinHash(128)
+            for i in range(n):
+                m.update(("%d" % i).encode("utf8"))
+            lsh.insert(key, m)
+            data[key] = m
+        results = lsh.query_ranked(data["a"])
+        self.assertEqual(results[0], ("a", 1.0))
+        sims = [sim for _, sim in results]
+        self.assertEqual(sims, sorted(sims, reverse=True))
+        for key, sim in results:
+            self.assertTrue(sim >= 0.5)
+            self.assertAlmostEqual(sim, data["a"].jaccard(data[key]))
+        self.assertTrue("d" not in [key for key, _ in results])
+        self.assertEqual(lsh.query_ranked(data["a"], top_k=1), [("a", 1.0)])
+        lsh.remove("a")
+        self.assertTrue("a" not in [k for k, _ in lsh.query_ranked(data["a"])])
+        self.assertEqual(lsh.query_ranked(data["b"])[0], ("b", 1.0))
+        lsh = MinHashLSH(threshold=0.5, num_perm=128)
+        self.assertRaises(ValueError, lsh.query_ranked, data["a"])
+
+    def test_query_band_counts(self):
+        lsh = MinHashLSH(threshold=0.5, num_perm=128)
+        data = {}
+        for key, n in [("a", 10), ("b", 12), ("c", 100)]:
+            m = MinHash(128)
+            for i in range(n):
+                m.update(("%d" % i).encode("utf8"))
+            lsh.insert(key, m)
+            data[key] = m
+        results = lsh.query_band_counts(data["a"])
+        self.assertEqual(results[0], ("a", lsh.b))
+        counts = [c for _, c in results]
+        self.assertEqual(counts, sorted(counts, reverse=True))
+        self.assertEqual(set(k for k, _ in results), set(lsh.query(data["a"])))
+        self.assertEqual(lsh.query_band_counts(data["a"], top_k=1),
+                         [("a", lsh.b)])
+        self.assertEqual(lsh.query_band_counts(data["a"], min_bands=lsh.b),
+                         [("a", lsh.b)])
+        self.assertRaises(ValueError, lsh.query_band_counts, data["a"], 0)
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            lsh.save(path)
+            lsh2 = MinHashLSH.load(path)
+            self.assertEqual(sorted(lsh2.query_band_counts(data["a"])),
+                             sorted(results))
+            self.assertEqual(lsh2.query_band_counts(data["a"], top_k=1),
+                             [("a", lsh.b)])
+        finally:
+            os.remove(path)
+
     def test_remove(self):
-        lsh = MinHashLSH(threshold=0.5, num_perm=16)
+        lsh = MinHashLSH(threshold=0.5, num_perm=16, retain_signatures=True)
         m1 = MinHash(16)
         m1.update("a".encode("utf8"))
         m2 = MinHash(16)
@@ -74,8 +126,13 @@ class TestMinHashLSH(unittest.TestCase):
         lsh.insert("a", m1)
         lsh.insert("b", m2)
         
-        lsh.remove("a")
+        # A single removal from dict storages is not batched
+        with patch.object(lsh, '_rewrite') as rewrite:
+            lsh.remove("a")
+        self.assertFalse(rewrite.called)
         self.assertTrue("a" not in lsh.keys)
+        self.assertTrue("a" not in lsh.signatures)
+        self.assertEqual(lsh.query_ranked(m2), [("b", 1.0)])
         for table in lsh.hashtables:
             for H in table:
                 self.assertGreater(len(table[H]), 0)
@@ -83,6 +140,95 @@ class TestMinHashLSH(unittest.TestCase):
 
         self.assertRaises(ValueError, lsh.remove, "c")
 
+    def test_remove_many(self):
+        lsh = MinHashLSH(threshold=0.5, num_perm=16, retain_signatures=True)
+        ms = self._minhashes(range(20))
+        for i, m in enumerate(ms):
+            lsh.insert(i, m)
+        self.assertRaises(ValueError, lsh.remove_many, [0, 100])
+        self.assertEqual(len(lsh.keys), 20)
+        lsh.remove_many(range(10))
+        self.assertEqual(len(lsh.keys), 10)
+        self.assertEqual(len(lsh.signatures), 10)
+        for table in lsh.hashtables:
+            for H in table:
+                self.assertGreater(len(table[H]), 0)
+                self.assertTrue(all(key >= 10 for key in table[H]))
+        for i, m in enumerate(ms):
+            self.assertEqual(i in lsh.query(m), i >= 10)
+
+    @requires_fakeredis
+    def test_remove_many_redis(self):
+        with patch('redis.Redis', fake_redis) as mock_redis:
+            lsh = MinHashLSH(threshold=0.5, num_perm=16, storage_config={
+                'type': 'redis', 'redis': {'host': 'localhost', 'port': 6384}
+            })
+            ms = self._minhashes(range(20))
+            for i, m in enumerate(ms):
+                lsh.insert(("%d" % i).encode("utf8"), m)
+            executions = []
+            pipeline = fakeredis.FakeRedis.pipeline
+            def counting_pipeline(self, *args, **kwargs):
+                executions.append(1)
+                return pipeline(self, *args, **kwargs)
+            with patch.object(fakeredis.FakeRedis, 'pipeline', counting_pipeline):
+                lsh.remove_many([("%d" % i).encode("utf8") for i in range(10)])
+            self.assertEqual(len(executions), 3)
+            self.assertEqual(lsh.keys.size(), 10)
+            for table in lsh.hashtables:
+                for H in table:
+                    self.assertGreater(len(table[H]), 0)
+            for i, m in enumerate(ms):
+                self.assertEqual(("%d" % i).encode("utf8") in lsh.query(m), i >= 10)
+
+    def test_update(self):
+        lsh = MinHashLSH(threshold=0.5, num_perm=16, retain_signatures=True)
+        ms = self._minhashes(range(20))
+        for i in range(10):
+            lsh.insert(i, ms[i])
+        m = ms[0].copy()
+        m.update(b"new")
+        changed = [H1 != H2 for H1, H2 in zip(lsh.keys[0],
+                   [lsh._H(m.hashvalues[s:e]) for s, e in lsh.hashranges])]
+        self.assertTrue(any(changed))
+        lsh.update(0, m)
+        expected = MinHashLSH(threshold=0.5, num_perm=16)
+        expected.insert(0, m)
+        self.assertEqual(lsh.keys[0], expected.keys[0])
+        self.assertTrue(0 in lsh.query(m))
+        self.assertEqual(lsh.query_ranked(m, top_k=1), [(0, 1.0)])
+        # Upsert of new keys and replacement with the MinHash of another key
+        lsh.update_many([(1, ms[2]), (10, ms[10]), (11, ms[11])])
+        self.assertEqual(len(lsh.keys), 12)
+        self.assertEqual(lsh.keys[1], lsh.keys[2])
+        self.assertTrue(1 not in lsh.query(ms[1]))
+        self.assertTrue(10 in lsh.query(ms[10]))
+        for table in lsh.hashtables:
+            for H in table:
+                self.assertGreater(len(table[H]), 0)
+            self.assertEqual(sum(len(table[H]) for H in table), 12)
+        self.assertRaises(ValueError, lsh.update, 0, MinHash(18))
+
+    @requires_fakeredis
+    def test_update_redis(self):
+        with patch('redis.Redis', fake_redis) as mock_redis:
+            lsh = MinHashLSH(threshold=0.5, num_perm=16, storage_config={
+                'type': 'redis', 'redis': {'host': 'localhost', 'port': 6385}
+            })
+            ms = self._minhashes(range(3))
+            lsh.insert(b"a", ms[0])
+            lsh.insert(b"b", ms[1])
+            lsh.update(b"a", ms[2])
+            lsh.update(b"c", ms[1])
+            self.assertEqual(lsh.keys[b"a"], [lsh._H(ms[2].hashvalues[s:e])
+                                              for s, e in lsh.hashranges])
+            self.assertEqual(lsh.keys[b"c"], lsh.keys[b"b"])
+            self.assertEqual(sorted(lsh.query(ms[1])), [b"b", b"c"])
+            self.assertEqual(lsh.query(ms[2]), [b"a"])
+            self.assertEqual(lsh.query(ms[0]), [])
+            for table in lsh.hashtables:
+                self.assertEqual(sum(len(table[H]) for H in table), 3)
+
     def test_pickle(self):
         lsh = MinHashLSH(threshold=0.5, num_perm=16)
         m1 = MinHash(16)
@@ -97,6 +243,67 @@ class TestMinHashLSH(unittest.TestCase):
         result = lsh.query(m2)
         self.assertTrue("b" in result)
 
+    def test_save_load_empty(self):
+        lsh = MinHashLSH(threshold=0.5, num_perm=16, retain_signatures=True)
+        m = MinHash(16)
+        m.update(b"a")
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            lsh.save(path)
+            for mmap in (True, False):
+                lsh2 = MinHashLSH.load(path, mmap=mmap)
+                self.assertEqual(len(lsh2.signatures), 0)
+                self.assertEqual(lsh2.signatures.get([]).shape, (0, 16))
+                self.assertEqual(lsh2.query_ranked(m), [])
+        finally:
+            os.remove(path)
+
+    def test_save_load(self):
+        lsh = MinHashLSH(threshold=0.5, num_perm=16, retain_signatures=True)
+        ms = []
+        for i, key in enumerate(["a", b"b", 3]):
+            m = MinHash(16)
+            m.update(("%d" % i).encode("utf8"))
+            lsh.insert(key, m)
+            ms.append(m)
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            lsh.save(path)
+            for mmap in (True, False):
+                lsh2 = MinHashLSH.load(path, mmap=mmap)
+                self.assertEqual((lsh2.b, lsh2.r), (lsh.b, lsh.r))
+                for key, m in zip(["a", b"b", 3], ms):
+                    self.assertTrue(key in lsh2)
+                    self.assertEqual(lsh2.keys[key], lsh.keys[key])
+                    self.assertEqual(sorted(map(str, lsh2.query(m))),
+                                     sorted(map(str, lsh.query(m))))
+                self.assertTrue("c" not in lsh2)
+                self.assertEqual(lsh2.get_counts(), lsh.get_counts())
+                self.assertEqual(lsh2.query_ranked(ms[0]),
+                                 lsh.query_ranked(ms[0]))
+            lsh2 = MinHashLSH.load(path)
+            self.assertRaises(TypeError, lsh2.insert, "c", ms[0])
+            lsh2 = MinHashLSH.load(path, mmap=False)
+            lsh2.insert("c", ms[0])
+            self.assertTrue("c" in lsh2.query(ms[0]))
+            # Files saved before the threshold was recorded
+            meta, arrays = lsh._to_arrays()
+            del meta['threshold']
+            arrays['signatures'] = np.asfortranarray(arrays['signatures'])
+            saved = dict(arrays)
+            save_arrays(path, 'MinHashLSH', meta, arrays)
+            # The arrays given are left as they are
+            self.assertEqual(list(arrays), list(saved))
+            self.assertTrue(all(arrays[k] is saved[k] for k in saved))
+            lsh2 = MinHashLSH.load(path)
+            self.assertEqual((lsh2.b, lsh2.r), (lsh.b, lsh.r))
+            self.assertEqual(lsh2.query_ranked(ms[0]), lsh.query_ranked(ms[0]))
+        finally:
+            os.remove(path)
+
+    @requires_fakeredis
     def test_insert_redis(self):
         with patch('redis.Redis', fake_redis) as mock_redis:
             lsh = MinHashLSH(threshold=0.5, num_perm=16, storage_config={
@@ -123,6 +330,7 @@ class TestMinHashLSH(unittest.TestCase):
             m3 = MinHash(18)
             self.assertRaises(ValueError, lsh.insert, "c", m3)
 
+    @requires_fakeredis
     def test_query_redis(self):
         with patch('redis.Redis', fake_redis) as mock_redis:
             lsh = MinHashLSH(threshold=0.5, num_perm=16, storage_config={
@@ -142,6 +350,119 @@ class TestMinHashLSH(unittest.TestCase):
             m3 = MinHash(18)
             self.assertRaises(ValueError, lsh.query, m3)
 
+    @requires_fakeredis
+    def test_redis_pipeline(self):
+        with patch('redis.Redis', fake_redis) as mock_redis:
+            lsh = MinHashLSH(threshold=0.5, num_perm=16, storage_config={
+                'type': 'redis', 'redis': {'host': 'localhost', 'port': 6380}
+            })
+            m1 = MinHash(16)
+            m1.update("a".encode("utf8"))
+            executions = []
+            pipeline = fakeredis.FakeRedis.pipeline
+            def counting_pipeline(self, *args, **kwargs):
+                pipe = pipeline(self, *args, **kwargs)
+                execute = pipe.execute
+                def counting_execute():
+                    executions.append(len(pipe.command_stack))
+                    return execute()
+                pipe.execute = counting_execute
+                return pipe
+            with patch.object(fakeredis.FakeRedis, 'pipeline', counting_pipeline):
+                lsh.insert(b"a", m1)
+                self.assertEqual(len(executions), 1)
+                self.assertEqual(executions[0], 2*(lsh.b + 1))
+                result = lsh.query(m1)
+                self.assertEqual(executions[1:], [lsh.b])
+            self.assertEqual(result, [b"a"])
+            self.assertTrue(b"a" in lsh.query_band_counts(m1)[0])
+            self.assertEqual(lsh._query_b(m1, 2), set([b"a"]))
+
+    @requires_fakeredis
+    def test_sharded_redis(self):
+        with patch('redis.Redis', fake_redis) as mock_redis:
+            lsh = MinHashLSH(threshold=0.5, num_perm=16, storage_config={
+                'type': 'redis_sharded', 'redis': [
+                    {'host': 'localhost', 'port': 6381},
+                    {'host': 'localhost', 'port': 6382}]
+            })
+            ms = []
+            for i in range(20):
+                m = MinHash(16)
+                m.update(("%d" % i).encode("utf8"))
+                lsh.insert(("%d" % i).encode("utf8"), m)
+                ms.append(m)
+            for i, m in enumerate(ms):
+                self.assertTrue(("%d" % i).encode("utf8") in lsh.query(m))
+            for shard in lsh.keys.shards.values():
+                self.assertTrue(0 < shard.size() < 20)
+            lsh.remove(b"0")
+            self.assertTrue(b"0" not in lsh.query(ms[0]))
+
+    @requires_fakeredis
+    def test_add_remove_shard(self):
+        with patch('redis.Redis', fake_redis) as mock_redis:
+            config = {'type': 'redis_sharded', 'basename': b'shards',
+                      'redis': [{'host': 'localhost', 'port': 6386},
+                                {'host': 'localhost', 'port': 6387}]}
+            lsh = MinHashLSH(threshold=0.5, num_perm=16, storage_config=config)
+            ms = self._minhashes(range(20))
+            for i, m in enumerate(ms):
+                lsh.insert(("%d" % i).encode("utf8"), m)
+            expected = [sorted(lsh.query(m)) for m in ms]
+            lsh.add_shard({'host': 'localhost', 'port': 6388})
+            lsh.remove_shard({'host': 'localhost', 'port': 6386})
+            self.assertEqual(lsh.storage_config['redis'],
+                             [{'host': 'localhost', 'port': 6387},
+                              {'host': 'localhost', 'port': 6388}])
+            self.assertEqual(len(config['redis']), 2)
+            for storage in [lsh.keys] + lsh.hashtables:
+                self.assertEqual(len(storage.shards), 2)
+            self.assertEqual(fake_redis(host='localhost', port=6386).keys(), [])
+            reopened = MinHashLSH(threshold=0.5, num_perm=16,
+                                  storage_config=lsh.storage_config)
+            for index in (lsh, pickle.loads(pickle.dumps(lsh)), reopened):
+                self.assertEqual(index.keys.size(), 20)
+                self.assertEqual([sorted(index.query(m)) for m in ms], expected)
+            self.assertRaises(ValueError, lsh.add_shard,
+                              {'host': 'localhost', 'port': 6387})
+            lsh = MinHashLSH(threshold=0.5, num_perm=16)
+            self.assertRaises(ValueError, lsh.add_shard,
+                              {'host': 'localhost', 'port': 6387})
+
+    @requires_fakeredis
+    def test_redis_shared_connection(self):
+        clients = []
+        def counting_fake_redis(**kwargs):
+            clients.append(fake_redis(**kwargs))
+            return clients[-1]
+        with patch('redis.Redis', counting_fake_redis) as mock_redis:
+            lsh = MinHashLSH(threshold=0.5, num_perm=16, storage_config={
+                'type': 'redis', 'redis': {'host': 'localhost', 'port': 6383}
+            })
+            self.assertEqual(len(clients), 1)
+            connections = set(id(t._connection) for t in lsh.hashtables)
+            connections.add(id(lsh.keys._connection))
+            self.assertEqual(len(connections), 1)
+            ms = []
+            with lsh.insertion_session() as session:
+                for i in range(10):
+                    m = MinHash(16)
+                    m.update(("%d" % i).encode("utf8"))
+                    session.insert(("%d" % i).encode("utf8"), m)
+                    ms.append(m)
+                self.assertEqual(lsh.keys.size(), 0)
+            status = lsh.keys.status()['connection']
+            self.assertEqual(status['flushes'], 1)
+            self.assertTrue(status['last_flush_time'] >= 0.0)
+            for i, m in enumerate(ms):
+                self.assertTrue(("%d" % i).encode("utf8") in lsh.query(m))
+            lsh2 = pickle.loads(pickle.dumps(lsh))
+            connections = set(id(t._connection) for t in lsh2.hashtables)
+            connections.add(id(lsh2.keys._connection))
+            self.assertEqual(len(connections), 1)
+            self.assertTrue(b"0" in lsh2.query(ms[0]))
+
     def test_insertion_session(self):
         lsh = MinHashLSH(threshold=0.5, num_perm=16)
         m1 = MinHash(16)
@@ -164,6 +485,184 @@ class TestMinHashLSH(unittest.TestCase):
         for i, H in enumerate(lsh.keys["a"]):
             self.assertTrue("a" in lsh.hashtables[i][H])
 
+    def test_concurrent(self):
+        lsh = MinHashLSH(threshold=0.5, num_perm=16, concurrent=True)
+        ms = []
+        for i in range(200):
+            m = MinHash(16)
+            m.update(("%d" % (i % 20)).encode("utf8"))
+            ms.append(m)
+        for i in range(100):
+            lsh.insert(i, ms[i])
+        errors = []
+        done = threading.Event()
+        def read():
+            try:
+                while not done.is_set():
+                    for i in range(0, 100, 7):
+                        self.assertTrue(i in lsh.query(ms[i]))
+                    lsh.query_band_counts(ms[0])
+                    lsh.get_counts()
+            except Exception as e:
+                errors.append(e)
+        def write():
+            try:
+                for _ in range(3):
+                    for i in range(100, 200):
+                        lsh.insert(i, ms[i])
+                    for i in range(100, 200):
+                        lsh.remove(i)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                done.set()
+        readers = [threading.Thread(target=read) for _ in range(4)]
+        writer = threading.Thread(target=write)
+        for t in readers + [writer]:
+            t.start()
+        for t in readers + [writer]:
+            t.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(len(lsh.keys), 100)
+        for table in lsh.hashtables:
+            for H in table:
+                self.assertTrue(all(key < 100 for key in table[H]))
+        lsh2 = pickle.loads(pickle.dumps(lsh))
+        lsh2.insert(100, ms[100])
+        self.assertTrue(100 in lsh2.query(ms[100]))
+
+    def test_concurrent_query_ranked(self):
+        lsh = MinHashLSH(threshold=0.5, num_perm=16, concurrent=True,
+                         retain_signatures=True)
+        ms = []
+        for i in range(200):
+            m = MinHash(16)
+            m.update(("%d" % (i % 20)).encode("utf8"))
+            ms.append(m)
+        for i in range(100):
+            lsh.insert(i, ms[i])
+        errors = []
+        done = threading.Event()
+        def read():
+            try:
+                while not done.is_set():
+                    for i in range(0, 20, 3):
+                        result = lsh.query_ranked(ms[i])
+                        keys = [key for key, _ in result]
+                        self.assertTrue(i in keys)
+                        self.assertTrue(all(sim == 1.0 for _, sim in result))
+            except Exception as e:
+                errors.append(e)
+        def write():
+            try:
+                for _ in range(5):
+                    for i in range(100, 200):
+                        lsh.insert(i, ms[i])
+                    for i in range(100, 200):
+                        lsh.remove(i)
+                    lsh.update_many((i, ms[i]) for i in range(100, 200))
+                    lsh.remove_many(range(100, 200))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                done.set()
+        readers = [threading.Thread(target=read) for _ in range(4)]
+        writer = threading.Thread(target=write)
+        for t in readers + [writer]:
+            t.start()
+        for t in readers + [writer]:
+            t.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(len(lsh.signatures), 100)
+        self.assertEqual(sorted(key for key, _ in lsh.query_ranked(ms[0])),
+                         list(range(0, 100, 20)))
+
+    def _minhashes(self, keys):
+        ms = []
+        for key in keys:
+            m = MinHash(16)
+            m.update(("%d" % key).encode("utf8"))
+            ms.append(m)
+        return ms
+
+    def test_merge(self):
+        lsh1 = MinHashLSH(threshold=0.5, num_perm=16, retain_signatures=True)
+        lsh2 = MinHashLSH(threshold=0.5, num_perm=16, retain_signatures=True)
+        ms = self._minhashes(range(20))
+        for i in range(10):
+            lsh1.insert(i, ms[i])
+        for i in range(10, 20):
+            lsh2.insert(i, ms[i])
+        lsh1.merge(lsh2)
+        self.assertEqual(len(lsh1.keys), 20)
+        for i, m in enumerate(ms):
+            self.assertTrue(i in lsh1.query(m))
+            if i >= 10:
+                self.assertEqual(lsh1.keys[i], lsh2.keys[i])
+            self.assertEqual(lsh1.query_ranked(m, top_k=1)[0][1], 1.0)
+        self.assertRaises(ValueError, lsh1.merge, lsh2)
+        self.assertRaises(ValueError, lsh1.merge,
+                          MinHashLSH(num_perm=16, params=(4, 3)))
+        self.assertRaises(ValueError, lsh1.merge, MinHashLSH(num_perm=16))
+
+    def test_build_parallel(self):
+        ms = self._minhashes(range(50))
+        lsh = MinHashLSH(threshold=0.5, num_perm=16, retain_signatures=True)
+        lsh.build_parallel(zip(range(50), ms), n_jobs=2, chunk_size=7)
+        expected = MinHashLSH(threshold=0.5, num_perm=16)
+        for i, m in enumerate(ms):
+            expected.insert(i, m)
+        self.assertEqual(len(lsh.keys), 50)
+        for i, m in enumerate(ms):
+            self.assertEqual(lsh.keys[i], expected.keys[i])
+            self.assertEqual(sorted(lsh.query(m)), sorted(expected.query(m)))
+            self.assertEqual(lsh.query_ranked(m, top_k=1)[0][1], 1.0)
+        self.assertRaises(ValueError, lsh.build_parallel,
+                          [(0, ms[0])], n_jobs=1)
+        self.assertRaises(ValueError, lsh.build_parallel,
+                          [(100, MinHash(18))], n_jobs=1)
+        # Keys repeated in the input, within a chunk and across chunks,
+        # leave the index unchanged
+        lsh = MinHashLSH(threshold=0.5, num_perm=16, retain_signatures=True)
+        self.assertRaises(ValueError, lsh.build_parallel,
+                          [("a", ms[0]), ("a", ms[1])], n_jobs=1)
+        self.assertRaises(ValueError, lsh.build_parallel,
+                          list(zip(range(20), ms)) + [(3, ms[3])],
+                          n_jobs=2, chunk_size=7)
+        self.assertTrue(lsh.is_empty())
+        self.assertEqual(len(lsh.keys), 0)
+        self.assertEqual(len(lsh.signatures), 0)
+        # The entries are read lazily, and the chunks merged before a
+        # repeated key is found are removed
+        consumed = []
+        def entries():
+            for i in range(50):
+                consumed.append(i)
+                yield i % 20, ms[i]
+        self.assertRaises(ValueError, lsh.build_parallel, entries(),
+                          n_jobs=1, chunk_size=3)
+        self.assertEqual(len(consumed), 21)
+        self.assertTrue(lsh.is_empty())
+        self.assertEqual(len(lsh.keys), 0)
+        self.assertEqual(len(lsh.signatures), 0)
+
+    def test_insertion_session_remove(self):
+        lsh = MinHashLSH(threshold=0.5, num_perm=16)
+        ms = self._minhashes(range(10))
+        for i in range(5):
+            lsh.insert(i, ms[i])
+        with lsh.insertion_session() as session:
+            for i in range(5, 10):
+                session.insert(i, ms[i])
+            session.remove(0)
+            session.remove(7)
+            session.update(1, ms[9])
+            self.assertTrue(0 in lsh)
+        self.assertTrue(0 not in lsh)
+        self.assertTrue(7 not in lsh)
+        self.assertEqual(len(lsh.keys), 8)
+        self.assertEqual(lsh.keys[1], lsh.keys[9])
+
     def test_get_counts(self):
         lsh = MinHashLSH(threshold=0.5, num_perm=16)
         m1 = MinHash(16)
@@ -1,8 +1,73 @@
 import unittest
+import itertools
+import os
 import pickle
+import tempfile
 import numpy as np
-from datasketch.lshensemble import MinHashLSHEnsemble
+from mock import patch
+from datasketch.lshensemble import MinHashLSHEnsemble, _optimal_partitions, \
+        _optimal_param, _optimal_params
 from datasketch.minhash import MinHash
+from redis_fakes import fake_redis, flush_fake_redis, requires_fakeredis
+
+
+def _nfp(sizes, counts, uppers):
+    uppers = np.asarray(uppers)[np.searchsorted(uppers, sizes)]
+    return np.sum(counts * (uppers - sizes) / uppers.astype(float))
+
+
+class TestOptimalPartitions(unittest.TestCase):
+
+    def test_brute_force(self):
+        rng = np.random.RandomState(42)
+        for _ in range(50):
+            sizes = np.unique(rng.randint(1, 50, 8))
+            counts = rng.randint(1, 20, len(sizes))
+            for num_part in (1, 2, 3, 4):
+                uppers = _optimal_partitions(sizes, counts, num_part)
+                self.assertTrue(len(uppers) <= num_part)
+                self.assertEqual(uppers[-1], sizes[-1])
+                best = min(_nfp(sizes, counts, list(c) + [sizes[-1]])
+                           for n in range(num_part)
+                           for c in itertools.combinations(sizes[:-1], n))
+                self.assertAlmostEqual(_nfp(sizes, counts, uppers), best)
+
+    def test_power_law(self):
+        rng = np.random.RandomState(42)
+        sizes = rng.zipf(1.5, 10000)
+        distinct, counts = np.unique(sizes, return_counts=True)
+        uppers = _optimal_partitions(distinct, counts, 16)
+        self.assertEqual(len(uppers), 16)
+        self.assertEqual(uppers[-1], distinct[-1])
+        # Equal-count partitions
+        sizes.sort()
+        equal = np.unique([part[-1] for part in np.array_split(sizes, 16)])
+        self.assertTrue(_nfp(distinct, counts, uppers) <
+                        _nfp(distinct, counts, equal))
+
+
+class TestOptimalParams(unittest.TestCase):
+
+    def test_optimal_params(self):
+        xqs = np.exp(np.linspace(-5, 5, 10))
+        for threshold in (0.1, 0.5, 0.9):
+            params = _optimal_params(threshold, 64, 4, xqs, 0.5, 0.5)
+            expected = [_optimal_param(threshold, 64, 4, xq, 0.5, 0.5)
+                        for xq in xqs]
+            self.assertEqual([tuple(p) for p in params], expected)
+        params = _optimal_params(0.5, 64, 4, xqs, 0.5, 0.5, max_b=8)
+        self.assertTrue(all(b <= 8 for b, _ in params))
+
+    def test_lookup(self):
+        lsh = MinHashLSHEnsemble(threshold=0.5)
+        xs = [1, 10, 100, 1000, 10000]
+        params = lsh._get_optimal_params(xs, 100)
+        for x, p in zip(xs, params):
+            self.assertEqual(tuple(p), tuple(lsh._get_optimal_param(x, 100)))
+            i = np.searchsorted(lsh.xqs, x / 100.0)
+            self.assertEqual(tuple(p), tuple(lsh.params[min(i, len(lsh.params)-1)]))
+        # The table is computed once for the same parameters
+        self.assertTrue(MinHashLSHEnsemble(threshold=0.5).params is lsh.params)
 
 
 class TestMinHashLSHEnsemble(unittest.TestCase):
@@ -33,6 +98,226 @@ class TestMinHashLSHEnsemble(unittest.TestCase):
             keys = lsh.query(minhash, size)
             self.assertTrue(key in keys)
 
+    def test_query_partitions(self):
+        lsh = MinHashLSHEnsemble(threshold=0.5, num_part=8)
+        data = list(self._data(64))
+        lsh.index(data)
+        for _, minhash, size in data:
+            keys = list(lsh.query(minhash, size))
+            # The same as querying every partition on its own
+            expected = set()
+            for i, index in enumerate(lsh.indexes):
+                if lsh.lowers[i] is None:
+                    continue
+                b, r = lsh._get_optimal_param(lsh.lowers[i], size)
+                expected.update(index[r]._query_b(minhash, b))
+            self.assertEqual(set(keys), expected)
+
+    def test_shared_bands(self):
+        lsh = MinHashLSHEnsemble(threshold=0.9, num_perm=128, m=8,
+                                 shared_bands=True)
+        self.assertTrue(lsh.is_empty())
+        self.assertTrue(all(b <= 128 // 8 for b, _ in lsh.params))
+        data = list(self._data(64))
+        lsh.index(data)
+        self.assertFalse(lsh.is_empty())
+        self.assertTrue(41 in lsh)
+        self.assertFalse(64 in lsh)
+        for key, minhash, size in data:
+            keys = list(lsh.query(minhash, size))
+            self.assertTrue(key in keys)
+            self.assertEqual(len(keys), len(set(keys)))
+
+    def test_insert(self):
+        for shared_bands in (False, True):
+            lsh = MinHashLSHEnsemble(threshold=0.9, num_part=4,
+                                     shared_bands=shared_bands)
+            data = list(self._data(64))
+            lsh.index(data[:32])
+            for key, minhash, size in data[32:]:
+                lsh.insert(key, minhash, size)
+            self.assertRaises(ValueError, lsh.insert, 0, data[0][1], data[0][2])
+            self.assertRaises(ValueError, lsh.insert, 64, data[0][1], 0)
+            for key, minhash, size in data:
+                self.assertTrue(key in lsh)
+                self.assertTrue(key in lsh.query(minhash, size))
+            # Every set is in the partition whose range of sizes covers it
+            for key, size in lsh._sizes.items():
+                i = lsh._parts[key]
+                self.assertTrue(lsh.lowers[i] <= size)
+                self.assertTrue(all(lsh.lowers[j] is None or lsh.lowers[j] >= size
+                                    for j in range(i+1, len(lsh.indexes))))
+
+    def test_insert_empty(self):
+        lsh = MinHashLSHEnsemble(threshold=0.9, num_part=4)
+        data = list(self._data(32))
+        for key, minhash, size in data:
+            lsh.insert(key, minhash, size)
+        self.assertEqual(sum(lsh._counts), 32)
+        self.assertFalse(lsh._skewed())
+        for key, minhash, size in data:
+            self.assertTrue(key in lsh.query(minhash, size))
+
+    def test_remove(self):
+        for shared_bands in (False, True):
+            lsh = MinHashLSHEnsemble(threshold=0.9, num_part=4,
+                                     shared_bands=shared_bands)
+            data = list(self._data(64))
+            lsh.index(data)
+            for key, _, _ in data[:40]:
+                lsh.remove(key)
+            self.assertRaises(ValueError, lsh.remove, 64)
+            for key, minhash, size in data[:40]:
+                self.assertFalse(key in lsh)
+                self.assertFalse(key in lsh.query(minhash, size))
+            for key, minhash, size in data[40:]:
+                self.assertTrue(key in lsh.query(minhash, size))
+            for key, _, _ in data[40:]:
+                lsh.remove(key)
+            self.assertTrue(lsh.is_empty())
+
+    def test_repartition(self):
+        lsh = MinHashLSHEnsemble(threshold=0.9, num_part=4, max_skew=100.0,
+                                 partitioning='equal')
+        data = list(self._data(64))
+        lsh.index(data[:16])
+        # All larger than the indexed sets, so they go to the last partition
+        for key, minhash, size in data[16:]:
+            lsh.insert(key, minhash, size + 100)
+        self.assertTrue(lsh._counts[-1] >= 48)
+        lsh.repartition()
+        self.assertEqual(lsh._counts, [17, 17, 17, 13])
+        self.assertEqual(lsh.lowers, sorted(lsh.lowers))
+        for key, minhash, size in data[:16]:
+            self.assertTrue(key in lsh.query(minhash, size))
+        for key, minhash, size in data[16:]:
+            self.assertTrue(key in lsh.query(minhash, size + 100))
+        for i, index in enumerate(lsh.indexes):
+            for r in index:
+                self.assertEqual(index[r].keys.size(), lsh._counts[i])
+
+    def test_partitioning(self):
+        data = list(self._data(64))
+        for partitioning in ('equal', 'optimal'):
+            lsh = MinHashLSHEnsemble(threshold=0.9, num_part=4,
+                                     partitioning=partitioning)
+            lsh.index(data)
+            self.assertEqual(sum(lsh._counts), 64)
+            for key, minhash, size in data:
+                self.assertTrue(key in lsh.query(minhash, size))
+        # Optimal partitions never split the sets of the same size
+        for key, size in lsh._sizes.items():
+            i = lsh._parts[key]
+            self.assertTrue(all(lsh.lowers[j] is None or lsh.lowers[j] > size
+                                for j in range(i+1, len(lsh.indexes))))
+        self.assertRaises(ValueError, MinHashLSHEnsemble, partitioning='x')
+
+    def test_query_ranked(self):
+        lsh = MinHashLSHEnsemble(threshold=0.8, num_part=4)
+        data = list(self._data(64))
+        lsh.index(data)
+        self.assertRaises(ValueError, lsh.query_ranked, data[0][1], data[0][2])
+        lsh = MinHashLSHEnsemble(threshold=0.8, num_part=4,
+                                 retain_signatures=True)
+        lsh.index(data)
+        for key, minhash, size in data:
+            result = lsh.query_ranked(minhash, size)
+            keys = [k for k, _ in result]
+            self.assertEqual(len(keys), len(set(keys)))
+            self.assertTrue(set(keys).issubset(lsh.query(minhash, size)))
+            self.assertTrue(key in keys)
+            containments = [c for _, c in result]
+            self.assertEqual(containments, sorted(containments, reverse=True))
+            for k, c in result:
+                self.assertTrue(c >= 0.8 and c <= 1.0)
+                # The sets of _data are prefixes of the same sequence
+                x = lsh._sizes[k]
+                self.assertAlmostEqual(c, min(float(min(x, size)) / size, 1.0),
+                                       delta=0.3)
+            self.assertEqual(len(lsh.query_ranked(minhash, size, top_k=1)),
+                             min(1, len(result)))
+        lsh.remove(data[0][0])
+        self.assertFalse(data[0][0] in lsh.signatures)
+
+    def test_save_load_empty(self):
+        lsh = MinHashLSHEnsemble(threshold=0.8, num_perm=16,
+                                 retain_signatures=True)
+        m = MinHash(16)
+        m.update(b"a")
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            lsh.save(path)
+            for mmap in (True, False):
+                lsh2 = MinHashLSHEnsemble.load(path, mmap=mmap)
+                self.assertEqual(len(lsh2.signatures), 0)
+                self.assertEqual(lsh2.signatures.get([]).shape, (0, 16))
+                self.assertEqual(list(lsh2.query_ranked(m, 1)), [])
+        finally:
+            os.remove(path)
+
+    def test_save_load(self):
+        data = list(self._data(64))
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            for shared_bands in (False, True):
+                lsh = MinHashLSHEnsemble(threshold=0.8, num_part=4,
+                                         shared_bands=shared_bands,
+                                         retain_signatures=True)
+                lsh.index(data[:48])
+                lsh.save(path)
+                for mmap in (True, False):
+                    lsh2 = MinHashLSHEnsemble.load(path, mmap=mmap)
+                    self.assertFalse(lsh2.is_empty())
+                    self.assertTrue(data[0][0] in lsh2)
+                    self.assertFalse(data[-1][0] in lsh2)
+                    self.assertEqual(lsh2.lowers, lsh.lowers)
+                    for key, minhash, size in data:
+                        self.assertEqual(set(lsh2.query(minhash, size)),
+                                         set(lsh.query(minhash, size)))
+                        self.assertEqual(sorted(lsh2.query_ranked(minhash, size)),
+                                         sorted(lsh.query_ranked(minhash, size)))
+                    key, minhash, size = data[-1]
+                    if mmap:
+                        self.assertRaises(TypeError, lsh2.insert, key, minhash, size)
+                        self.assertRaises(TypeError, lsh2.remove, data[0][0])
+                        self.assertTrue(data[0][0] in lsh2)
+                    else:
+                        lsh2.insert(key, minhash, size)
+                        self.assertTrue(key in lsh2.query(minhash, size))
+                        lsh2.remove(data[0][0])
+                        self.assertFalse(data[0][0] in lsh2)
+        finally:
+            os.remove(path)
+
+    @requires_fakeredis
+    def test_redis(self):
+        # Other test modules use the same fake server on localhost:6379.
+        flush_fake_redis()
+        with patch('redis.Redis', fake_redis):
+            data = [(str(key).encode('utf8'), minhash, size)
+                    for key, minhash, size in self._data(32)]
+            lsh = MinHashLSHEnsemble(threshold=0.8, num_part=4, storage_config={
+                'type': 'redis', 'basename': b'ensemble',
+                'redis': {'host': 'localhost', 'port': 6379}})
+            expected = MinHashLSHEnsemble(threshold=0.8, num_part=4)
+            lsh.index(data)
+            expected.index(data)
+            for key, minhash, size in data:
+                self.assertEqual(set(lsh.query(minhash, size)),
+                                 set(expected.query(minhash, size)))
+            for i, index in enumerate(lsh.indexes):
+                for r in index:
+                    self.assertEqual(index[r].keys._name,
+                                     b'ensemble_part_%03d_r_%03d_keys' % (i, r))
+            redis_keys = fake_redis(host='localhost', port=6379).keys()
+            self.assertTrue(len(redis_keys) > 0)
+            self.assertTrue(all(k.startswith(b'ensemble_part_') for k in redis_keys))
+            key, minhash, size = data[0]
+            lsh.remove(key)
+            self.assertFalse(key in lsh.query(minhash, size))
+
     def test_pickle(self):
         lsh = MinHashLSHEnsemble(threshold=0.9)
         data = list(self._data(32))
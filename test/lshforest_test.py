@@ -1,9 +1,13 @@
 import unittest
+import os
+import tempfile
 from hashlib import sha1
 import pickle
 import numpy as np
+from mock import patch
 from datasketch.lshforest import MinHashLSHForest
 from datasketch.minhash import MinHash
+from redis_fakes import fake_redis, requires_fakeredis
 
 
 class TestMinHashLSHForest(unittest.TestCase):
@@ -79,5 +83,214 @@ class TestMinHashLSHForest(unittest.TestCase):
         result = forest.query(m2, 1)
         self.assertTrue("b" in result)
 
+    def test_incremental_index(self):
+        ms = []
+        for i in range(100):
+            m = MinHash(32)
+            for j in range(i, i+10):
+                m.update(str(j).encode("utf8"))
+            ms.append(m)
+        full = MinHashLSHForest(num_perm=32, l=4)
+        for i, m in enumerate(ms):
+            full.add(i, m)
+        full.index()
+        forest = MinHashLSHForest(num_perm=32, l=4)
+        for i, m in enumerate(ms[:60]):
+            forest.add(i, m)
+        forest.index()
+        for i in range(60, 66, 2):
+            for j in range(i, i+2):
+                forest.add(j, ms[j])
+            self.assertFalse(j in forest.query(ms[j], 100))
+            forest.index()
+            # The new keys are in the delta and searchable
+            self.assertGreater(len(forest._delta[0][0]), 0)
+            self.assertTrue(j in forest.query(ms[j], 100))
+        for i in range(66, 100):
+            forest.add(i, ms[i])
+        # The delta is merged once it grows
+        forest.index()
+        self.assertEqual(len(forest._delta[0][0]), 0)
+        for t1, t2 in zip(forest.sorted_hashtables, full.sorted_hashtables):
+            self.assertTrue(np.array_equal(t1, t2))
+        for m in ms:
+            self.assertEqual(sorted(forest.query(m, 5)), sorted(full.query(m, 5)))
+
+    def _minhashes(self, n):
+        ms = []
+        for i in range(n):
+            m = MinHash(32)
+            for j in range(i, i+10):
+                m.update(str(j).encode("utf8"))
+            ms.append(m)
+        return ms
+
+    def _levels(self, forest, m):
+        # The candidates at every prefix length
+        return [sorted(set(forest._query(m, r, forest.l)))
+                for r in range(1, forest.k+1)]
+
+    def test_remove(self):
+        ms = self._minhashes(40)
+        forest = MinHashLSHForest(num_perm=32, l=4, retain_signatures=True)
+        for i, m in enumerate(ms):
+            forest.add(i, m)
+        forest.index()
+        forest.add(40, ms[0])
+        forest.remove_many([0, 1, 40])
+        self.assertRaises(ValueError, forest.remove, 0)
+        for key in (0, 1, 40):
+            self.assertTrue(key not in forest)
+        self.assertEqual(len(forest.signatures), 38)
+        # Removed keys are not returned even before compaction
+        self.assertEqual(forest._removed, set([0, 1]))
+        for m in ms:
+            for keys in self._levels(forest, m):
+                self.assertTrue(0 not in keys and 1 not in keys)
+        forest.index()
+        self.assertEqual(forest._removed, set([0, 1]))
+        forest.remove_many(range(2, 10))
+        forest.index()
+        # Compacted once there are many removed keys
+        self.assertEqual(forest._removed, set())
+        self.assertEqual(len(forest._id_keys), 30)
+        expected = MinHashLSHForest(num_perm=32, l=4)
+        for i in range(10, 40):
+            expected.add(i, ms[i])
+        expected.index()
+        for t1, t2 in zip(forest.sorted_hashtables, expected.sorted_hashtables):
+            self.assertTrue(np.array_equal(t1, t2))
+        for m in ms:
+            self.assertEqual(self._levels(forest, m), self._levels(expected, m))
+        for i in range(10, 40):
+            forest.remove(i)
+        forest.index()
+        self.assertTrue(forest.is_empty())
+        for hashtable in forest.hashtables:
+            self.assertEqual(hashtable.size(), 0)
+
+    def test_query_many(self):
+        ms = self._minhashes(50)
+        forest = MinHashLSHForest(num_perm=32, l=4)
+        for i, m in enumerate(ms[:45]):
+            forest.add(i, m)
+        forest.index()
+        # Searched in both the sorted arrays and the delta
+        for i, m in enumerate(ms[45:], 45):
+            forest.add(i, m)
+        forest.index()
+        forest.remove(3)
+        self.assertGreater(len(forest._delta[0][0]), 0)
+        for k in (1, 5, 50):
+            results = forest.query_many(ms, k, batch_size=16)
+            self.assertEqual(len(results), len(ms))
+            for m, result in zip(ms, results):
+                self.assertEqual(sorted(result), sorted(forest.query(m, k)))
+        self.assertEqual(forest.query_many([], 5), [])
+        self.assertRaises(ValueError, forest.query_many, ms, 0)
+        self.assertRaises(ValueError, forest.query_many, [MinHash(16)], 5)
+
+    @requires_fakeredis
+    def test_redis(self):
+        with patch('redis.Redis', fake_redis) as mock_redis:
+            ms = self._minhashes(20)
+            forest = MinHashLSHForest(num_perm=32, l=4, storage_config={
+                'type': 'redis', 'redis': {'host': 'localhost', 'port': 6379}
+            })
+            expected = MinHashLSHForest(num_perm=32, l=4)
+            self.assertTrue(forest.is_empty())
+            for i, m in enumerate(ms):
+                forest.add(str(i).encode("utf8"), m)
+                expected.add(str(i).encode("utf8"), m)
+            self.assertTrue(forest.is_empty())
+            forest.index()
+            expected.index()
+            self.assertFalse(forest.is_empty())
+            for m in ms:
+                self.assertEqual(self._levels(forest, m),
+                                 self._levels(expected, m))
+            forest.remove(b"0")
+            expected.remove(b"0")
+            self.assertTrue(b"0" not in forest)
+            for m in ms:
+                self.assertEqual(self._levels(forest, m),
+                                 self._levels(expected, m))
+            self.assertRaises(ValueError, MinHashLSHForest, storage_config={
+                'type': 'redis_sharded', 'redis': [{'port': 6379}]})
+
+    def test_save_load_empty(self):
+        forest = MinHashLSHForest(num_perm=16, retain_signatures=True)
+        m = MinHash(16)
+        m.update(b"a")
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            forest.save(path)
+            for mmap in (True, False):
+                forest2 = MinHashLSHForest.load(path, mmap=mmap)
+                self.assertEqual(len(forest2.signatures), 0)
+                self.assertEqual(forest2.signatures.get([]).shape, (0, 16))
+                self.assertEqual(forest2.query_ranked(m, 5), [])
+        finally:
+            os.remove(path)
+
+    def test_save_load(self):
+        forest = self._setup()
+        m1 = MinHash()
+        m1.update("a".encode("utf8"))
+        m1.update("b".encode("utf8"))
+        m1.update("c".encode("utf8"))
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            forest.save(path)
+            for mmap in (True, False):
+                forest2 = MinHashLSHForest.load(path, mmap=mmap)
+                self.assertFalse(forest2.is_empty())
+                self.assertTrue("a" in forest2)
+                self.assertEqual(forest2.keys["a"], forest.keys["a"])
+                self.assertEqual(sorted(forest2.query(m1, 3)),
+                                 sorted(forest.query(m1, 3)))
+        finally:
+            os.remove(path)
+
+    def test_query_ranked(self):
+        forest = MinHashLSHForest(num_perm=32, l=4, retain_signatures=True)
+        ms = []
+        for i in range(20):
+            m = MinHash(32)
+            for j in range(i, i+10):
+                m.update(str(j).encode("utf8"))
+            ms.append(m)
+            forest.add(i, m)
+        forest.index()
+        self.assertRaises(ValueError, forest.query_ranked, ms[0], 0)
+        self.assertRaises(ValueError, forest.query_ranked, MinHash(16), 3)
+        results, stats = forest.query_ranked(ms[5], 3, return_stats=True)
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results[0], (5, 1.0))
+        sims = [sim for _, sim in results]
+        self.assertEqual(sims, sorted(sims, reverse=True))
+        for key, sim in results:
+            self.assertEqual(sim, ms[5].jaccard(ms[key]))
+        self.assertGreaterEqual(stats['candidates'], 3)
+        self.assertTrue(1 <= stats['prefix_levels'] <= forest.k)
+        self.assertEqual(forest.query_ranked(ms[5], 3), results)
+        # Save and load with the signatures
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            forest.save(path)
+            for mmap in (True, False):
+                forest2 = MinHashLSHForest.load(path, mmap=mmap)
+                self.assertEqual(forest2.query_ranked(ms[5], 3), results)
+        finally:
+            os.remove(path)
+        forest = MinHashLSHForest(num_perm=32, l=4)
+        forest.add(0, ms[0])
+        forest.index()
+        self.assertRaises(ValueError, forest.query_ranked, ms[0], 1)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+from datasketch.lshwindow import MinHashLSHWindow
+from datasketch.minhash import MinHash
+
+
+class TestMinHashLSHWindow(unittest.TestCase):
+
+    def _minhash(self, words):
+        m = MinHash(16)
+        for w in words:
+            m.update(w.encode("utf8"))
+        return m
+
+    def test_init(self):
+        window = MinHashLSHWindow(60, num_buckets=6, threshold=0.8, num_perm=16)
+        self.assertTrue(window.is_empty())
+        self.assertEqual(window.bucket_length, 10.0)
+        self.assertRaises(ValueError, MinHashLSHWindow, 0)
+        self.assertRaises(ValueError, MinHashLSHWindow, 60, num_buckets=0)
+
+    def test_insert_query(self):
+        window = MinHashLSHWindow(60, num_buckets=6, threshold=0.5, num_perm=16)
+        m1 = self._minhash(["a", "b", "c"])
+        m2 = self._minhash(["d", "e", "f"])
+        window.insert("a", m1, timestamp=0)
+        window.insert("b", m2, timestamp=15)
+        self.assertEqual(len(window.buckets), 2)
+        self.assertEqual(len(window), 2)
+        self.assertTrue("a" in window)
+        self.assertEqual(window.query(m1, timestamp=20), ["a"])
+        self.assertEqual(window.query(m2, timestamp=20), ["b"])
+        self.assertRaises(ValueError, window.insert, "a", m2, timestamp=20)
+        self.assertRaises(ValueError, window.insert, "c", MinHash(18), timestamp=20)
+
+    def test_expire(self):
+        window = MinHashLSHWindow(60, num_buckets=6, threshold=0.5, num_perm=16)
+        m = self._minhash(["a", "b", "c"])
+        window.insert("a", m, timestamp=5)
+        window.insert("b", m, timestamp=35)
+        # Kept for at least the window
+        self.assertEqual(sorted(window.query(m, timestamp=65)), ["a", "b"])
+        # and expired at most one bucket length later
+        self.assertEqual(window.query(m, timestamp=70), ["b"])
+        self.assertTrue("a" not in window)
+        self.assertEqual(len(window.buckets), 1)
+        # Late sets go to older live buckets, but not expired ones
+        window.insert("c", m, timestamp=20)
+        self.assertEqual(list(window.buckets), [2, 3])
+        self.assertRaises(ValueError, window.insert, "d", m, timestamp=0)
+        window.expire(1000)
+        self.assertTrue(window.is_empty())
+        self.assertEqual(window.query(m, timestamp=1000), [])
+
+    def test_remove(self):
+        window = MinHashLSHWindow(60, threshold=0.5, num_perm=16)
+        m = self._minhash(["a", "b", "c"])
+        window.insert("a", m, timestamp=0)
+        window.insert("b", m, timestamp=30)
+        window.remove("a")
+        self.assertEqual(window.query(m, timestamp=30), ["b"])
+        self.assertEqual(len(window.buckets), 1)
+        self.assertRaises(ValueError, window.remove, "a")
+
+
+if __name__ == "__main__":
+    unittest.main()
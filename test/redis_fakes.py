@@ -0,0 +1,35 @@
+'''
+Fake Redis clients for the tests, based on fakeredis. Patch `redis.Redis`
+with :func:`fake_redis` (or `redis.asyncio.Redis` with
+:func:`fake_async_redis`): clients connecting to the same host and port
+share the same data, as they would on a real Redis server.
+'''
+import unittest
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+_servers = {}
+
+requires_fakeredis = unittest.skipIf(fakeredis is None, "requires fakeredis")
+
+
+def _server(kwargs):
+    server = (kwargs.get('host'), kwargs.get('port'))
+    if server not in _servers:
+        _servers[server] = fakeredis.FakeServer()
+    return _servers[server]
+
+
+def fake_redis(**kwargs):
+    return fakeredis.FakeRedis(server=_server(kwargs))
+
+
+def fake_async_redis(**kwargs):
+    return fakeredis.FakeAsyncRedis(server=_server(kwargs))
+
+
+def flush_fake_redis():
+    '''Drop the data of all fake servers.'''
+    _servers.clear()
@@ -0,0 +1,129 @@
+import unittest
+from mock import patch
+from datasketch.storage import (
+    ConsistentHashRing, ShardedRedisSetStorage, ordered_storage,
+    sorted_storage, unordered_storage)
+from redis_fakes import fake_redis, requires_fakeredis
+
+
+def redis_config(port):
+    return {'host': 'localhost', 'port': port}
+
+
+class TestConsistentHashRing(unittest.TestCase):
+
+    def test_get_node(self):
+        ring = ConsistentHashRing(["a", "b", "c"])
+        keys = [("%d" % i).encode("utf8") for i in range(3000)]
+        nodes = [ring.get_node(key) for key in keys]
+        self.assertEqual(set(nodes), set(["a", "b", "c"]))
+        for node in "abc":
+            self.assertTrue(nodes.count(node) > 500)
+        self.assertEqual(nodes, [ring.get_node(key) for key in keys])
+        self.assertRaises(ValueError, ConsistentHashRing().get_node, b"a")
+
+    def test_minimal_remapping(self):
+        ring = ConsistentHashRing(["a", "b", "c"])
+        keys = [("%d" % i).encode("utf8") for i in range(3000)]
+        before = [ring.get_node(key) for key in keys]
+        ring.add_node("d")
+        after = [ring.get_node(key) for key in keys]
+        for n1, n2 in zip(before, after):
+            self.assertTrue(n1 == n2 or n2 == "d")
+        self.assertTrue(after.count("d") < 1500)
+        ring.remove_node("d")
+        self.assertEqual(before, [ring.get_node(key) for key in keys])
+
+
+@requires_fakeredis
+class TestShardedRedisStorage(unittest.TestCase):
+
+    def test_storage(self):
+        with patch('redis.Redis', fake_redis):
+            storage = unordered_storage({'type': 'redis_sharded',
+                'redis': [redis_config(7001), redis_config(7002)]})
+            self.assertTrue(isinstance(storage, ShardedRedisSetStorage))
+            keys = [("k%d" % i).encode("utf8") for i in range(100)]
+            for key in keys:
+                storage.insert(key, b"a", b"b")
+            self.assertEqual(storage.size(), 100)
+            self.assertEqual(sorted(storage.keys()), sorted(keys))
+            for shard in storage.shards.values():
+                self.assertTrue(0 < shard.size() < 100)
+            self.assertEqual(storage.get(keys[0]), set([b"a", b"b"]))
+            self.assertEqual(storage.getmany(*keys[:3]), [set([b"a", b"b"])]*3)
+            self.assertTrue(keys[0] in storage)
+            storage.remove(*keys[:10])
+            self.assertEqual(storage.size(), 90)
+            self.assertTrue(keys[0] not in storage)
+            self.assertEqual(sum(storage.itemcounts().values()), 180)
+
+    def test_add_remove_shard(self):
+        with patch('redis.Redis', fake_redis):
+            storage = unordered_storage({'type': 'redis_sharded',
+                'redis': [redis_config(7011), redis_config(7012)]})
+            keys = [("k%d" % i).encode("utf8") for i in range(200)]
+            for key in keys:
+                storage.insert(key, key)
+            sizes = dict((node, shard.size())
+                         for node, shard in storage.shards.items())
+            storage.add_shard(redis_config(7013))
+            self.assertEqual(len(storage.shards), 3)
+            self.assertEqual(storage.size(), 200)
+            for node, shard in storage.shards.items():
+                # Keys only move to the new shard
+                self.assertTrue(shard.size() <= sizes.get(node, 200))
+                for key in shard.keys():
+                    self.assertEqual(storage.shard(key), shard)
+            for key in keys:
+                self.assertEqual(storage.get(key), set([key]))
+            storage.remove_shard(redis_config(7011))
+            self.assertEqual(len(storage.shards), 2)
+            self.assertEqual(storage.size(), 200)
+            for key in keys:
+                self.assertEqual(storage.get(key), set([key]))
+            self.assertRaises(ValueError, storage.remove_shard,
+                              redis_config(7011))
+
+
+class TestDictStorage(unittest.TestCase):
+
+    def test_insert_many(self):
+        for copy_on_write in (False, True):
+            config = {'type': 'dict', 'copy_on_write': copy_on_write}
+            ordered = ordered_storage(config)
+            unordered = unordered_storage(config)
+            for storage in (ordered, unordered):
+                storage.insert(b"a", 1)
+                storage.insert_many([(b"a", (2,)), (b"b", (3,)),
+                                     (b"b", (4, 5)), (b"c", ())])
+                self.assertEqual(sorted(storage.get(b"a")), [1, 2])
+                self.assertEqual(sorted(storage.get(b"b")), [3, 4, 5])
+                self.assertEqual(storage.size(), 3)
+            self.assertEqual(ordered.get(b"b"), [3, 4, 5])
+
+
+@requires_fakeredis
+class TestRedisStorage(unittest.TestCase):
+
+    def test_list_remove_val(self):
+        with patch('redis.Redis', fake_redis):
+            storage = ordered_storage({'type': 'redis', 'basename': b'list',
+                'redis': redis_config(7021)})
+            storage.insert(b"k", b"a", b"b", b"a")
+            storage.remove_val(b"k", b"a")
+            self.assertEqual(storage.get(b"k"), [b"b"])
+            storage.remove_val(b"k", b"b")
+            self.assertTrue(b"k" not in storage)
+
+    def test_sorted_insert(self):
+        with patch('redis.Redis', fake_redis):
+            storage = sorted_storage({'type': 'redis', 'basename': b'sorted',
+                'redis': redis_config(7022)})
+            storage.insert(b"b", b"a", b"c")
+            storage.insert(b"a")
+            self.assertEqual(storage.keys(), [b"a", b"b", b"c"])
+
+
+if __name__ == "__main__":
+    unittest.main()